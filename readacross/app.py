@@ -6,17 +6,22 @@
 
 # app.py
 import io
+import json
+import time
 import textwrap
 import pandas as pd
 import streamlit as st
 
-# --- import your pipeline entrypoint from core.py ---
-from ra_core.core import run_full_read_across_assessment
+# --- pairs (single and batch) run in the ra_core.jobs worker processes ---
+from ra_core.profiling import spans_to_chrome_trace
+from ra_core.jobs import JobQueue, start_workers, EXTERNAL_WORKERS
+from ra_core.core import MODULES
+from ra_core.batch import PAIR_COLUMNS, read_pairs_csv, read_surrogates_sdf, summary_row
 
 # Optional: if you already built a fancy Excel writer elsewhere, we try to import it.
 # If not found, we fallback to a simple "dump the vertical DF" exporter below.
 try:
-    from ra_core.reporting_helpers import create_excel_report_bytes as _build_excel_bytes
+    from ra_core.reporting_helpers import write_excel_report_bytes as _build_excel_bytes
 except Exception:
     _build_excel_bytes = None
 
@@ -26,7 +31,7 @@ st.title("Read-Across Assessment")
 
 st.markdown(
     "Enter a **Target** and **Surrogate** (name + SMILES), run all modules, "
-    "and download a formatted Excel report."
+    "and download a formatted Excel report. Use **Batch upload** for many pairs at once."
 )
 
 # -------- helpers --------
@@ -41,20 +46,27 @@ def _wrap_vertical_df(df: pd.DataFrame) -> pd.DataFrame:
             )
     return df
 
-@st.cache_data(show_spinner=False)
-def _run_pair(tname, tsmi, sname, ssmi) -> pd.DataFrame:
-    """Cached wrapper around your pipeline."""
-    return run_full_read_across_assessment(tname, tsmi, sname, ssmi)
+@st.cache_resource(show_spinner=False)
+def _job_queue() -> JobQueue:
+    """
+    One queue per server process, shared by every session. Its workers are
+    started with the container (RA_JOB_EXTERNAL=1) so they are warm before the
+    first session; otherwise (local `streamlit run`) they are started here.
+    """
+    q = JobQueue()
+    if not EXTERNAL_WORKERS:
+        start_workers(q.path)
+    return q
 
-def _simple_excel_bytes(pairs):
+def _simple_excel_bytes(results):
     """
     Fallback Excel exporter: each comparison on its own sheet,
     writing the vertical DataFrame as-is.
     """
     bio = io.BytesIO()
     with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-        for i, (tname, tsmi, sname, ssmi) in enumerate(pairs, start=1):
-            df = _run_pair(tname, tsmi, sname, ssmi).reset_index()
+        for i, ((tname, tsmi, sname, ssmi), df) in enumerate(results, start=1):
+            df = df.reset_index()
             sheet_name = f"{i:02d} - {tname or 'Target'} vs {sname or 'Surrogate'}"
             writer.book.add_worksheet(sheet_name[:31])  # ensure sheet exists and name <=31
             # Re-open the sheet by name to write the DF
@@ -62,14 +74,182 @@ def _simple_excel_bytes(pairs):
     bio.seek(0)
     return bio.getvalue()
 
-def _build_excel(pairs):
-    """Use your fancy exporter if present; otherwise fallback to the simple one."""
+def _build_excel(results):
+    """Use your fancy exporter if present; otherwise fallback to the simple one.
+    `results`: [((tname, tsmi, sname, ssmi), vertical_df), ...]"""
     if _build_excel_bytes is not None:
-        return _build_excel_bytes(pairs)
-    return _simple_excel_bytes(pairs)
+        return _build_excel_bytes(results)
+    return _simple_excel_bytes(results)
+
+def _render_result(df: pd.DataFrame, pair):
+    st.success("Done.")
+    st.subheader("Report (vertical)")
+    st.dataframe(_wrap_vertical_df(df), use_container_width=True)
+
+    # Quick metrics row (if your labels match)
+    try:
+        total = float(df.loc["TOTAL SCORE (Sum of Modules)", "Target Result"])
+        pc    = float(df.loc["P-Chem Module Score", "Target Result"])
+        ms    = float(df.loc["Metabolic Similarity Module Score", "Target Result"])
+        sa    = float(df.loc["Structural Alert Module Score", "Target Result"])
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Total", f"{total:.3f}")
+        c2.metric("Phys Chem", f"{pc:.3f}")
+        c3.metric("Metabolism", f"{ms:.3f}")
+        c4.metric("Structural Alerts", f"{sa:.3f}")
+    except Exception:
+        # If the labels differ or a module is missing, just skip metrics.
+        pass
+
+    # Download Excel (this single pair, one sheet)
+    xls_bytes = _build_excel([(pair, df)])
+    st.subheader("Export")
+    st.download_button(
+        "Download Excel report",
+        data=xls_bytes,
+        file_name="read_across_report.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+    with st.expander("Timings (per stage)"):
+        spans = df.attrs.get("timings", [])
+        if not spans:
+            st.write("No timing information recorded.")
+        else:
+            tdf = pd.DataFrame(spans)
+            summary = (
+                tdf.groupby("stage")["duration_s"]
+                .agg(["count", "sum", "max"])
+                .sort_values("sum", ascending=False)
+            )
+            st.dataframe(summary, use_container_width=True)
+            cols = [c for c in ["stage", "tool", "compound", "duration_s", "cache_hit",
+                                "bytes_in", "bytes_out", "rss_kb", "queue_s", "timed_out"] if c in tdf.columns]
+            st.dataframe(tdf[cols], use_container_width=True)
+            st.download_button(
+                "Download Chrome trace (JSON)",
+                data=json.dumps(spans_to_chrome_trace(spans), default=str),
+                file_name="read_across_trace.json",
+                mime="application/json",
+            )
+
+    with st.expander("Debug: raw DataFrame"):
+        st.write(df)
+
+def _render_progress(rec: dict):
+    prog = rec.get("progress") or {}
+    n_done = sum(1 for m in MODULES if prog.get(m) == "done")
+    if rec["status"] == "queued":
+        st.info(f"Queued ({rec.get('queue_position') or 0} job(s) ahead)…")
+    else:
+        running = [m for m in MODULES if prog.get(m) == "running"]
+        st.info(f"Running {running[0] if running else '…'} ({n_done}/{len(MODULES)} modules done)")
+    st.progress(n_done / len(MODULES))
+
+_BATCH_COLS = ["target_name", "surrogate_name", "status", "total_score", "pchem_score",
+               "metabolic_score", "struct_score", "reactive_match", "tanimoto", "error"]
+
+def _collect_batch(queue, batch):
+    """
+    Poll a submitted batch ({"pairs", "job_ids", "done"}): one summary row per
+    pair in input order plus the finished (pair, df) results. A failed pair
+    shows its error in its row; the others are unaffected.
+    Returns (results, rows, n_finished).
+    """
+    results, rows, finished = [], [], 0
+    for pair, jid in zip(batch["pairs"], batch["job_ids"]):
+        rec = queue.get(jid)
+        status = rec["status"] if rec else "failed"
+        if status == "done" and jid not in batch["done"]:
+            batch["done"][jid] = queue.result(jid)  # unpickle each result once, not on every poll
+        if status == "done":
+            results.append((pair, batch["done"][jid]))
+            row = summary_row(pair, batch["done"][jid])
+            row["status"], row["error"] = ("degraded" if rec.get("degraded") else "done"), rec.get("degraded")
+        else:
+            row = dict(zip(PAIR_COLUMNS, pair), status=status)
+            row["error"] = (rec.get("error") if rec else "unknown job id")
+        finished += status in ("done", "failed")
+        rows.append(row)
+    return results, rows, finished
+
+def _render_batch(results, rows):
+    summary = pd.DataFrame(rows).reindex(columns=list(dict.fromkeys(_BATCH_COLS + list(rows[0]))))
+    n_failed = int((summary["status"] == "failed").sum())
+    st.success(f"Done: {len(results)} of {len(rows)} pairs.")
+    if n_failed:
+        st.error(f"{n_failed} pair(s) failed; see the error column.")
+    st.dataframe(summary[_BATCH_COLS].sort_values("total_score", ascending=False), use_container_width=True)
+    st.subheader("Export")
+    c1, c2 = st.columns(2)
+    if results:
+        c1.download_button(
+            "Download Excel report (one sheet per finished pair)",
+            data=_build_excel(results),
+            file_name="read_across_batch.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    bio = io.BytesIO()
+    summary.to_parquet(bio, index=False)
+    c2.download_button(
+        "Download results (Parquet)",
+        data=bio.getvalue(),
+        file_name="read_across_batch.parquet",
+        mime="application/octet-stream",
+    )
 
 # -------- UI --------
 
+queue = _job_queue()
+
+mode = st.radio("Mode", ["Single pair", "Batch upload"], horizontal=True)
+
+if mode == "Batch upload":
+    st.markdown(
+        "Upload a **CSV** with columns `target_name, target_smiles, surrogate_name, surrogate_smiles`, "
+        "or an **SDF** of surrogates to compare against the target entered below."
+    )
+    with st.form("batch"):
+        upload = st.file_uploader("Pairs (CSV) or surrogates (SDF)", type=["csv", "sdf"])
+        c1, c2 = st.columns(2)
+        with c1:
+            b_target_name = st.text_input("Target name (SDF only)", value="")
+        with c2:
+            b_target_smiles = st.text_input("Target SMILES (SDF only)", value="")
+        batch_submitted = st.form_submit_button("Run batch")
+
+    if batch_submitted:
+        pairs = []
+        if upload is None:
+            st.error("Please upload a CSV or SDF file.")
+        elif upload.name.lower().endswith(".sdf"):
+            if not b_target_smiles:
+                st.error("An SDF upload needs the Target SMILES.")
+            else:
+                pairs = read_surrogates_sdf(upload.getvalue(), b_target_name, b_target_smiles)
+        else:
+            try:
+                pairs = read_pairs_csv(upload)
+            except ValueError as e:
+                st.error(str(e))
+        if pairs:
+            # Every pair is its own job: the workers run them, this session only polls
+            st.session_state["batch"] = {
+                "pairs": pairs, "job_ids": [queue.submit(*pair) for pair in pairs], "done": {},
+            }
+            st.rerun()
+
+    batch = st.session_state.get("batch")
+    if batch:
+        results, rows, finished = _collect_batch(queue, batch)
+        if finished < len(rows):
+            st.dataframe(pd.DataFrame(rows).reindex(columns=_BATCH_COLS), use_container_width=True)
+            st.progress(finished / len(rows), text=f"{finished}/{len(rows)} pairs")
+            time.sleep(1.0)
+            st.rerun()
+        _render_batch(results, rows)
+    st.stop()
+
 with st.form("inputs"):
     c1, c2 = st.columns(2)
     with c1:
@@ -84,39 +264,27 @@ if submitted:
     if not target_smiles or not surrogate_smiles:
         st.error("Please provide both Target and Surrogate SMILES.")
     else:
-        with st.spinner("Running…"):
-            df = _run_pair(target_name, target_smiles, surrogate_name, surrogate_smiles)
-
-        st.success("Done.")
-        st.subheader("Report (vertical)")
-        st.dataframe(_wrap_vertical_df(df), use_container_width=True)
-
-        # Quick metrics row (if your labels match)
-        try:
-            total = float(df.loc["TOTAL SCORE (Sum of Modules)", "Target Result"])
-            pc    = float(df.loc["P-Chem Module Score", "Target Result"])
-            ms    = float(df.loc["Metabolic Similarity Module Score", "Target Result"])
-            sa    = float(df.loc["Structural Alert Module Score", "Target Result"])
-            c1, c2, c3, c4 = st.columns(4)
-            c1.metric("Total", f"{total:.3f}")
-            c2.metric("Phys Chem", f"{pc:.3f}")
-            c3.metric("Metabolism", f"{ms:.3f}")
-            c4.metric("Structural Alerts", f"{sa:.3f}")
-        except Exception:
-            # If the labels differ or a module is missing, just skip metrics.
-            pass
-
-        # Download Excel (this single pair, one sheet)
-        pairs = [(target_name, target_smiles, surrogate_name, surrogate_smiles)]
-        xls_bytes = _build_excel(pairs)
-        st.subheader("Export")
-        st.download_button(
-            "Download Excel report",
-            data=xls_bytes,
-            file_name="read_across_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-
-        with st.expander("Debug: raw DataFrame"):
-            st.write(df)
+        job_id = queue.submit(target_name, target_smiles, surrogate_name, surrogate_smiles)
+        st.session_state["job_id"] = job_id
+        st.query_params["job"] = job_id  # survives a page reload
 
+# Current job: this session's last submission, or the one in the URL after a reload
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+if job_id:
+    rec = queue.get(job_id)
+    if rec is None:
+        st.warning("Unknown job id; please submit the pair again.")
+    elif rec["status"] == "failed":
+        st.error(f"Assessment failed: {rec.get('error')}")
+    elif rec["status"] != "done":
+        _render_progress(rec)
+        time.sleep(1.0)
+        st.rerun()
+    else:
+        df = queue.result(job_id)
+        if rec.get("degraded"):
+            st.warning(f"Scored without a successful {rec['degraded']} run (failed or timed out); "
+                       "submit the pair again to re-run it.")
+        pair = (df.loc["Target Name", "Target Result"], df.loc["Target SMILES", "Target Result"],
+                df.loc["Surrogate Name", "Surrogate Result"], df.loc["Surrogate SMILES", "Surrogate Result"])
+        _render_result(df, pair)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# benchmarks/reference_set.py
+# Fixed reference chemicals for benchmarking. Do not edit casually: results are
+# only comparable across runs that use the same set.
+
+DRUG_LIKE = [
+    ("Acetaminophen", "CC(=O)Nc1ccc(O)cc1"),
+    ("Phenacetin", "CCOc1ccc(NC(C)=O)cc1"),
+    ("Ibuprofen", "CC(C)Cc1ccc(cc1)C(C)C(=O)O"),
+    ("Naproxen", "COc1ccc2cc(ccc2c1)[C@H](C)C(=O)O"),
+    ("Caffeine", "Cn1cnc2c1c(=O)n(C)c(=O)n2C"),
+    ("Theophylline", "Cn1c2nc[nH]c2c(=O)n(C)c1=O"),
+    ("Diclofenac", "OC(=O)Cc1ccccc1Nc1c(Cl)cccc1Cl"),
+    ("Carbamazepine", "NC(=O)N1c2ccccc2C=Cc2ccccc21"),
+    ("Valproic acid", "CCCC(CCC)C(=O)O"),
+    ("Phenytoin", "O=C1NC(=O)C(N1)(c1ccccc1)c1ccccc1"),
+    ("Warfarin", "CC(=O)CC(c1ccccc1)c1c(O)c2ccccc2oc1=O"),
+]
+
+INDUSTRIAL = [
+    ("Bisphenol A", "CC(C)(c1ccc(O)cc1)c1ccc(O)cc1"),
+    ("Bisphenol S", "O=S(=O)(c1ccc(O)cc1)c1ccc(O)cc1"),
+    ("2-Methoxyethanol", "COCCO"),
+    ("2-Ethoxyethanol", "CCOCCO"),
+    ("2-Ethylhexanol", "CCCCC(CC)CO"),
+    ("Toluene", "Cc1ccccc1"),
+    ("Ethylbenzene", "CCc1ccccc1"),
+    ("Styrene", "C=Cc1ccccc1"),
+    ("Nitrobenzene", "[O-][N+](=O)c1ccccc1"),
+    ("Dibutyl phthalate", "CCCCOC(=O)c1ccccc1C(=O)OCCCC"),
+    ("DEHP", "CCCCC(CC)COC(=O)c1ccccc1C(=O)OCC(CC)CCCC"),
+    ("4-Nonylphenol", "CCCCCCCCCc1ccc(O)cc1"),
+    ("Acrylamide", "C=CC(N)=O"),
+    ("Triclosan", "Oc1cc(Cl)ccc1Oc1ccc(Cl)cc1Cl"),
+    ("PFOA", "OC(=O)C(F)(F)C(F)(F)C(F)(F)C(F)(F)C(F)(F)C(F)(F)C(F)(F)F"),
+]
+
+COMPOUNDS = DRUG_LIKE + INDUSTRIAL
+_SMILES = dict(COMPOUNDS)
+
+# Typical read-across pairs (target, surrogate)
+PAIR_NAMES = [
+    ("Acetaminophen", "Phenacetin"),
+    ("Ibuprofen", "Naproxen"),
+    ("Caffeine", "Theophylline"),
+    ("Valproic acid", "2-Ethylhexanol"),
+    ("Bisphenol A", "Bisphenol S"),
+    ("2-Methoxyethanol", "2-Ethoxyethanol"),
+    ("Toluene", "Ethylbenzene"),
+    ("Dibutyl phthalate", "DEHP"),
+]
+
+PAIRS = [(t, _SMILES[t], s, _SMILES[s]) for t, s in PAIR_NAMES]
+
+# One-to-many screening: one target against every other reference compound
+SCREEN_TARGET = ("Bisphenol A", _SMILES["Bisphenol A"])
+SCREEN_CANDIDATES = [(n, smi) for n, smi in COMPOUNDS if n != SCREEN_TARGET[0]]
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# benchmarks/run_benchmarks.py
+#
+# Offline benchmark suite: scoring-module microbenchmarks plus end-to-end pair
+# and screening runs over the fixed reference set. Run from readacross/:
+#
+#   python -m benchmarks.run_benchmarks --out bench.json
+#   python -m benchmarks.run_benchmarks --only micro --compare bench.json
+#   python -m benchmarks.run_benchmarks --tools live --only jvm   # JVM startup, plain vs AppCDS
+#
+#   RA_TOOL_MODE=record python -m benchmarks.run_benchmarks --tools live   # capture fixtures
+#   RA_REPLAY_LATENCY=recorded python -m benchmarks.run_benchmarks --tools replay
+#
+# PubChem is stubbed unless fixtures are recorded or replayed. Java tools are
+# served from recorded outputs by default (--tools mock); use --tools record on
+# a machine with the JARs to refresh benchmarks/recorded/tool_outputs.json, or
+# --tools live. Without recordings every mocked tool call is a miss and the
+# end-to-end numbers would time the failure path, so e2e refuses to run
+# (--allow-missing-recordings overrides) and any misses are reported. --tools replay runs the real runners against ra_core.replay
+# fixtures, with zero or recorded latency.
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import offline
+from benchmarks.reference_set import COMPOUNDS, PAIRS, SCREEN_TARGET, SCREEN_CANDIDATES
+
+
+def _timeit(fn, *, repeat: int = 5, number: int = 1) -> dict:
+    """Run fn() `number` times per sample, `repeat` samples; seconds per call."""
+    fn()  # warm-up (imports, RDKit pattern caches, ...)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+    }
+
+
+# ---------- Microbenchmarks ----------
+def micro_benchmarks(core, repeat: int) -> list:
+    results = []
+
+    def add(name, fn, **kw):
+        r = _timeit(fn, repeat=repeat, **kw)
+        r["name"] = name
+        results.append(r)
+        print(f"[BENCH] {name:<40s} median {r['median_s'] * 1e3:9.2f} ms")
+
+    smiles = [smi for _, smi in COMPOUNDS]
+
+    add("dart_alerts.screen_all_reference",
+        lambda: [core._screen_for_dart_alerts(s) for s in smiles])
+
+    # DART dissimilarity for every reference compound pair: id sets vs bitsets vs one vectorized pass
+    reg = core.DART_REGISTRY
+    masks = [core._dart_alert_mask(s) for s in smiles]
+    id_sets = [reg.ids_of(m) for m in masks]
+    ij = [(i, j) for i in range(len(smiles)) for j in range(len(smiles)) if i != j]
+    add("dart_dissimilarity.all_pairs_idsets",
+        lambda: [core._calculate_structural_dissimilarity(id_sets[i], id_sets[j]) for i, j in ij])
+    add("dart_dissimilarity.all_pairs_bitsets",
+        lambda: [reg.dissimilarity(masks[i], masks[j]) for i, j in ij])
+    bool_t, bool_s = reg.to_bool([masks[i] for i, _ in ij]), reg.to_bool([masks[j] for _, j in ij])
+    add("dart_dissimilarity.all_pairs_vectorized",
+        lambda: reg.dissimilarity_many(bool_t, bool_s))
+
+    from ra_core import standardize as std
+    add("standardize_smiles.all_reference",
+        lambda: (std.clear_memo(), [core.standardize_smiles(s) for s in smiles]))
+    add("standardize_smiles.all_reference_memoized",
+        lambda: [core.standardize_smiles(s) for s in smiles])
+
+    add("sygma.metabolites_all_reference",
+        lambda: [core._run_sygma.uncached(s) for s in smiles])
+
+    # Metabolite sets for the reference pairs (computed once, outside the timer)
+    met_sets = []
+    for _, tsmi, _, ssmi in PAIRS:
+        tm = list(core._get_sygma_metabolites(tsmi, score_cutoff=0.01).items()) or [(tsmi, 1.0)]
+        sm = list(core._get_sygma_metabolites(ssmi, score_cutoff=0.01).items()) or [(ssmi, 1.0)]
+        met_sets.append((tsmi, tm, ssmi, sm))
+
+    add("compare_metabolite_sets.no_mcs",
+        lambda: [core.compare_metabolite_sets(a, ma, b, mb, use_mcs=False) for a, ma, b, mb in met_sets])
+    add("compare_metabolite_sets.with_mcs",
+        lambda: [core.compare_metabolite_sets(a, ma, b, mb, use_mcs=True) for a, ma, b, mb in met_sets])
+
+    # Delta dictionaries for _tani_counts_dict
+    deltas = []
+    for a, ma, b, mb in met_sets:
+        pa, pb = core._mol_from_smiles(a), core._mol_from_smiles(b)
+        da = [core._delta_counts_dict(pa, core._mol_from_smiles(s)) for s, _ in ma]
+        db = [core._delta_counts_dict(pb, core._mol_from_smiles(s)) for s, _ in mb]
+        deltas.append((da, db))
+    add("tani_counts_dict.all_pairs",
+        lambda: [core._tani_counts_dict(x, y) for da, db in deltas for x in da for y in db],
+        number=3)
+
+    # Excel writers on a precomputed vertical report
+    import xlsxwriter
+    tname, tsmi, sname, ssmi = PAIRS[0]
+    df = core.run_full_read_across_assessment(tname, tsmi, sname, ssmi)
+
+    def _write_workbook():
+        bio = io.BytesIO()
+        wb = xlsxwriter.Workbook(bio, {"in_memory": True})
+        for i in range(10):
+            core._write_vertical_sheet(wb, f"{i:02d} - bench", core._df_to_sections(df))
+        wb.close()
+
+    add("excel.write_vertical_sheet_x10", _write_workbook)
+    return results
+
+
+# ---------- End-to-end ----------
+def e2e_benchmarks(core, repeat: int) -> list:
+    results = []
+
+    from ra_core.cache import TOOL_CACHE
+
+    # Every sample starts cold: the per-compound tool cache would otherwise
+    # turn repeats into lookups. Sharing within one screen is still measured.
+    for tname, tsmi, sname, ssmi in PAIRS:
+        r = _timeit(lambda: (TOOL_CACHE.clear(), core.run_full_read_across_assessment(tname, tsmi, sname, ssmi)),
+                    repeat=repeat)
+        r["name"] = f"pair.{tname} vs {sname}"
+        results.append(r)
+        print(f"[BENCH] {r['name']:<40s} median {r['median_s']:9.3f} s")
+
+    tname, tsmi = SCREEN_TARGET
+
+    def _screen():
+        TOOL_CACHE.clear()
+        for sname, ssmi in SCREEN_CANDIDATES:
+            core.run_full_read_across_assessment(tname, tsmi, sname, ssmi)
+
+    r = _timeit(_screen, repeat=max(1, repeat // 2))
+    r["name"] = f"screen.{tname} x{len(SCREEN_CANDIDATES)}"
+    results.append(r)
+    print(f"[BENCH] {r['name']:<40s} median {r['median_s']:9.3f} s")
+
+    # Multi-pair report: concurrent compute, in-order workbook writes
+    from ra_core.reporting_helpers import create_excel_report_bytes
+    screen_pairs = [(tname, tsmi, sname, ssmi) for sname, ssmi in SCREEN_CANDIDATES]
+    r = _timeit(lambda: (TOOL_CACHE.clear(), create_excel_report_bytes(screen_pairs)), repeat=max(1, repeat // 2))
+    r["name"] = f"report.{tname} x{len(screen_pairs)}"
+    results.append(r)
+    print(f"[BENCH] {r['name']:<40s} median {r['median_s']:9.3f} s")
+    return results
+
+
+# ---------- JVM startup (live tools only) ----------
+def jvm_startup_benchmarks(core, repeat: int) -> list:
+    """Tiny real run of each installed tool: plain `-jar` vs startup flags + AppCDS archive."""
+    import subprocess
+    import tempfile
+    from pathlib import Path
+    from ra_core import jvm_cds, tool_runtime
+
+    results = []
+    for tool in ("toxtree", "biotransformer"):
+        p = tool_runtime.profile(tool)
+        java_bin, jar, cwd = p.java_bin, p.jar, p.workdir
+        if not p.available or jvm_cds.java_major(java_bin) is None:
+            print(f"[BENCH] jvm.{tool}: tool or java not installed; skipped")
+            continue
+        with tempfile.TemporaryDirectory() as td:
+            tail = jvm_cds.smoke_args(tool, Path(td))
+            jvm_cds.build(p, tail)
+            with jvm_cds.launch(tool, java_bin, jar, dump_args=tool_runtime.jvm_options(p)) as cds:
+                tuned = cds.flags
+            for label, flags in (("plain", []), ("cds", tuned)):
+                cmd = tool_runtime.command(p, tail, flags)
+                r = _timeit(lambda: subprocess.run(cmd, cwd=str(cwd), capture_output=True), repeat=repeat)
+                r["name"] = f"jvm.{tool}.{label}"
+                results.append(r)
+                print(f"[BENCH] {r['name']:<40s} median {r['median_s']:9.3f} s")
+    return results
+
+
+# ---------- Regression comparison ----------
+def compare(current: dict, baseline: dict, tolerance: float) -> int:
+    """Print median ratios vs a previous JSON; return number of regressions."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = 0
+    for r in current["results"]:
+        b = base.get(r["name"])
+        if not b or not b.get("median_s"):
+            continue
+        ratio = r["median_s"] / b["median_s"]
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        print(f"[BENCH] {r['name']:<40s} x{ratio:6.2f}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Read-across benchmark suite (offline)")
+    ap.add_argument("--only", choices=["micro", "e2e", "jvm", "all"], default="all",
+                    help="jvm: JVM startup with/without AppCDS (needs --tools live; not part of 'all')")
+    ap.add_argument("--tools", choices=["mock", "record", "live", "replay"], default="mock")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", help="write JSON results here")
+    ap.add_argument("--compare", help="previous JSON results to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    ap.add_argument("--allow-missing-recordings", action="store_true",
+                    help="run e2e with --tools mock even without recorded tool outputs (times the failure path)")
+    args = ap.parse_args(argv)
+
+    if args.tools == "mock" and args.only in ("e2e", "all") and not args.allow_missing_recordings:
+        recorded = offline.load_recordings()
+        if not (recorded["toxtree"] or recorded["biotransformer"]):
+            print(f"[BENCH] no recorded Toxtree / BioTransformer outputs in {offline.RECORDINGS_PATH}; "
+                  "e2e would only time failed tool calls. Record them with --tools record on a machine with "
+                  "the JARs, use --tools replay, run --only micro, or pass --allow-missing-recordings.")
+            return 2
+
+    core = offline.setup(args.tools)
+
+    import rdkit
+    payload = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "rdkit": rdkit.__version__,
+            "platform": platform.platform(),
+            "tools": args.tools,
+            "repeat": args.repeat,
+        },
+        "results": [],
+    }
+    if args.only in ("micro", "all"):
+        payload["results"] += micro_benchmarks(core, args.repeat)
+    if args.only in ("e2e", "all"):
+        payload["results"] += e2e_benchmarks(core, args.repeat)
+    if args.only == "jvm":
+        payload["results"] += jvm_startup_benchmarks(core, args.repeat)
+    payload["meta"]["tool_mock_stats"] = dict(offline.MOCK_STATS)
+    if args.tools == "mock":
+        misses = offline.MOCK_STATS["toxtree_misses"] + offline.MOCK_STATS["bt_misses"]
+        hits = offline.MOCK_STATS["toxtree_hits"] + offline.MOCK_STATS["bt_hits"]
+        if misses:
+            payload["meta"]["tool_mock_warning"] = f"{misses} of {hits + misses} mocked tool calls had no recording"
+            print(f"[BENCH] WARNING: {payload['meta']['tool_mock_warning']}; "
+                  "those pairs were timed on the failed-tool path")
+    from ra_core import replay
+    payload["meta"]["replay"] = {"mode": replay.MODE, "latency": replay.LATENCY, **replay.STATS}
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=1)
+        print(f"[BENCH] wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(payload, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
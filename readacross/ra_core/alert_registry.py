@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/alert_registry.py
+#
+# Compact form of the DART alert library. Each alert gets an integer ID (its
+# position in the library). Per-alert metadata lives in small NumPy arrays:
+#   tier          int8
+#   category      int16 code of the leading ID field   ("1.b.1a" -> "1")
+#   subcategory   int16 code of the letter field        ("1.b.1a" -> "b")
+# Strings (IDs, names, descriptions) are stored once and the SMARTS patterns
+# are held in a separate list.
+#
+# A compound's alert set is a bitset: a Python int with bit i set when alert i
+# matches. Set algebra is then &, |, ~ and int.bit_count().
+#
+# DART dissimilarity keeps the rule of the original implementation.
+#  - An alert present in only one compound costs its smallest penalty against
+#    the other compound's alerts: 0.25 for the same letter subcategory, 0.5 for
+#    the same category, 1.0 otherwise, and 1.0 when the other compound has no
+#    alerts.
+#  - Shared alerts cost 0.
+#  - The mean cost is taken over the union.
+# The letter subcategory is compared on its own, as before: "1.b.x" and "2.b.y"
+# count as the same subcategory.
+# Pairwise penalties are precomputed once as an n x n matrix. Its row minimum
+# over a bitset is two ANDs with per-alert category / subcategory bitsets. For
+# many pairs it reduces to per-pair category / subcategory counts, so a whole
+# screen is a few small matrix products.
+#
+#   reg = AlertRegistry.from_lookup(flat_alert_lookup)
+#   t, s = reg.screen(mol_a), reg.screen(mol_b)      # int bitsets
+#   reg.dissimilarity(t, s)                          # == _calculate_structural_dissimilarity
+#   reg.dissimilarity_many(reg.to_bool([t] * len(masks)), reg.to_bool(masks))
+import sys
+from typing import Dict, Iterable, List, Mapping, Sequence, Set
+
+import numpy as np
+
+
+def _codes(values: Sequence[str]):
+    """Distinct values (first-seen order) and the int16 code of each entry."""
+    uniq = list(dict.fromkeys(values))
+    index = {v: i for i, v in enumerate(uniq)}
+    return tuple(uniq), np.array([index[v] for v in values], dtype=np.int16)
+
+
+class AlertRegistry:
+    """Integer-indexed alert library; see module comment."""
+
+    SAME_SUBCATEGORY = 0.25
+    SAME_CATEGORY = 0.5
+    UNRELATED = 1.0
+
+    def __init__(self, ids: Sequence[str], names: Sequence[str], descriptions: Sequence[str],
+                 tiers: Sequence[int], patterns: Sequence):
+        self.ids = tuple(sys.intern(str(a)) for a in ids)
+        self.index: Dict[str, int] = {a: i for i, a in enumerate(self.ids)}
+        self.n = len(self.ids)
+        # Repeated strings (same name / description across variants) stored once
+        self.names, self._name_codes = _codes([sys.intern(str(x)) for x in names])
+        self.descriptions, self._desc_codes = _codes([sys.intern(str(x)) for x in descriptions])
+        self.tier = np.asarray(tiers, dtype=np.int8)
+        parts = [a.split(".") for a in self.ids]
+        self.categories, self.category = _codes([p[0] for p in parts])
+        self.subcategories, self.subcategory = _codes([p[1] for p in parts])
+        self.patterns: List = list(patterns)
+        self.penalty = self._penalty_matrix()
+        # Per alert: bitset of every alert sharing its subcategory / category. The
+        # row minimum of `penalty` over a bitset is then two ANDs.
+        sub_masks = [0] * len(self.subcategories)
+        cat_masks = [0] * len(self.categories)
+        for i in range(self.n):
+            sub_masks[self.subcategory[i]] |= 1 << i
+            cat_masks[self.category[i]] |= 1 << i
+        self._same_sub = [sub_masks[c] for c in self.subcategory]
+        self._same_cat = [cat_masks[c] for c in self.category]
+        # One-hot alert -> category / subcategory / (category, subcategory) group,
+        # for the vectorized path
+        groups, group_of = _codes(list(zip(self.category.tolist(), self.subcategory.tolist())))
+        n_cat, n_sub = len(self.categories), len(self.subcategories)
+        self._onehot = np.hstack([np.eye(n_cat, dtype=np.float32)[self.category],
+                                  np.eye(n_sub, dtype=np.float32)[self.subcategory],
+                                  np.eye(len(groups), dtype=np.float32)[group_of]])
+        self._cols = (slice(0, n_cat), slice(n_cat, n_cat + n_sub), slice(n_cat + n_sub, None))
+        self._grp_cat = np.array([g[0] for g in groups], dtype=np.int16)
+        self._grp_sub = np.array([g[1] for g in groups], dtype=np.int16)
+
+    @classmethod
+    def from_lookup(cls, lookup: Mapping[str, dict]) -> "AlertRegistry":
+        """From core.flat_alert_lookup ({alert_id: {name, description, tier, smarts_pattern, ...}})."""
+        ids = list(lookup)
+        return cls(ids,
+                   [lookup[a].get("name", "") for a in ids],
+                   [lookup[a].get("description", "") for a in ids],
+                   [lookup[a].get("tier", 0) for a in ids],
+                   [lookup[a]["smarts_pattern"] for a in ids])
+
+    def _penalty_matrix(self) -> np.ndarray:
+        same_cat = self.category[:, None] == self.category[None, :]
+        same_sub = self.subcategory[:, None] == self.subcategory[None, :]
+        p = np.where(same_sub, self.SAME_SUBCATEGORY, np.where(same_cat, self.SAME_CATEGORY, self.UNRELATED))
+        np.fill_diagonal(p, 0.0)
+        return p.astype(np.float32)
+
+    # ---------- per-alert metadata ----------
+    def name(self, i: int) -> str:
+        return self.names[self._name_codes[i]]
+
+    def description(self, i: int) -> str:
+        return self.descriptions[self._desc_codes[i]]
+
+    # ---------- bitsets ----------
+    def screen(self, mol) -> int:
+        """Bitset of the alerts whose pattern matches `mol` (0 for None)."""
+        mask = 0
+        if mol is not None:
+            for i, patt in enumerate(self.patterns):
+                if mol.HasSubstructMatch(patt):
+                    mask |= 1 << i
+        return mask
+
+    def mask_of(self, alert_ids: Iterable[str]) -> int:
+        mask = 0
+        for a in alert_ids:
+            mask |= 1 << self.index[a]
+        return mask
+
+    def bits(self, mask: int) -> List[int]:
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(low.bit_length() - 1)
+            mask ^= low
+        return out
+
+    def ids_of(self, mask: int) -> Set[str]:
+        return {self.ids[i] for i in self.bits(mask)}
+
+    def to_bool(self, masks: Sequence[int]) -> np.ndarray:
+        """Bitsets -> bool matrix (len(masks) x n) for the vectorized path."""
+        out = np.zeros((len(masks), self.n), dtype=bool)
+        for r, m in enumerate(masks):
+            out[r, self.bits(m)] = True
+        return out
+
+    # ---------- dissimilarity ----------
+    def min_penalty(self, i: int, other: int) -> float:
+        """min(penalty[i, j] for j in other) for alert i not in `other`; 1.0 when other is empty."""
+        if other & self._same_sub[i]:
+            return self.SAME_SUBCATEGORY
+        if other & self._same_cat[i]:
+            return self.SAME_CATEGORY
+        return self.UNRELATED
+
+    def dissimilarity(self, target: int, surrogate: int) -> float:
+        union = target | surrogate
+        if not union:
+            return 0.0
+        total = 0.0
+        for mine, other in ((target & ~surrogate, surrogate), (surrogate & ~target, target)):
+            for i in self.bits(mine):
+                total += self.min_penalty(i, other)
+        return total / union.bit_count()
+
+    def _row_min(self, only: np.ndarray, other: np.ndarray) -> np.ndarray:
+        """
+        Per pair, sum over alerts in `only` of their min penalty against
+        `other` (bool pairs x n). With c / s = "other has an alert of the same
+        category / subcategory", the penalty is 1 - 0.5*(c or s) - 0.25*s, so
+        the sum only needs per-pair counts over categories, subcategories and
+        (category, subcategory) groups; never a pairs x n x n array.
+        """
+        cat, sub, grp = self._cols
+        n_only = only.sum(axis=1)
+        only = only.astype(np.float32) @ self._onehot              # counts per category | subcategory | group
+        hit = (other.astype(np.float32) @ self._onehot[:, :grp.start]) > 0
+        c_hit, s_hit = hit[:, cat], hit[:, sub]
+        a = (only[:, cat] * c_hit).sum(axis=1)                     # only-alerts with c
+        b = (only[:, sub] * s_hit).sum(axis=1)                     # only-alerts with s
+        both = (only[:, grp] * (c_hit[:, self._grp_cat] & s_hit[:, self._grp_sub])).sum(axis=1)
+        return n_only - 0.5 * (a + b - both) - 0.25 * b
+
+    def dissimilarity_many(self, targets: np.ndarray, surrogates: np.ndarray) -> np.ndarray:
+        """Row-wise dissimilarity of two bool matrices (pairs x n); same values as dissimilarity()."""
+        t = np.asarray(targets, dtype=bool)
+        s = np.asarray(surrogates, dtype=bool)
+        n_union = (t | s).sum(axis=1)
+        total = self._row_min(t & ~s, s) + self._row_min(s & ~t, t)
+        return np.divide(total, n_union, out=np.zeros(len(t)), where=n_union > 0)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/batch.py
+#
+# Multi-pair compute for reports. Phase 1 fans out over the unique compounds
+# and warms the per-compound tool cache (Toxtree modules, BioTransformer,
+# SyGMa, PubChem). Phase 2 fans out over the pairs, which then mostly hit the
+# cache. Results are yielded in input order as soon as the next one is ready,
+# so a single-threaded writer (Excel) can stream sheets while later pairs are
+# still running.
+#
+#   for i, pair, df in iter_pair_results(pairs, max_workers=8):
+#       write_sheet(i, pair, df)
+import os
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from ra_core.profiling import span
+
+Pair = Tuple[str, str, str, str]
+
+REPORT_WORKERS = int(os.environ.get("RA_REPORT_WORKERS", "8"))
+
+
+def _warm_compound(name: str, smiles: str, cutoff: float = 0.01) -> None:
+    """Run every per-compound tool once so pair assessments read from the cache."""
+    from ra_core import core
+    core._get_ames_alerts(smiles)
+    core._get_cramer_decision_path(smiles)
+    core._get_sygma_metabolites(smiles, score_cutoff=cutoff)
+    core.run_biotransformer_and_get_reactions(smiles)
+    core.get_pubchem_by_name(name)
+
+
+def _assess(pair: Pair, profile=None) -> pd.DataFrame:
+    from ra_core import core
+    tname, tsmi, sname, ssmi = pair
+    return core.run_full_read_across_assessment(tname, tsmi, sname, ssmi, profile=profile)
+
+
+def unique_compounds(pairs: Sequence[Pair]) -> list:
+    """(name, smiles) for every distinct compound across the pairs, first-seen order."""
+    seen = {}
+    for tname, tsmi, sname, ssmi in pairs:
+        for name, smi in ((tname, tsmi), (sname, ssmi)):
+            seen.setdefault((name, smi), None)
+    return list(seen)
+
+
+def iter_pair_results(
+    pairs: Iterable[Pair],
+    *,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    profile=None,
+    warm: bool = True,
+) -> Iterator[Tuple[int, Pair, pd.DataFrame]]:
+    """
+    Yield (index, pair, vertical_df) in input order. Runs on `executor` (any
+    concurrent.futures Executor) or a thread pool of `max_workers`
+    (RA_REPORT_WORKERS). Threads share one tool cache, so the warm-up phase is
+    only done for thread pools; process pools just get the pairs.
+    A pair that raises is re-raised when its turn to be yielded comes.
+    """
+    pairs = [tuple(p) for p in pairs]
+    if not pairs:
+        return
+    own = executor is None
+    if own:
+        executor = ThreadPoolExecutor(max_workers=max_workers or min(REPORT_WORKERS, len(pairs)))
+    threads = not isinstance(executor, ProcessPoolExecutor)
+
+    def submit(fn, *args):
+        # Worker threads don't inherit context vars; carry the active Profiler along
+        if threads:
+            return executor.submit(contextvars.copy_context().run, fn, *args)
+        return executor.submit(fn, *args)
+
+    try:
+        if warm and threads:
+            compounds = unique_compounds(pairs)
+            with span("batch:warm_compounds", n=len(compounds)):
+                for f in as_completed([submit(_warm_compound, n, s) for n, s in compounds]):
+                    f.result()
+
+        futures = {submit(_assess, p, profile): i for i, p in enumerate(pairs)}
+        done, nxt = {}, 0
+        for f in as_completed(futures):
+            done[futures[f]] = f
+            while nxt in done:
+                yield nxt, pairs[nxt], done.pop(nxt).result()
+                nxt += 1
+    finally:
+        if own:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def compute_pair_results(pairs: Iterable[Pair], **kw) -> list:
+    """All results as [(pair, vertical_df), ...] in input order."""
+    return [(pair, df) for _, pair, df in iter_pair_results(pairs, **kw)]
+
+
+# ---------- Batch inputs / outputs ----------
+PAIR_COLUMNS = ["target_name", "target_smiles", "surrogate_name", "surrogate_smiles"]
+
+
+def read_pairs_csv(fileobj) -> list:
+    """CSV with target_name, target_smiles, surrogate_name, surrogate_smiles (names optional); duplicates dropped."""
+    df = pd.read_csv(fileobj, dtype=str).fillna("")
+    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+    missing = {"target_smiles", "surrogate_smiles"} - set(df.columns)
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(sorted(missing))}")
+    for c in ("target_name", "surrogate_name"):
+        if c not in df.columns:
+            df[c] = ""
+    df = df[df["target_smiles"].str.strip().astype(bool) & df["surrogate_smiles"].str.strip().astype(bool)]
+    return list(dict.fromkeys(tuple(r) for r in df[PAIR_COLUMNS].itertuples(index=False)))
+
+
+def read_surrogates_sdf(data: bytes, target_name: str, target_smiles: str) -> list:
+    """Every record of an SDF as a surrogate for one target; name from the title line or a NAME property."""
+    import io
+    from rdkit import Chem
+    pairs = []
+    for i, mol in enumerate(Chem.ForwardSDMolSupplier(io.BytesIO(data))):
+        if mol is None:
+            print(f"[BATCH] SDF record {i + 1} could not be parsed; skipped")
+            continue
+        name = mol.GetProp("_Name").strip() if mol.HasProp("_Name") else ""
+        if not name and mol.HasProp("NAME"):
+            name = mol.GetProp("NAME").strip()
+        pairs.append((target_name, target_smiles, name or f"SDF #{i + 1}", Chem.MolToSmiles(mol)))
+    return list(dict.fromkeys(pairs))
+
+
+def summary_row(pair: Pair, df: pd.DataFrame) -> dict:
+    """One flat row per pair: identity, module scores and the stored evidence numbers."""
+    v = df["Target Result"]
+    row = dict(zip(PAIR_COLUMNS, pair))
+    row.update({
+        "total_score": v.get("TOTAL SCORE (Sum of Modules)"),
+        "pchem_score": v.get("P-Chem Module Score"),
+        "metabolic_score": v.get("Metabolic Similarity Module Score"),
+        "struct_score": v.get("Structural Alert Module Score"),
+        "reactive_match": v.get("Reactive Metabolite Match (Binary)"),
+        "tanimoto": v.get("Generic Tanimoto Similarity"),
+    })
+    ev = df.attrs.get("evidence") or {}
+    for k, val in ev.items():
+        if k not in row and k != "details":
+            row[k] = val
+    return row
+
+
+def summary_frame(results) -> pd.DataFrame:
+    """[(pair, vertical_df), ...] -> one row per pair (see summary_row)."""
+    return pd.DataFrame([summary_row(pair, df) for pair, df in results])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/cache.py
+#
+# In-process memo for per-compound tool outputs (Toxtree modules, BioTransformer
+# reactions, SyGMa metabolites, PubChem lookups). A report over many pairs
+# shares compounds, and each of these is a JVM launch, a SyGMa run or an HTTP
+# round trip. Concurrent callers asking for the same key wait for the first one
+# instead of launching the tool twice. Hits are recorded as spans with
+# cache_hit=True; results refused by cache_if (tool failures) as spans with
+# failed=True, so a pair can tell it was scored on a failed tool run.
+#
+#   RA_TOOL_CACHE=0          disable
+#   RA_TOOL_CACHE_SIZE=2048  entries (LRU) per process
+import os
+import copy
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from ra_core.profiling import span
+
+ENABLED = os.environ.get("RA_TOOL_CACHE", "1").strip().lower() not in {"0", "false", "no"}
+MAX_ENTRIES = int(os.environ.get("RA_TOOL_CACHE_SIZE", "2048"))
+
+
+class ToolCache:
+    """Thread-safe LRU with in-flight de-duplication."""
+
+    def __init__(self, maxsize: int = MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, fn: Callable, cache_if: Optional[Callable] = None):
+        """Returns (value, hit)."""
+        while True:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return self._data[key], True
+                ev = self._inflight.get(key)
+                if ev is None:
+                    ev = self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Someone else is computing this key; re-check once they are done
+            ev.wait()
+        try:
+            value = fn()
+            if cache_if is None or cache_if(value):
+                with self._lock:
+                    self._data[key] = value
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            ev.set()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+TOOL_CACHE = ToolCache()
+
+
+def tool_cache(namespace: str, *, cache_if: Optional[Callable] = None):
+    """
+    Memoize a per-compound tool function on (namespace, args). Cached values
+    are handed out as copies so callers can't mutate the shared entry.
+    `cache_if(value)` can refuse to cache failures (e.g. None from a crashed JVM).
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            compound = str(args[0]) if args else None
+            if not ENABLED:
+                value, hit = fn(*args, **kwargs), False
+            else:
+                key = (namespace, args, tuple(sorted(kwargs.items())))
+                value, hit = TOOL_CACHE.get_or_compute(key, lambda: fn(*args, **kwargs), cache_if)
+            if hit:
+                with span(namespace, compound=compound, cache_hit=True):
+                    pass
+            elif cache_if is not None and not cache_if(value):
+                with span(namespace, compound=compound, failed=True):
+                    pass
+            return copy.copy(value)
+        wrapper.uncached = fn
+        return wrapper
+    return deco
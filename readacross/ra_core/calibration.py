@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/calibration.py
+#
+# Calibration workbench for the metabolic-similarity fusion weights and the
+# fused -> score bins (_assign_score_value_v2). Component similarities are read
+# once from an EvidenceStore; thousands of weight / bin configurations are then
+# evaluated as NumPy matrix operations against expert labels.
+#
+#   python -m ra_core.calibration --db evidence.sqlite --labels labels.csv --name calibrated_v1
+#
+# labels.csv: target_smiles, surrogate_smiles, label   (label on the module
+# score scale, e.g. 0 / 0.5 / 0.8 / 1.0)
+import itertools
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from ra_core.scoring import ScoringProfile, DEFAULT_PROFILE, FUSION_KEYS, save_profile
+from ra_core.evidence import EvidenceStore
+
+COMPONENT_COLUMNS = [f"ms_{k}" for k in FUSION_KEYS]
+
+
+# ---------- Data ----------
+def load_labeled_components(store: EvidenceStore, labels: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    Join labels to stored evidence on (target_smiles, surrogate_smiles).
+    Returns X (n_pairs x 5 components), y (n_pairs,) and the joined frame.
+    Labeled pairs without stored evidence are reported and dropped.
+    """
+    ev = store.load_frame().reset_index()
+    ev = ev.drop_duplicates(["target_smiles", "surrogate_smiles"], keep="last")
+    joined = labels.merge(ev, on=["target_smiles", "surrogate_smiles"], how="left", suffixes=("", "_ev"))
+    missing = joined[COMPONENT_COLUMNS[0]].isna()
+    if missing.any():
+        print(f"[CALIBRATION] {int(missing.sum())} labeled pairs have no stored evidence; run them first.")
+    joined = joined[~missing].reset_index(drop=True)
+    X = joined[COMPONENT_COLUMNS].to_numpy(dtype=float)
+    y = joined["label"].to_numpy(dtype=float)
+    return X, y, joined
+
+
+# ---------- Candidate grids ----------
+def simplex_grid(n: int, step: float) -> np.ndarray:
+    """All n-vectors of non-negative multiples of `step` summing to 1."""
+    k = int(round(1.0 / step))
+    rows = []
+    for cuts in itertools.combinations(range(k + n - 1), n - 1):
+        parts = np.diff((-1,) + cuts + (k + n - 1,)) - 1
+        rows.append(parts)
+    return np.asarray(rows, dtype=float) / k
+
+
+def edge_grid(step: float = 0.025, lo: float = 0.05, hi: float = 0.95, n_edges: int = 3) -> np.ndarray:
+    """Strictly descending edge tuples (highest bin first), one per row."""
+    vals = np.round(np.arange(lo, hi + 1e-9, step), 6)
+    combos = [c[::-1] for c in itertools.combinations(vals, n_edges)]
+    return np.asarray(combos, dtype=float)
+
+
+# ---------- Vectorized evaluation ----------
+def _predict(F: np.ndarray, edges: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """
+    F: (m, n) fused values; edges: (m, e) or (e,) descending; scores: (e,).
+    Returns predicted score values (m, n) - same rule as ScoringProfile.metabolic_score.
+    """
+    edges = np.broadcast_to(edges, (F.shape[0], len(scores)))
+    out = np.zeros_like(F)
+    done = np.zeros(F.shape, dtype=bool)
+    for j in range(len(scores)):
+        hit = (F >= edges[:, j:j + 1]) & ~done
+        out[hit] = scores[j]
+        done |= hit
+    return out
+
+
+def _class_index(v: np.ndarray, classes: np.ndarray) -> np.ndarray:
+    return np.abs(v[..., None] - classes).argmin(axis=-1)
+
+
+def agreement_metrics(P: np.ndarray, y: np.ndarray, classes: np.ndarray) -> dict:
+    """
+    Row-wise agreement of predictions P (m, n) with labels y (n,):
+    exact accuracy, mean absolute error, quadratic weighted kappa.
+    """
+    P = np.atleast_2d(P)
+    acc = (np.isclose(P, y)).mean(axis=1)
+    mae = np.abs(P - y).mean(axis=1)
+
+    K = len(classes)
+    pi = _class_index(P, classes)            # (m, n)
+    yi = _class_index(y, classes)            # (n,)
+    O = np.empty((P.shape[0], K, K))         # observed confusion (m, K, K)
+    for i in range(K):
+        sub = pi[:, yi == i]
+        for j in range(K):
+            O[:, i, j] = (sub == j).sum(axis=1)
+    n = len(y)
+    E = np.einsum("i,mj->mij", O.sum(axis=2)[0], O.sum(axis=1)) / max(n, 1)
+    idx = np.arange(K)
+    Wq = (idx[:, None] - idx[None, :]) ** 2 / max((K - 1) ** 2, 1)
+    num = (Wq * O).sum(axis=(1, 2))
+    den = (Wq * E).sum(axis=(1, 2))
+    qwk = np.where(den > 0, 1.0 - num / np.where(den > 0, den, 1.0), 1.0)
+    return {"accuracy": acc, "mae": mae, "qwk": qwk}
+
+
+def _objective(metrics: dict, metric: str) -> np.ndarray:
+    return -metrics["mae"] if metric == "mae" else metrics[metric]
+
+
+def _search(X, y, scores, base_edges, classes, *, weight_step, edge_step, metric, top_k, chunk):
+    """Two-stage grid search on (X, y); returns best weights, best edges and the config counts."""
+    # Stage 1: weights
+    W = simplex_grid(X.shape[1], weight_step)
+    obj = np.empty(len(W))
+    for i in range(0, len(W), chunk):
+        Wc = W[i:i + chunk]
+        obj[i:i + chunk] = _objective(agreement_metrics(_predict(Wc @ X.T, base_edges, scores), y, classes), metric)
+    order = np.argsort(-obj, kind="stable")[:top_k]
+
+    # Stage 2: edges for the best weight vectors
+    E = edge_grid(edge_step, n_edges=len(scores))
+    best = (-np.inf, None, None)
+    for wi in order:
+        f = W[wi] @ X.T                                   # (n,)
+        for i in range(0, len(E), chunk):
+            Ec = E[i:i + chunk]
+            F = np.broadcast_to(f, (len(Ec), len(f)))
+            o = _objective(agreement_metrics(_predict(F, Ec, scores), y, classes), metric)
+            j = int(np.argmax(o))
+            if o[j] > best[0]:
+                best = (float(o[j]), W[wi], Ec[j])
+    _, w_best, e_best = best
+    return w_best, e_best, len(W), len(E) * len(order)
+
+
+def fold_ids(y: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """Fold number (0..k-1) per pair, shuffled and stratified by label."""
+    rng = np.random.default_rng(seed)
+    # Shuffled, then grouped by label; dealing round-robin keeps folds within one pair in size
+    order = rng.permutation(len(y))
+    order = order[np.argsort(y[order], kind="stable")]
+    folds = np.empty(len(y), dtype=int)
+    folds[order] = np.arange(len(y)) % k
+    return folds
+
+
+def calibrate(
+    X: np.ndarray,
+    y: np.ndarray,
+    *,
+    base: ScoringProfile = DEFAULT_PROFILE,
+    weight_step: float = 0.05,
+    edge_step: float = 0.025,
+    metric: str = "qwk",
+    top_k: int = 20,
+    chunk: int = 2048,
+    folds: int = 5,
+    seed: int = 0,
+) -> dict:
+    """
+    Two-stage grid search:
+      1) every fusion-weight vector on the simplex grid, scored with base bins;
+      2) for the top_k weight vectors, every descending edge triple.
+    Bin score values are kept from `base`. Returns best profile + metrics.
+
+    The profile is fitted on all pairs, so "calibrated" is in-sample. With
+    folds >= 2 the search is repeated per fold on the other folds and the
+    held-out predictions are pooled into "cross_validated" (out-of-sample).
+    """
+    scores = np.array([s for _, s in base.metabolic_bins], dtype=float)
+    base_edges = np.array([e for e, _ in base.metabolic_bins], dtype=float)
+    classes = np.unique(np.concatenate([[0.0], scores]))
+    search = dict(weight_step=weight_step, edge_step=edge_step, metric=metric, top_k=top_k, chunk=chunk)
+
+    # Baseline (nothing fitted: in-sample = out-of-sample)
+    w0 = np.array([[base.fusion_weights.get(k, 0.0) for k in FUSION_KEYS]])
+    m0 = agreement_metrics(_predict(w0 @ X.T, base_edges, scores), y, classes)
+    baseline = {k: float(v[0]) for k, v in m0.items()}
+
+    w_best, e_best, n_w, n_e = _search(X, y, scores, base_edges, classes, **search)
+    profile = base.with_changes(
+        fusion_weights={k: float(round(w, 6)) for k, w in zip(FUSION_KEYS, w_best)},
+        metabolic_bins=tuple((float(e), float(s)) for e, s in zip(e_best, scores)),
+    )
+    mb = agreement_metrics(_predict((w_best @ X.T)[None, :], e_best, scores), y, classes)
+
+    cross_validated = None
+    folds = min(folds, len(y))
+    if folds >= 2:
+        fid = fold_ids(y, folds, seed)
+        oof = np.empty(len(y))
+        for f in range(folds):
+            test = fid == f
+            w_f, e_f, _, _ = _search(X[~test], y[~test], scores, base_edges, classes, **search)
+            oof[test] = _predict((w_f @ X[test].T)[None, :], e_f, scores)[0]
+        mcv = agreement_metrics(oof[None, :], y, classes)
+        cross_validated = {k: float(v[0]) for k, v in mcv.items()}
+
+    return {
+        "profile": profile,
+        "metric": metric,
+        "n_pairs": int(len(y)),
+        "n_weight_configs": int(n_w),
+        "n_edge_configs": int(n_e),
+        "baseline": baseline,
+        "calibrated": {k: float(v[0]) for k, v in mb.items()},
+        "folds": folds if cross_validated is not None else 0,
+        "cross_validated": cross_validated,
+    }
+
+
+def main(argv=None) -> int:
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Calibrate metabolic fusion weights and bins against labeled pairs")
+    ap.add_argument("--db", required=True, help="EvidenceStore SQLite file")
+    ap.add_argument("--labels", required=True, help="CSV: target_smiles, surrogate_smiles, label")
+    ap.add_argument("--name", required=True, help="name of the scoring profile to save")
+    ap.add_argument("--metric", choices=["qwk", "accuracy", "mae"], default="qwk")
+    ap.add_argument("--weight-step", type=float, default=0.05)
+    ap.add_argument("--edge-step", type=float, default=0.025)
+    ap.add_argument("--top-k", type=int, default=20)
+    ap.add_argument("--folds", type=int, default=5, help="k-fold out-of-sample check (0 = skip)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    labels = pd.read_csv(args.labels)
+    X, y, _ = load_labeled_components(EvidenceStore(args.db), labels)
+    if len(y) == 0:
+        print("[CALIBRATION] No labeled pairs with stored evidence.")
+        return 1
+
+    t0 = time.perf_counter()
+    res = calibrate(X, y, weight_step=args.weight_step, edge_step=args.edge_step,
+                    metric=args.metric, top_k=args.top_k, folds=args.folds, seed=args.seed)
+    dt = time.perf_counter() - t0
+    profile = res["profile"].with_changes(name=args.name)
+    path = save_profile(profile)
+
+    print(f"[CALIBRATION] {res['n_pairs']} pairs, {res['n_weight_configs']} weight + "
+          f"{res['n_edge_configs']} bin configs in {dt:.1f}s")
+    cv = res["cross_validated"]
+    for k in ("accuracy", "mae", "qwk"):
+        oos = f", {cv[k]:.3f} out-of-sample ({res['folds']}-fold)" if cv else ""
+        print(f"[CALIBRATION] {k:<8s} baseline {res['baseline'][k]:.3f} -> calibrated "
+              f"{res['calibrated'][k]:.3f} in-sample{oos}")
+    print(f"[CALIBRATION] weights {profile.fusion_weights}")
+    print(f"[CALIBRATION] bins    {profile.metabolic_bins}")
+    print(f"[CALIBRATION] saved profile '{profile.name}' -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/cascade.py
+#
+# Screening cascade for many surrogate candidates against one target. Stages
+# run cheapest first (Tanimoto, DART alert overlap - RDKit only, physchem
+# matches - PubChem, Toxtree, SyGMa/MCS metabolic similarity); after each stage
+# a candidate is dropped as soon as its best reachable total (scores so far +
+# the maximum the remaining modules can still contribute under the profile)
+# falls below `min_total` (default: a fraction of the profile's maximum total).
+# Only survivors reach the network, JVM and MCS stages. Target-side work (Toxtree,
+# SyGMa, DART, PubChem) is done once for the whole library.
+from dataclasses import dataclass
+from typing import Iterable, Tuple, Optional
+
+import pandas as pd
+
+from ra_core import core
+from ra_core.profiling import span
+from ra_core.metabolism import get_backend
+from ra_core.scoring import ScoringProfile, DEFAULT_PROFILE
+
+STAGES = ("tanimoto", "dart", "physchem", "toxtree", "metabolic")
+
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    # Minimum TOTAL SCORE (pchem + metabolic + structural) a survivor must be able
+    # to reach; None = min_total_fraction of the profile's maximum total
+    min_total: Optional[float] = None
+    min_total_fraction: float = 2 / 3
+    # Hard gates (in addition to the bound); 0 disables them
+    min_tanimoto: float = 0.0
+    min_physchem_matches: int = 0
+    # Stages to run, in order; omitted expensive stages keep their maximum in the bound
+    stages: Tuple[str, ...] = STAGES
+    sygma_cutoff: float = 0.01
+
+
+def _max_contributions(profile: ScoringProfile) -> dict:
+    wm, wd, wc = profile.structural_weights
+    return {
+        "pchem": max(profile.physchem_score_map.values(), default=0.0),
+        "metabolic": max((s for _, s in profile.metabolic_bins), default=0.0),
+        "mut": wm, "dart": wd, "cramer": wc,
+    }
+
+
+def _min_total(config: CascadeConfig, mx: dict) -> float:
+    if config.min_total is not None:
+        return config.min_total
+    return round(config.min_total_fraction * sum(mx.values()), 6)
+
+
+def _upper_bound(row: dict, mx: dict, profile: ScoringProfile) -> float:
+    """Scores known so far, remaining modules at their maximum."""
+    wm, wd, wc = profile.structural_weights
+    ub = row.get("pchem_score", mx["pchem"])
+    ub += row.get("metabolic_score", mx["metabolic"])
+    ub += wm * row["mut_score"] if "mut_score" in row else mx["mut"]
+    ub += wd * row["dart_score"] if "dart_score" in row else mx["dart"]
+    ub += wc * row["cramer_score"] if "cramer_score" in row else mx["cramer"]
+    return ub
+
+
+def run_cascade(
+    target_name: str,
+    target_smiles: str,
+    candidates: Iterable[Tuple[str, str]],
+    config: CascadeConfig = CascadeConfig(),
+    profile: ScoringProfile = None,
+) -> pd.DataFrame:
+    """
+    Screen (name, smiles) candidates against one target. Returns one row per
+    candidate with the module scores reached, the upper bound after the last
+    stage it ran, and `dropped_at` (stage name, or None for survivors).
+    Survivors are sorted first by total score.
+    """
+    profile = profile or DEFAULT_PROFILE
+    mx = _max_contributions(profile)
+    min_total = _min_total(config, mx)
+    stages = [s for s in STAGES if s in config.stages]
+
+    tmol = core.Chem.MolFromSmiles(target_smiles)
+    if tmol is None:
+        raise ValueError(f"Invalid target SMILES: {target_smiles}")
+
+    rows, alive = [], []
+    for name, smi in candidates:
+        row = {"surrogate_name": name, "surrogate_smiles": smi, "dropped_at": None, "reason": ""}
+        rows.append(row)
+        if core.Chem.MolFromSmiles(smi) is None:
+            row["dropped_at"], row["reason"] = "parse", "invalid SMILES"
+        else:
+            alive.append(row)
+    print(f"[CASCADE] {len(alive)} candidates (min_total={min_total:g}, stages={'/'.join(stages)})")
+
+    target = {}
+
+    def prune(stage: str, gate=None):
+        nonlocal alive
+        kept = []
+        for row in alive:
+            row["upper_bound"] = _upper_bound(row, mx, profile)
+            if gate is not None and not gate(row):
+                row["dropped_at"], row["reason"] = stage, "gate"
+            elif row["upper_bound"] < min_total:
+                row["dropped_at"], row["reason"] = stage, f"upper bound {row['upper_bound']:.3f} < {min_total:g}"
+            else:
+                kept.append(row)
+        print(f"[CASCADE] {stage:<10s} {len(alive)} -> {len(kept)}")
+        alive = kept
+
+    for stage in stages:
+        if not alive:
+            break
+        with span(f"cascade:{stage}", n_in=len(alive)):
+            if stage == "tanimoto":
+                for row in alive:
+                    row["tanimoto"] = core.calculate_tanimoto_similarity(target_smiles, row["surrogate_smiles"])
+                prune(stage, (lambda r: r["tanimoto"] >= config.min_tanimoto) if config.min_tanimoto > 0 else None)
+
+            elif stage == "dart":
+                # Alert bitsets for the whole library, one vectorized dissimilarity pass
+                reg = core.DART_REGISTRY
+                t_mask = core._dart_alert_mask(target_smiles)
+                s_masks = [core._dart_alert_mask(row["surrogate_smiles"]) for row in alive]
+                dis = reg.dissimilarity_many(reg.to_bool([t_mask] * len(alive)), reg.to_bool(s_masks))
+                for row, d in zip(alive, dis):
+                    row["dart_score"] = 1.0 - float(d)
+                prune(stage)
+
+            elif stage == "physchem":
+                target["props"] = target.get("props") or core._physchem_props(target_name, target_smiles, tmol)
+                for row in alive:
+                    sprops = core._physchem_props(row["surrogate_name"], row["surrogate_smiles"])
+                    row["physchem_matches"] = profile.physchem_matches(target["props"], sprops)
+                    row["pchem_score"] = profile.physchem_score(row["physchem_matches"])
+                gate = None
+                if config.min_physchem_matches > 0:
+                    gate = lambda r: r["physchem_matches"] >= config.min_physchem_matches
+                prune(stage, gate)
+
+            elif stage == "toxtree":
+                t_ames = core._get_ames_alerts(target_smiles)
+                t_path, _ = core._get_cramer_decision_path(target_smiles)
+                for row in alive:
+                    row["mut_score"] = core._mutagenicity_from_alerts(t_ames, core._get_ames_alerts(row["surrogate_smiles"]))
+                    s_path, _ = core._get_cramer_decision_path(row["surrogate_smiles"])
+                    row["cramer_score"], _ = core._calculate_path_divergence_score(t_path, s_path)
+                prune(stage)
+
+            elif stage == "metabolic":
+                t_mets = get_backend().metabolites(target_smiles, config.sygma_cutoff)
+                for row in alive:
+                    res = core.run_metabolic_similarity_analysis_v2(
+                        target_smiles, row["surrogate_smiles"], cutoff=config.sygma_cutoff,
+                        profile=profile, target_mets=t_mets,
+                    )
+                    row["metabolic_score"], row["metabolic_fused"] = res[0], res[10]
+                prune(stage)
+
+    # Survivors: structural / total from whatever ran (skipped stages count at their maximum)
+    for row in rows:
+        if "mut_score" in row and "dart_score" in row and "cramer_score" in row:
+            row["struct_score"] = profile.structural_score(row["mut_score"], row["dart_score"], row["cramer_score"])
+        if row["dropped_at"] is None:
+            row["total_score"] = _upper_bound(row, mx, profile)
+
+    cols = ["surrogate_name", "surrogate_smiles", "dropped_at", "reason", "upper_bound", "total_score",
+            "tanimoto", "physchem_matches", "pchem_score", "dart_score", "mut_score", "cramer_score",
+            "struct_score", "metabolic_score", "metabolic_fused"]
+    df = pd.DataFrame(rows).reindex(columns=cols)
+    df["survived"] = df["dropped_at"].isna()
+    df = df.sort_values(["survived", "total_score", "upper_bound"], ascending=False, kind="stable")
+    df.attrs["stage_counts"] = drop_summary(df)
+    n_surv = int(df["survived"].sum())
+    print(f"[CASCADE] {n_surv}/{len(df)} survivors")
+    return df.reset_index(drop=True)
+
+
+def drop_summary(df: pd.DataFrame) -> dict:
+    """Number of candidates dropped at each stage (plus survivors)."""
+    counts = df["dropped_at"].fillna("survived").value_counts()
+    order = ["parse", *STAGES, "survived"]
+    return {k: int(counts.get(k, 0)) for k in order if counts.get(k, 0)}
@@ -21,6 +21,19 @@ import time
 from rdkit.DataStructs import TanimotoSimilarity
 from typing import Iterable, Dict, List, Set, Union
 import xlsxwriter
+from contextlib import contextmanager
+from ra_core.profiling import span, Profiler, current_profiler, file_size
+from ra_core.governor import GovernorTimeout, rate_limit
+from ra_core.cache import tool_cache
+from ra_core import tool_runtime, replay
+from ra_core.fingerprints import FP_KINDS, FP_LABELS, fps_from_smiles, bulk_similarity, multi_fp_similarity_mols
+from ra_core.scoring import ScoringProfile, DEFAULT_PROFILE
+from ra_core.standardize import standardize, standardized_mol, canonical_key
+from ra_core.metabolism import Metabolite, get_backend
+from ra_core.reactive import compile_keywords, graded_similarity
+from ra_core.alert_registry import AlertRegistry
+from ra_core.tool_io import (read_columns, read_bt_reactions, scratch_dir,
+                             AMES_FLAG_COLUMN, CRAMER_PATH_COLUMN, CRAMER_CLASS_COLUMN)
 
 
 
@@ -43,15 +56,18 @@ import os, shutil
 APP_ROOT = Path(__file__).resolve().parents[1]   # .../readacross
 TOOLS_DIR = APP_ROOT / "tools"
 
-# JVMs (env overrides allowed)
-JAVA_BIN_DEFAULT  = shutil.which("java") or "/usr/bin/java"
-JAVA_BIN_TOXTREE  = os.environ.get("JAVA_BIN_TOXTREE", "/opt/java/temurin-11/bin/java")
-JAVA_BIN_BT       = os.environ.get("JAVA_BIN_BIOTRANSFORMER", JAVA_BIN_DEFAULT)
+# JVMs (env overrides allowed; discovery and version preference in ra_core.tool_runtime)
+JAVA_BIN_TOXTREE  = tool_runtime.find_java("toxtree")
+JAVA_BIN_BT       = tool_runtime.find_java("biotransformer")
 
 # Heaps (MB)
 TT_HEAP_MB = int(os.environ.get("TT_HEAP_MB", "512"))   # Toxtree
 BT_HEAP_MB = int(os.environ.get("BT_HEAP_MB", "1024"))  # BioTransformer
 
+# BioTransformer input: "smiles" passes the standardized SMILES as -ismi (no input
+# file); "sdf" writes an SDF into the scratch dir as before
+BT_INPUT = os.environ.get("RA_BT_INPUT", "smiles").strip().lower()
+
 def _find_first(root: Path, pattern: str) -> Path:
     """Find first file that matches pattern anywhere under root."""
     hits = sorted(root.rglob(pattern))
@@ -71,37 +87,64 @@ def _ensure_exists(p: Path, label: str):
     if not p.exists():
         raise FileNotFoundError(f"{label} not found at {p}")
 
-# --- BioTransformer: find JAR and working directory (must contain config.json)
-BT_JAR = _find_first(TOOLS_DIR / "biotransformer", "BioTransformer*.jar")
-_ensure_exists(BT_JAR, "BioTransformer JAR")
-
-# Prefer the JAR's folder; if it doesn't have config.json, try parent
-if (BT_JAR.parent / "config.json").exists():
-    BT_DIR = BT_JAR.parent
-elif (BT_JAR.parent.parent / "config.json").exists():
-    BT_DIR = BT_JAR.parent.parent
-else:
-    raise FileNotFoundError(
-        f"BioTransformer config.json not found near {BT_JAR}. "
-        f"Checked: {BT_JAR.parent} and {BT_JAR.parent.parent}"
-    )
-print(f"[JAR RESOLVE] BioTransformer working dir: {BT_DIR}")
-
-# --- Toxtree: find JAR and working directory (must contain ext/index.properties)
-TX_JAR = _find_first(TOOLS_DIR / "toxtree", "Toxtree*.jar")
-_ensure_exists(TX_JAR, "Toxtree JAR")
-
-# Prefer the JAR's folder; if it doesn't have ext/index.properties, try parent
-if (TX_JAR.parent / "ext" / "index.properties").exists():
-    TX_DIR = TX_JAR.parent
-elif (TX_JAR.parent.parent / "ext" / "index.properties").exists():
-    TX_DIR = TX_JAR.parent.parent
-else:
-    raise FileNotFoundError(
-        f"Toxtree ext/index.properties not found near {TX_JAR}. "
-        f"Checked: {TX_JAR.parent} and {TX_JAR.parent.parent}"
-    )
-print(f"[JAR RESOLVE] Toxtree working dir: {TX_DIR}")
+# Offline use (benchmarks, recorded-output replay): set RA_ALLOW_MISSING_TOOLS=1
+# to import without the JARs; the tool runners then simply fail/return empty.
+ALLOW_MISSING_TOOLS = os.environ.get("RA_ALLOW_MISSING_TOOLS", "").strip().lower() in {"1", "true", "yes"}
+
+def _resolve_biotransformer() -> tuple:
+    # --- BioTransformer: find JAR and working directory (must contain config.json)
+    bt_jar = _find_first(TOOLS_DIR / "biotransformer", "BioTransformer*.jar")
+    _ensure_exists(bt_jar, "BioTransformer JAR")
+
+    # Prefer the JAR's folder; if it doesn't have config.json, try parent
+    if (bt_jar.parent / "config.json").exists():
+        bt_dir = bt_jar.parent
+    elif (bt_jar.parent.parent / "config.json").exists():
+        bt_dir = bt_jar.parent.parent
+    else:
+        raise FileNotFoundError(
+            f"BioTransformer config.json not found near {bt_jar}. "
+            f"Checked: {bt_jar.parent} and {bt_jar.parent.parent}"
+        )
+    print(f"[JAR RESOLVE] BioTransformer working dir: {bt_dir}")
+    return bt_jar, bt_dir
+
+def _resolve_toxtree() -> tuple:
+    # --- Toxtree: find JAR and working directory (must contain ext/index.properties)
+    tx_jar = _find_first(TOOLS_DIR / "toxtree", "Toxtree*.jar")
+    _ensure_exists(tx_jar, "Toxtree JAR")
+
+    # Prefer the JAR's folder; if it doesn't have ext/index.properties, try parent
+    if (tx_jar.parent / "ext" / "index.properties").exists():
+        tx_dir = tx_jar.parent
+    elif (tx_jar.parent.parent / "ext" / "index.properties").exists():
+        tx_dir = tx_jar.parent.parent
+    else:
+        raise FileNotFoundError(
+            f"Toxtree ext/index.properties not found near {tx_jar}. "
+            f"Checked: {tx_jar.parent} and {tx_jar.parent.parent}"
+        )
+    print(f"[JAR RESOLVE] Toxtree working dir: {tx_dir}")
+    return tx_jar, tx_dir
+
+def _resolve_or_skip(resolver, label: str) -> tuple:
+    try:
+        return resolver()
+    except FileNotFoundError as e:
+        if not ALLOW_MISSING_TOOLS:
+            raise
+        print(f"[JAR RESOLVE] {label} unavailable, continuing (RA_ALLOW_MISSING_TOOLS): {e}")
+        return None, None
+
+BT_JAR, BT_DIR = _resolve_or_skip(_resolve_biotransformer, "BioTransformer")
+TX_JAR, TX_DIR = _resolve_or_skip(_resolve_toxtree, "Toxtree")
+
+# Launch profiles: every Java run goes through tool_runtime.run_tool
+tool_runtime.register(tool_runtime.ToolProfile(
+    "toxtree", TX_JAR, TX_DIR, JAVA_BIN_TOXTREE, TT_HEAP_MB,
+    jvm_args=("-Djava.awt.headless=true",), log_tag="TOXTREE"))
+tool_runtime.register(tool_runtime.ToolProfile(
+    "biotransformer", BT_JAR, BT_DIR, JAVA_BIN_BT, BT_HEAP_MB, log_tag="BT"))
 
 dart_alerts_dictionary = {
     "Category 1: Inorganics and Derivatives": {
@@ -1235,80 +1278,85 @@ flat_alert_lookup = {
     for category, alerts in dart_alerts_dictionary.items() for alert_id, info in alerts.items() if Chem.MolFromSmarts(info['smarts'])
 }
 
+# Integer IDs, category codes, bitset screening and the penalty matrix (ra_core.alert_registry)
+DART_REGISTRY = AlertRegistry.from_lookup(flat_alert_lookup)
+
 
 # In[3]:
 
 
 # --- Alert SUB-MODULE 1: AMES MUTAGENICITY ---
-def calculate_mutagenicity_score(target_smiles: str, surrogate_smiles: str) -> float:
-    target_alerts = _get_ames_alerts(target_smiles)
-    surrogate_alerts = _get_ames_alerts(surrogate_smiles)
+def _mutagenicity_from_alerts(target_alerts: list, surrogate_alerts: list) -> float:
+    """Ames alert overlap: 1.0 when neither has alerts, 0.0 when only one does."""
     target_set, surrogate_set = set(target_alerts), set(surrogate_alerts)
     denominator = max(len(target_set), len(surrogate_set))
     if denominator == 0: return 1.0
     if not target_alerts or not surrogate_alerts: return 0.0
     return len(target_set.intersection(surrogate_set)) / denominator
 
+def calculate_mutagenicity_score(target_smiles: str, surrogate_smiles: str) -> float:
+    return _mutagenicity_from_alerts(_get_ames_alerts(target_smiles), _get_ames_alerts(surrogate_smiles))
+
+# Toxtree Ames output column -> alert name
+AMES_ALERT_LOOKUP = {
+    'SA1_Ames': 'Acyl halides',
+    'SA2_Ames': 'Alkyl ester of sulphonic acid / phosphonic acid',
+    'SA3_Ames': 'N-methylol derivatives',
+    'SA4_Ames': 'Monohaloalkene',
+    'SA5_Ames': 'S or N mustard',
+    'SA6_Ames': 'propiolactones / propiosultones',
+    'SA7_Ames': 'epoxides and aziridines',
+    'SA8_Ames': 'Aliphatic halogens',
+    'SA9_Ames': 'alkyl nitrite',
+    'SA10_Ames': 'alpha, beta unsaturated carbonyls',
+    'SA11_Ames': 'Simple aldehyde',
+    'SA12_Ames': 'Quinones1 or Quinones2',
+    'SA13_Ames': 'Hydrazine not N-N=[O,N]',
+    'SA14_Ames': 'Aliphatic azo or azoxy',
+    'SA15_Ames': 'Isocyanate and isothiocyanate groups',
+    'SA16_Ames': 'Alkyl carbamate and thiocarbamate',
+    'SA18_Ames': 'Polycyclic Aromatic Hydrocarbons',
+    'SA19_Ames': 'Heterocyclic Polycyclic Aromatic Hydrocarbons',
+    'SA21_Ames': 'Alkyl and aryl N-nitroso groups',
+    'SA22_Ames': 'Azide of triazene',
+    'SA23_Ames': 'Aliphatic N-nitro',
+    'SA24_Ames': 'alpha, beta unsaturated alkoxy',
+    'SA25_Ames': 'Aromatic nitroso group',
+    'SA26_Ames': 'Aromatic ring N-oxide',
+    'SA27_Ames': 'Nitro aromatic',
+    'SA28_Ames': 'Primary aromatic amine, hydroxyl amine and its derived esters (with restrictions)',
+    'SA28bis_Ames': 'Aromatic mono- and dialkylamine',
+    'SA28ter_Ames': 'Aromatic N-acyl amine',
+    'SA29_Ames': 'Aromatic diazo',
+    'SA30_Ames': 'Coumarins and Furocoumarins',
+    'SA37_Ames': 'Pyrrolizidine Alkaloids',
+    'SA38_Ames': 'Alkenylbenzenes',
+    'SA39_Ames': 'Steroidal estrogens',
+    'SA57_Ames': 'DNA Intercalating Agents with a basic side chain',
+    'SA58_Ames': 'Haloalkene cysteine S-conjugates',
+    'SA59_Ames': 'Xanthones, Thioxanthones, Acridones',
+    'SA60_Ames': 'Flavonoids',
+    'SA61_Ames': 'Alkyl hydroperoxides',
+    'SA62_Ames': 'N-acyloxy-N-alkoxybenzamides',
+    'SA63_Ames': 'N-aryl-N-acetoxyacetamides',
+    'SA64_Ames': 'Hydroxamic acid derivatives',
+    'SA65_Ames': 'Halofuranones',
+    'SA66_Ames': 'Anthrones',
+    'SA67_Ames': 'Triphenylimidazole and related',
+    'SA68_Ames': '9,10 - dihydrophenanthrenes',
+    'SA69_Ames': 'Fluorinated quinolines'
+}
+
 def _get_ames_alerts(smiles: str) -> list[str]:
     df = _run_toxtree_module(smiles, "toxtree.plugins.ames.AmesMutagenicityRules")
     if df is None:
         return ["Error: Toxtree execution failed"]
-        
-    # Your existing mapping:
-    ames_alert_lookup = {
-        'SA1_Ames': 'Acyl halides',
-        'SA2_Ames': 'Alkyl ester of sulphonic acid / phosphonic acid',
-        'SA3_Ames': 'N-methylol derivatives',
-        'SA4_Ames': 'Monohaloalkene',
-        'SA5_Ames': 'S or N mustard',
-        'SA6_Ames': 'propiolactones / propiosultones',
-        'SA7_Ames': 'epoxides and aziridines',
-        'SA8_Ames': 'Aliphatic halogens',
-        'SA9_Ames': 'alkyl nitrite',
-        'SA10_Ames': 'alpha, beta unsaturated carbonyls',
-        'SA11_Ames': 'Simple aldehyde',
-        'SA12_Ames': 'Quinones1 or Quinones2',
-        'SA13_Ames': 'Hydrazine not N-N=[O,N]',
-        'SA14_Ames': 'Aliphatic azo or azoxy',
-        'SA15_Ames': 'Isocyanate and isothiocyanate groups',
-        'SA16_Ames': 'Alkyl carbamate and thiocarbamate',
-        'SA18_Ames': 'Polycyclic Aromatic Hydrocarbons',
-        'SA19_Ames': 'Heterocyclic Polycyclic Aromatic Hydrocarbons',
-        'SA21_Ames': 'Alkyl and aryl N-nitroso groups',
-        'SA22_Ames': 'Azide of triazene',
-        'SA23_Ames': 'Aliphatic N-nitro',
-        'SA24_Ames': 'alpha, beta unsaturated alkoxy',
-        'SA25_Ames': 'Aromatic nitroso group',
-        'SA26_Ames': 'Aromatic ring N-oxide',
-        'SA27_Ames': 'Nitro aromatic',
-        'SA28_Ames': 'Primary aromatic amine, hydroxyl amine and its derived esters (with restrictions)',
-        'SA28bis_Ames': 'Aromatic mono- and dialkylamine',
-        'SA28ter_Ames': 'Aromatic N-acyl amine',
-        'SA29_Ames': 'Aromatic diazo',
-        'SA30_Ames': 'Coumarins and Furocoumarins',
-        'SA37_Ames': 'Pyrrolizidine Alkaloids',
-        'SA38_Ames': 'Alkenylbenzenes',
-        'SA39_Ames': 'Steroidal estrogens',
-        'SA57_Ames': 'DNA Intercalating Agents with a basic side chain',
-        'SA58_Ames': 'Haloalkene cysteine S-conjugates',
-        'SA59_Ames': 'Xanthones, Thioxanthones, Acridones',
-        'SA60_Ames': 'Flavonoids',
-        'SA61_Ames': 'Alkyl hydroperoxides',
-        'SA62_Ames': 'N-acyloxy-N-alkoxybenzamides',
-        'SA63_Ames': 'N-aryl-N-acetoxyacetamides',
-        'SA64_Ames': 'Hydroxamic acid derivatives',
-        'SA65_Ames': 'Halofuranones',
-        'SA66_Ames': 'Anthrones',
-        'SA67_Ames': 'Triphenylimidazole and related',
-        'SA68_Ames': '9,10 - dihydrophenanthrenes',
-        'SA69_Ames': 'Fluorinated quinolines'
-    }
 
     try:
-        mut_col = 'Structural Alert for S. typhimurium  mutagenicity'
+        mut_col = AMES_FLAG_COLUMN
         if str(df.iloc[0].get(mut_col)).strip().upper() == "YES":
             triggered = [
-                name for col, name in ames_alert_lookup.items()
+                name for col, name in AMES_ALERT_LOOKUP.items()
                 if col in df.columns and str(df.iloc[0].get(col)).strip().upper() == "YES"
             ]
             return triggered if triggered else ["Alert identified (unspecified)"]
@@ -1328,32 +1376,24 @@ def calculate_dart_similarity_score(target_smiles: str, surrogate_smiles: str) -
     dissimilarity = _calculate_structural_dissimilarity(target_alerts, surrogate_alerts)
     return 1.0 - dissimilarity
 
+def _dart_alert_mask(smiles: str) -> int:
+    """Bitset of triggered DART alerts (bit i = DART_REGISTRY.ids[i])."""
+    return DART_REGISTRY.screen(Chem.MolFromSmiles(smiles))
+
 def _screen_for_dart_alerts(smiles: str) -> set:
-    triggered = set()
-    mol = Chem.MolFromSmiles(smiles)
-    if mol:
-        for alert_id, info in flat_alert_lookup.items():
-            if mol.HasSubstructMatch(info["smarts_pattern"]):
-                triggered.add(alert_id)
-    return triggered
-
-def _calculate_structural_dissimilarity(target_alerts: set, surrogate_alerts: set) -> float:
-    all_alerts = target_alerts.union(surrogate_alerts)
-    if not all_alerts: return 0.0
-    total_dissimilarity = 0
-    for alert_id in all_alerts:
-        in_target, in_surrogate = alert_id in target_alerts, alert_id in surrogate_alerts
-        if in_target == in_surrogate: min_penalty = 0.0
-        elif in_target: min_penalty = min([_calculate_penalty(alert_id, s_id) for s_id in surrogate_alerts] or [1.0])
-        else: min_penalty = min([_calculate_penalty(alert_id, t_id) for t_id in target_alerts] or [1.0])
-        total_dissimilarity += min_penalty
-    return total_dissimilarity / len(all_alerts)
+    return DART_REGISTRY.ids_of(_dart_alert_mask(smiles))
+
+def _calculate_structural_dissimilarity(target_alerts, surrogate_alerts) -> float:
+    """Alert-ID sets or registry bitsets; see ra_core.alert_registry for the penalty rule."""
+    if not isinstance(target_alerts, int):
+        target_alerts = DART_REGISTRY.mask_of(target_alerts)
+    if not isinstance(surrogate_alerts, int):
+        surrogate_alerts = DART_REGISTRY.mask_of(surrogate_alerts)
+    return DART_REGISTRY.dissimilarity(target_alerts, surrogate_alerts)
 
 def _calculate_penalty(a1_id: str, a2_id: str) -> float:
-    a1_info, a2_info = flat_alert_lookup[a1_id], flat_alert_lookup[a2_id]
-    if a1_info['subcategory'] == a2_info['subcategory']: return 0.25
-    if a1_info['category'] == a2_info['category']: return 0.5
-    return 1.0
+    if a1_id == a2_id: return 0.25   # same subcategory, as the id-based rule gave
+    return float(DART_REGISTRY.penalty[DART_REGISTRY.index[a1_id], DART_REGISTRY.index[a2_id]])
 
 
 # In[5]:
@@ -1390,50 +1430,46 @@ def _calculate_path_divergence_score(path1: str, path2: str) -> tuple:
     return 0.9, "Path lengths differ"
 
 # --- Generic Toxtree Helper ---
-from pathlib import Path
-import os, subprocess, tempfile, pandas as pd
-
-# Detect Java for tools
-JAVA_BIN_DEFAULT = os.environ.get("JAVA_BIN") or shutil.which("java")
-
-# Allow a *separate* Java for Toxtree (falls back to default if not set)
-JAVA_BIN_TOXTREE = (
-    os.environ.get("JAVA_BIN_TOXTREE")
-    or ("/usr/lib/jvm/java-11-openjdk-amd64/bin/java" if Path("/usr/lib/jvm/java-11-openjdk-amd64/bin/java").exists() else None)
-    or JAVA_BIN_DEFAULT
-)
+# Output columns each module's consumer reads; only these are parsed (None = all)
+TOXTREE_COLUMNS = {
+    "toxtree.plugins.ames.AmesMutagenicityRules": [AMES_FLAG_COLUMN, *AMES_ALERT_LOOKUP],
+    "toxtree.tree.cramer3.RevisedCramerDecisionTree": [CRAMER_PATH_COLUMN, CRAMER_CLASS_COLUMN],
+}
 
+@tool_cache("toxtree", cache_if=lambda df: df is not None)
 def _run_toxtree_module(smiles: str, module_klass: str) -> pd.DataFrame | None:
     """
     Run a Toxtree module (headless) on one SMILES.
     CWD = TX_DIR so Toxtree can see ext/index.properties and all plugin JARs.
     """
-    from pathlib import Path
-    import tempfile, subprocess, pandas as pd
-
     # TX_DIR and TX_JAR should already be resolved as:
     # TX_DIR = /app/tools/toxtree/Toxtree-v3.1.0.1851/Toxtree
     # TX_JAR = /app/tools/toxtree/.../Toxtree-3.1.0.1851.jar
+    if not tool_runtime.available("toxtree"):
+        print("[TOXTREE] Toxtree not installed; skipping", module_klass)
+        return None
 
-    with tempfile.TemporaryDirectory() as tmpd:
-        tmp = Path(tmpd)
-        in_csv  = tmp / "input.csv"
-        out_csv = tmp / "output.csv"
-        pd.DataFrame([{"SMILES": smiles}]).to_csv(in_csv, index=False)
-
-        cmd = [
-            JAVA_BIN_TOXTREE,                   # /opt/java/temurin-11/bin/java
-            f"-Xmx{TT_HEAP_MB}m",
-            "-Djava.awt.headless=true",
-            "-jar", str(TX_JAR),
-            "-n",
-            "-i", str(in_csv),                  # absolute path
-            "-o", str(out_csv),                 # absolute path
-            "-m", module_klass,                 # e.g. toxtree.plugins.ames.AmesMutagenicityRules
-        ]
-
-        print(f"[TOXTREE] CMD: {' '.join(cmd)}  CWD={TX_DIR}")
-        res = subprocess.run(cmd, cwd=str(TX_DIR), capture_output=True, text=True)
+    # Scratch dirs are pooled on tmpfs (RA_SCRATCH_ROOT); run_tool writes the one-row
+    # input (maybe a FIFO) for each launch
+    input_text = f"SMILES\n{smiles}\n"
+    with scratch_dir("toxtree") as tmp:
+        in_csv, out_csv = tmp / "input.csv", tmp / "output.csv"
+
+        with span("toxtree", tool=module_klass.rsplit(".", 1)[-1], compound=smiles) as rec:
+            rec["bytes_in"] = len(input_text)
+            try:
+                res = tool_runtime.run_tool(
+                    "toxtree",
+                    ["-n",
+                     "-i", str(in_csv),             # absolute path
+                     "-o", str(out_csv),            # absolute path
+                     "-m", module_klass],           # e.g. toxtree.plugins.ames.AmesMutagenicityRules
+                    rec=rec, expect=out_csv, inputs=input_text, input_path=in_csv,
+                )
+            except GovernorTimeout as e:
+                print("[TOXTREE]", e)
+                return None
+            rec["bytes_out"] = file_size(out_csv)
 
         if res.returncode != 0:
             print("[TOXTREE] returncode:", res.returncode)
@@ -1448,7 +1484,7 @@ def _run_toxtree_module(smiles: str, module_klass: str) -> pd.DataFrame | None:
             return None
 
         try:
-            return pd.read_csv(out_csv)
+            return read_columns(out_csv, TOXTREE_COLUMNS.get(module_klass))
         except Exception as e:
             print("[TOXTREE] Failed to read output.csv:", e)
             print("[TOXTREE] stdout:\n", res.stdout)
@@ -1463,12 +1499,7 @@ def get_mutagenicity_results(target_smiles: str, surrogate_smiles: str) -> tuple
     """Helper to get both the score and the alert lists for mutagenicity."""
     target_alerts = _get_ames_alerts(target_smiles) # Assumes this helper exists
     surrogate_alerts = _get_ames_alerts(surrogate_smiles)
-    target_set, surrogate_set = set(target_alerts), set(surrogate_alerts)
-    denominator = max(len(target_set), len(surrogate_set))
-    if denominator == 0: score = 1.0
-    elif not target_alerts or not surrogate_alerts: score = 0.0
-    else: score = len(target_set.intersection(surrogate_set)) / denominator
-    return score, target_alerts, surrogate_alerts
+    return _mutagenicity_from_alerts(target_alerts, surrogate_alerts), target_alerts, surrogate_alerts
 
 def get_dart_results(target_smiles: str, surrogate_smiles: str) -> tuple:
     """Helper to get the DART score and alert lists."""
@@ -1488,18 +1519,20 @@ def get_cramer_results(target_smiles: str, surrogate_smiles: str) -> tuple:
     return score, f"Class: {target_class}, Path: {target_path}", f"Class: {surrogate_class}, Path: {surrogate_path}", divergence
 
 # --- 3. FINAL INTEGRATED ANALYSIS FUNCTION with Detailed Reporting ---
-def run_structural_alert_analysis(target_smiles: str, surrogate_smiles: str) -> tuple:
+def run_structural_alert_analysis(target_smiles: str, surrogate_smiles: str, profile: ScoringProfile = None) -> tuple:
     """
     Runs all three structural alert modules and returns the final score and
     all underlying detailed results as a tuple.
+    Sub-score weights come from `profile` (default 50/30/20).
     """
+    profile = profile or DEFAULT_PROFILE
     # --- Gather all results ---
     mutagenicity_score, target_ames, surrogate_ames = get_mutagenicity_results(target_smiles, surrogate_smiles)
     dart_score, target_dart, surrogate_dart = get_dart_results(target_smiles, surrogate_smiles)
     cramer_score, target_cramer, surrogate_cramer, cramer_divergence = get_cramer_results(target_smiles, surrogate_smiles)
     
-    # --- Apply the 50/30/20 weighting ---
-    final_score = (mutagenicity_score * 0.5) + (dart_score * 0.3) + (cramer_score * 0.2)
+    # --- Apply the profile weighting (default 50/30/20) ---
+    final_score = profile.structural_score(mutagenicity_score, dart_score, cramer_score)
 
     # --- UPDATED: Return the individual values as a tuple ---
     return (
@@ -1559,31 +1592,57 @@ def get_pubchem_by_smiles(smiles: str) -> dict:
     xlogp_url = f"{base_url}/{encoded_smiles}/property/XLogP/txt"
     return _fetch_pubchem_props(mw_url, xlogp_url, smiles)
 
+def _pubchem_get(url, headers, rec=None):
+    # PubChem allows 5 requests/sec per host: every thread and worker process
+    # shares one token bucket (governor.rate_limit); replayed fixtures are free
+    if not replay.replaying():
+        rate_limit("pubchem", rec=rec)
+    return replay.http_get(url, timeout=5, headers=headers)
+
+@tool_cache("pubchem", cache_if=lambda r: any(v is not None for v in r.values()))
 def _fetch_pubchem_props(mw_url, xlogp_url, identifier):
     """Generic fetcher for PubChem properties with a 5-second timeout."""
     results = {'molecular_weight': None, 'xlogp': None}
     headers = {'User-Agent': 'Python-Toxicity-Tool'}
-    try:
-        mw_response = requests.get(mw_url, timeout=5, headers=headers)
-        if mw_response.status_code == 200:
-            results['molecular_weight'] = float(mw_response.text.strip())
-        
-        time.sleep(0.2) # To respect PubChem's rate limits (max 5 requests/sec)
-
-        xlogp_response = requests.get(xlogp_url, timeout=5, headers=headers)
-        if xlogp_response.status_code == 200:
-            results['xlogp'] = float(xlogp_response.text.strip())
-    except (requests.exceptions.RequestException, ValueError):
-        # Fail silently on network errors or conversion errors
-        pass
+    with span("pubchem", tool="PubChem", compound=identifier) as rec:
+        rec["bytes_out"] = 0
+        try:
+            mw_response = _pubchem_get(mw_url, headers, rec)
+            rec["bytes_out"] += len(mw_response.content or b"")
+            if mw_response.status_code == 200:
+                results['molecular_weight'] = float(mw_response.text.strip())
+
+            xlogp_response = _pubchem_get(xlogp_url, headers, rec)
+            rec["bytes_out"] += len(xlogp_response.content or b"")
+            if xlogp_response.status_code == 200:
+                results['xlogp'] = float(xlogp_response.text.strip())
+        except (requests.exceptions.RequestException, ValueError):
+            # Fail silently on network errors or conversion errors
+            pass
     return results
 
 # --- Main Comparison Function ---
-def run_physicochemical_analysis(target_name, target_smiles, surrogate_name, surrogate_smiles):
+def _physchem_props(name, smiles, mol=None) -> dict:
+    """RDKit properties for one compound, with PubChem MW/XLogP overriding when available."""
+    mol = mol if mol is not None else Chem.MolFromSmiles(smiles)
+    props = {
+        'MW': Descriptors.MolWt(mol),
+        'logP': Crippen.MolLogP(mol),
+        'Charge': rdmolops.GetFormalCharge(mol),
+        'is_VOC': is_voc(smiles)
+    }
+    # API Layer
+    api = get_pubchem_by_name(name) or get_pubchem_by_smiles(smiles)
+    if api.get('molecular_weight'): props['MW'] = api['molecular_weight']
+    if api.get('xlogp'): props['logP'] = api['xlogp']
+    return props
+
+def run_physicochemical_analysis(target_name, target_smiles, surrogate_name, surrogate_smiles, profile: ScoringProfile = None):
     """
     Performs a 1-to-1 physicochemical comparison and returns the score
     and the properties of the target and surrogate.
     """
+    profile = profile or DEFAULT_PROFILE
     print(f"\n--- Running Physicochemical Analysis ---")
     
     target_mol = Chem.MolFromSmiles(target_smiles)
@@ -1594,37 +1653,12 @@ def run_physicochemical_analysis(target_name, target_smiles, surrogate_name, sur
         # Return default values on failure
         return 0.0, {}, {}
 
-    target_props = {
-        'MW': Descriptors.MolWt(target_mol),
-        'logP': Crippen.MolLogP(target_mol),
-        'Charge': rdmolops.GetFormalCharge(target_mol),
-        'is_VOC': is_voc(target_smiles)
-    }
-    surrogate_props = {
-        'MW': Descriptors.MolWt(surr_mol),
-        'logP': Crippen.MolLogP(surr_mol),
-        'Charge': rdmolops.GetFormalCharge(surr_mol),
-        'is_VOC': is_voc(surrogate_smiles)
-    }
+    target_props = _physchem_props(target_name, target_smiles, target_mol)
+    surrogate_props = _physchem_props(surrogate_name, surrogate_smiles, surr_mol)
 
-    # API Layer
-    target_api = get_pubchem_by_name(target_name) or get_pubchem_by_smiles(target_smiles)
-    surrogate_api = get_pubchem_by_name(surrogate_name) or get_pubchem_by_smiles(surrogate_smiles)
-    
-    if target_api.get('molecular_weight'): target_props['MW'] = target_api['molecular_weight']
-    if target_api.get('xlogp'): target_props['logP'] = target_api['xlogp']
-    if surrogate_api.get('molecular_weight'): surrogate_props['MW'] = surrogate_api['molecular_weight']
-    if surrogate_api.get('xlogp'): surrogate_props['logP'] = surrogate_api['xlogp']
-
-    # Scoring
-    matches = 0
-    if abs(target_props['MW'] - surrogate_props['MW']) <= 0.20 * target_props['MW']: matches += 1
-    if abs(target_props['logP'] - surrogate_props['logP']) <= 1.0: matches += 1
-    if (target_props['Charge'] == 0) == (surrogate_props['Charge'] == 0): matches += 1
-    if target_props['is_VOC'] == surrogate_props['is_VOC']: matches += 1
-        
-    score_map = {4: 1.0, 3: 0.6, 2: 0.33}
-    final_score = score_map.get(matches, 0.0)
+    # Scoring (thresholds and score_map from the profile)
+    matches = profile.physchem_matches(target_props, surrogate_props)
+    final_score = profile.physchem_score(matches)
 
     # --- ADDED: The missing return statement ---
     return final_score, target_props, surrogate_props
@@ -1663,15 +1697,13 @@ def _get_sygma_metabolites(smiles: str, score_cutoff: float) -> dict:
 def _calculate_set_tanimoto(set1_smiles: list, set2_smiles: list) -> float:
     """Internal function to calculate unweighted set-based Tanimoto similarity."""
     if not set1_smiles or not set2_smiles: return 0.0
-    fps1 = [AllChem.GetMorganFingerprintAsBitVect(Chem.MolFromSmiles(s), 2, nBits=2048) for s in set1_smiles]
-    fps2 = [AllChem.GetMorganFingerprintAsBitVect(Chem.MolFromSmiles(s), 2, nBits=2048) for s in set2_smiles]
+    fps1 = fps_from_smiles(set1_smiles, "morgan")
+    fps2 = fps_from_smiles(set2_smiles, "morgan")
     sum_best_matches = 0
     for fp1 in fps1:
-        similarities = BulkTanimotoSimilarity(fp1, fps2)
-        sum_best_matches += max(similarities) if similarities else 0
+        sum_best_matches += bulk_similarity(fp1, fps2).max(initial=0.0)
     for fp2 in fps2:
-        similarities = BulkTanimotoSimilarity(fp2, fps1)
-        sum_best_matches += max(similarities) if similarities else 0
+        sum_best_matches += bulk_similarity(fp2, fps1).max(initial=0.0)
     denominator = len(fps1) + len(fps2)
     score = sum_best_matches / denominator if denominator > 0 else 0.0
     return score / 2.0
@@ -1738,116 +1770,99 @@ REACTIVE_PATHWAY_KEYWORDS = {
     "p-quinone_methide",
     "p-quinoneimine"
 }
+REACTIVE_MATCHER = compile_keywords(REACTIVE_PATHWAY_KEYWORDS)
 
 def standardize_smiles(smiles: str) -> str:
-    """Returns a standardized, neutralized, canonical tautomer SMILES."""
-    if not isinstance(smiles, str): return None
-    try:
-        mol = Chem.MolFromSmiles(smiles)
-        if not mol: return None
-        clean_mol = rdMolStandardize.Cleanup(mol)
-        parent_clean_mol = rdMolStandardize.FragmentParent(clean_mol)
-        uncharger = rdMolStandardize.Uncharger()
-        uncharged_parent_clean_mol = uncharger.uncharge(parent_clean_mol)
-        te = rdMolStandardize.TautomerEnumerator()
-        canonical_mol = te.Canonicalize(uncharged_parent_clean_mol)
-        return Chem.MolToSmiles(canonical_mol)
-    except:
-        return None
+    """Returns a standardized, neutralized, canonical tautomer SMILES (memoized; see ra_core.standardize)."""
+    return standardize(smiles, pipeline="biotransformer")
 
 def run_biotransformer_and_get_reactions(smiles: str) -> set[str]:
+    """Reaction names from the (cached) BioTransformer run for `smiles`."""
+    return {m.reaction for m in _run_biotransformer(smiles) or [] if m.reaction}
+
+@tool_cache("biotransformer", cache_if=lambda r: r is not None)
+def _run_biotransformer(smiles: str) -> list:
     """
-    Run BioTransformer (full distro required: JAR + config.json + KBs).
+    Run BioTransformer (full distro required: JAR + config.json + KBs) and return
+    its predicted metabolites as [Metabolite]. The same run feeds the reactive
+    pathway screen and, via ra_core.metabolism, metabolite-set similarity.
     CWD = BT_DIR so the app finds config.json, KBs, etc.
+    Returns None when the tool is missing, fails or times out (not cached).
     """
-    from pathlib import Path
-    import tempfile, subprocess, csv
-    reactions = set()
+    metabolites = []
+
+    if not tool_runtime.available("biotransformer"):
+        print("[BT] BioTransformer not installed; skipping")
+        return None
 
     standardized = standardize_smiles(smiles)
     if not standardized:
-        return reactions
+        return metabolites
 
     m = Chem.MolFromSmiles(standardized)
     if not m:
-        return reactions
+        return metabolites
 
-    with tempfile.TemporaryDirectory() as tmpd:
-        tmp = Path(tmpd)
-        in_sdf  = tmp / "input.sdf"
+    with scratch_dir("biotransformer") as tmp:
         out_csv = tmp / "output.csv"
-
-        w = Chem.SDWriter(str(in_sdf))
-        w.write(m)
-        w.close()
-
-        cmd = [
-            JAVA_BIN_BT,                     # e.g. /usr/bin/java (Java 17)
-            f"-Xmx{BT_HEAP_MB}m",
-            "-jar", str(BT_JAR),
-            "-k", "pred",
-            "-b", "allHuman",
-            "-isdf", str(in_sdf),           # absolute
-            "-ocsv", str(out_csv),          # absolute
-            "-s", "2",
-            "-cm", "3",
-        ]
-        print(f"[BT] CMD: {' '.join(cmd)}  CWD={BT_DIR}")
-        res = subprocess.run(cmd, cwd=str(BT_DIR), capture_output=True, text=True)
+        if BT_INPUT == "sdf":
+            in_sdf = tmp / "input.sdf"
+            w = Chem.SDWriter(str(in_sdf))
+            w.write(m)
+            w.close()
+            input_args = ["-isdf", str(in_sdf)]        # absolute
+        else:
+            input_args = ["-ismi", standardized]       # no input file at all
+
+        with span("biotransformer", tool="BioTransformer", compound=smiles) as rec:
+            rec["bytes_in"] = file_size(in_sdf) if BT_INPUT == "sdf" else len(standardized)
+            try:
+                res = tool_runtime.run_tool(
+                    "biotransformer",
+                    ["-k", "pred",
+                     "-b", "allHuman",
+                     *input_args,
+                     "-ocsv", str(out_csv),        # absolute
+                     "-s", "2",
+                     "-cm", "3"],
+                    rec=rec, expect=out_csv, inputs=in_sdf.read_text() if BT_INPUT == "sdf" else None,
+                )
+            except GovernorTimeout as e:
+                print("[BT]", e)
+                return None
+            rec["bytes_out"] = file_size(out_csv)
 
         if res.returncode != 0:
             print("[BT] returncode:", res.returncode)
             print("[BT] stdout:\n", res.stdout)
             print("[BT] stderr:\n", res.stderr)
-            return reactions
+            return None
 
         if not out_csv.exists():
             print(f"-> BioTransformer did not produce output CSV at: {out_csv}")
             print("[BT] stdout:\n", res.stdout)
             print("[BT] stderr:\n", res.stderr)
-            return reactions
+            return None
 
         try:
-            with out_csv.open(newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if "Reaction" in row and row["Reaction"]:
-                        reactions.add(row["Reaction"])
+            table = read_bt_reactions(out_csv)
+            for met, rxn in zip(table.smiles, table.reaction):
+                if rxn or met:
+                    metabolites.append(Metabolite(met, 1.0, rxn, "biotransformer"))
         except Exception as e:
             print("[BT] Failed reading output CSV:", e)
+            return None
 
-    return reactions
+    return metabolites
 
 def _extract_alerts(
     reactions: Iterable,
     reactive_keywords: Union[Iterable[str], Dict[str, Iterable[str]]]
 ) -> Set[str]:
-    alerts: Set[str] = set()
-    if not reactions:
-        return alerts
-
-    # Normalize reactive keywords
-    if isinstance(reactive_keywords, dict):
-        # canonical -> patterns
-        canon_to_patterns = {str(k).strip().lower(): [str(p).lower() for p in v] for k, v in reactive_keywords.items()}
-        for rxn in reactions:
-            text = str(rxn or "").lower()
-            if not text:
-                continue
-            for canon, pats in canon_to_patterns.items():
-                if any(p in text for p in pats):
-                    alerts.add(canon)
-    else:
-        # simple list/set of tokens; use each token as the canonical name
-        tokens = [str(k).strip().lower() for k in reactive_keywords]
-        for rxn in reactions:
-            text = str(rxn or "").lower()
-            if not text:
-                continue
-            for tok in tokens:
-                if tok and tok in text:
-                    alerts.add(tok)
-    return alerts
+    # Keyword structures are compiled once (ra_core.reactive); same hits as a per-keyword substring scan
+    if reactive_keywords is REACTIVE_PATHWAY_KEYWORDS:
+        return REACTIVE_MATCHER.extract(reactions)
+    return compile_keywords(reactive_keywords).extract(reactions)
 
 
 def run_reactive_metabolite_analysis(target_smiles: str, surrogate_smiles: str):
@@ -1870,6 +1885,20 @@ def run_reactive_metabolite_analysis(target_smiles: str, surrogate_smiles: str):
     # Always return sorted lists (stable, easy to serialize)
     return score, sorted(t_alerts), sorted(s_alerts)
 
+def reactive_pathway_counts(smiles: str) -> Dict[str, int]:
+    """Per-category count of BioTransformer reactions hitting REACTIVE_PATHWAY_KEYWORDS."""
+    return REACTIVE_MATCHER.count(m.reaction for m in _run_biotransformer(smiles) or [])
+
+def run_reactive_metabolite_counts(target_smiles: str, surrogate_smiles: str):
+    """
+    Graded counterpart of run_reactive_metabolite_analysis:
+      (similarity in [0,1], target_counts, surrogate_counts)
+    similarity is the weighted Jaccard of the category counts (1.0 if both have none).
+    """
+    t_counts = reactive_pathway_counts(target_smiles)
+    s_counts = reactive_pathway_counts(surrogate_smiles)
+    return graded_similarity(t_counts, s_counts), t_counts, s_counts
+
 def run_metabolic_similarity_analysis(target_smiles: str, surrogate_smiles: str, cutoff: float = 0.01) -> tuple:
     """
     Performs a complete metabolic similarity analysis and returns the score
@@ -1927,25 +1956,45 @@ import sygma
 from rdkit import Chem, DataStructs
 from rdkit.Chem import rdMolDescriptors as rdMD, rdFMCS
 
-def _get_sygma_metabolites(smiles: str, score_cutoff: float) -> dict:
-    """Internal function to run SyGMa and get high-plausibility metabolites."""
-    metabolites = {}
-    try:
-        scenario = sygma.Scenario([
+_SYGMA_SCENARIO = None
+
+def _sygma_scenario():
+    """Phase 1 + phase 2 SyGMa scenario, built once per process (rule compilation is slow)."""
+    global _SYGMA_SCENARIO
+    if _SYGMA_SCENARIO is None:
+        _SYGMA_SCENARIO = sygma.Scenario([
             [sygma.ruleset['phase1'], 1],
             [sygma.ruleset['phase2'], 1]
         ])
-        mol = Chem.MolFromSmiles(smiles)
-        if not mol: return {}
-        metabolic_tree = scenario.run(mol)
-        metabolic_tree.calc_scores()
-        metabolite_list = metabolic_tree.to_smiles()
-        for metabolite_smi, score in metabolite_list[1:]:
-            if score >= score_cutoff:
-                metabolites[metabolite_smi] = score
-        return metabolites
-    except Exception:
-        return {}
+    return _SYGMA_SCENARIO
+
+@tool_cache("sygma", cache_if=lambda r: r is not None)
+def _run_sygma(smiles: str) -> list:
+    """
+    SyGMa phase 1 + 2 metabolites of `smiles` as [Metabolite] (parent excluded,
+    by decreasing score); None when SyGMa raises (not cached).
+    """
+    with span("sygma", tool="SyGMa", compound=smiles) as rec:
+        try:
+            scenario = _sygma_scenario()
+            mol = Chem.MolFromSmiles(smiles)
+            if not mol: return []
+            metabolic_tree = scenario.run(mol)
+            metabolic_tree.calc_scores()
+            metabolites = [
+                Metabolite(Chem.MolToSmiles(e["SyGMa_metabolite"]), e["SyGMa_score"],
+                           str(e["SyGMa_pathway"]).strip().rstrip(";"), "sygma")
+                for e in metabolic_tree.to_list()[1:]
+            ]
+            rec["n_metabolites"] = len(metabolites)
+            return metabolites
+        except Exception as e:
+            print("[SYGMA]", type(e).__name__, e)
+            return None
+
+def _get_sygma_metabolites(smiles: str, score_cutoff: float) -> dict:
+    """Internal function to run SyGMa and get high-plausibility metabolites."""
+    return {m.smiles: m.score for m in _run_sygma(smiles) or [] if m.score >= score_cutoff}
 
 # ---------- Standardization (safe fallbacks if unavailable) ----------
 try:
@@ -1967,7 +2016,8 @@ except Exception:
         return m
 
 def _mol_from_smiles(smi: str) -> Chem.Mol:
-    return _standardize(Chem.MolFromSmiles(smi))
+    # Same steps as _standardize, memoized per SMILES across pairs (copy returned)
+    return standardized_mol(smi, pipeline="comparison")
 
 # ---------- Phase-II “aglycone” stripping (simple heuristics) ----------
 SMARTS_CONJUGATES = [
@@ -2028,8 +2078,7 @@ def _sim_mat_ecfp(molsA: List[Chem.Mol], molsB: List[Chem.Mol], radius=2, useFea
     fB = [_fp_ecfp_counts(m, radius, useFeatures) for m in molsB]
     S = np.zeros((len(fA), len(fB)), dtype=float)
     for i, fa in enumerate(fA):
-        for j, fb in enumerate(fB):
-            S[i, j] = DataStructs.TanimotoSimilarity(fa, fb)
+        S[i, :] = DataStructs.BulkTanimotoSimilarity(fa, fB)
     return S
 
 def _sim_mat_ap(molsA: List[Chem.Mol], molsB: List[Chem.Mol], nBits=4096):
@@ -2134,6 +2183,49 @@ def _assignment_score(S: np.ndarray, wA: np.ndarray, wB: np.ndarray) -> float:
             usedA.add(bi); usedB.add(bj)
         return float(total)
 
+# ---------- Metabolite de-duplication ----------
+def _standardize_metabolites(mets: List[Tuple[str, float]]):
+    """[(smi, score)] -> (mols, scores, identity keys), dropping unparseable SMILES."""
+    mols, scores, keys = [], [], []
+    for smi, sc in mets:
+        m = _mol_from_smiles(smi)
+        if m is not None:
+            mols.append(m); scores.append(float(sc)); keys.append(canonical_key(smi) or smi)
+    return mols, scores, keys
+
+def _merge_duplicates(mols: List[Chem.Mol], w: np.ndarray, keys: List[str], merge: str = "sum"):
+    """
+    Collapse metabolites with the same standardized InChIKey (SyGMa reaches the
+    same product by several paths). The first occurrence is kept; its weight is
+    the sum or max of the group's normalized weights ("none" = no merging).
+    Summing keeps the chamfer score of identical rows exactly; max renormalizes.
+    """
+    if merge == "none" or len(set(keys)) == len(keys):
+        return mols, w
+    first = {}
+    for i, k in enumerate(keys):
+        first.setdefault(k, i)
+    idx = list(first.values())
+    group = np.array([first[k] for k in keys])
+    merged = np.array([(w[group == i].sum() if merge == "sum" else w[group == i].max()) for i in idx])
+    if merge != "sum":
+        merged = merged / merged.sum()
+    return [mols[i] for i in idx], merged
+
+def _aglycone_matrix(S_full: np.ndarray, sim, molsA_ag, molsB_ag, rows, cols) -> np.ndarray:
+    """
+    S_full with the stripped rows (`rows`) and columns (`cols`) recomputed by
+    sim(listA, listB); every other cell compares unchanged molecules and is reused.
+    """
+    S = S_full.copy()
+    if rows:
+        S[rows, :] = sim([molsA_ag[i] for i in rows], molsB_ag)
+    stripped = set(rows)
+    keep = [i for i in range(len(molsA_ag)) if i not in stripped]
+    if cols and keep:
+        S[np.ix_(keep, cols)] = sim([molsA_ag[i] for i in keep], [molsB_ag[j] for j in cols])
+    return S
+
 # ---------- Top-level: compute fused metabolite-set similarity ----------
 def compare_metabolite_sets(
     parentA_smiles: str,
@@ -2144,10 +2236,13 @@ def compare_metabolite_sets(
     weight_temp: float = 1.75,
     aggregator: str = "chamfer",   # "chamfer" or "assignment"
     include_aglycone: bool = True,
-    use_mcs: bool = True
+    use_mcs: bool = True,
+    merge: str = "sum",            # duplicate weights: "sum", "max" or "none"
+    profile: ScoringProfile = None
 ) -> Dict[str, float]:
     """
     Returns a dict of component scores (0..1) and 'fused'.
+    Fusion weights come from `profile`; components do not depend on it.
     """
     # standardize parents
     pA = _mol_from_smiles(parentA_smiles)
@@ -2156,43 +2251,58 @@ def compare_metabolite_sets(
         return {"ecfp": 0, "fcfp": 0, "ap": 0, "delta": 0, "mcs": 0, "fused": 0}
 
     # standardize metabolites, keep plausibility
-    MA, wA = [], []
-    for smi, sc in metsA:
-        m = _mol_from_smiles(smi)
-        if m is not None:
-            MA.append(m); wA.append(float(sc))
-    MB, wB = [], []
-    for smi, sc in metsB:
-        m = _mol_from_smiles(smi)
-        if m is not None:
-            MB.append(m); wB.append(float(sc))
+    with span("standardize_metabolites", n=len(metsA) + len(metsB)):
+        MA, wA, kA = _standardize_metabolites(metsA)
+        MB, wB, kB = _standardize_metabolites(metsB)
     if len(MA) == 0 or len(MB) == 0:
         return {"ecfp": 0, "fcfp": 0, "ap": 0, "delta": 0, "mcs": 0, "fused": 0}
 
     wA = _normalize_weights(wA, temp=weight_temp)
     wB = _normalize_weights(wB, temp=weight_temp)
 
-    # Make aglycone sets (optional)
+    # Collapse duplicate metabolites before any O(|A|·|B|) work
+    with span("merge_metabolites", n_in=len(MA) + len(MB), merge=merge) as rec:
+        MA, wA = _merge_duplicates(MA, wA, kA, merge)
+        MB, wB = _merge_duplicates(MB, wB, kB, merge)
+        rec["n_out"] = len(MA) + len(MB)
+
+    # Make aglycone sets (optional). _strip_conjugates returns its input when
+    # nothing matched, so only the rows/columns of stripped metabolites differ
+    # from the full matrices.
     if include_aglycone:
         MA_ag = [_strip_conjugates(m) for m in MA]
         MB_ag = [_strip_conjugates(m) for m in MB]
+        rows = [i for i, (a, m) in enumerate(zip(MA_ag, MA)) if a is not m]
+        cols = [j for j, (b, m) in enumerate(zip(MB_ag, MB)) if b is not m]
+        include_aglycone = bool(rows or cols)
     else:
         MA_ag, MB_ag = MA, MB
 
     # Pairwise matrices (full)
-    S_ecfp  = _sim_mat_ecfp(MA, MB, radius=2, useFeatures=False)
-    S_fcfp  = _sim_mat_ecfp(MA, MB, radius=2, useFeatures=True)
-    S_ap    = _sim_mat_ap(MA, MB, nBits=4096)
-    S_delta = _sim_mat_delta(pA, MA, pB, MB, radius=2, useFeatures=False)
-    S_mcs   = _sim_mat_mcs(MA, MB, timeout=1) if use_mcs else np.zeros_like(S_ap)
-
-    # Pairwise matrices (aglycone)
+    pair_label = f"{parentA_smiles} | {parentB_smiles}"
+    with span("fingerprint_matrices", compound=pair_label, shape=(len(MA), len(MB))):
+        S_ecfp  = _sim_mat_ecfp(MA, MB, radius=2, useFeatures=False)
+        S_fcfp  = _sim_mat_ecfp(MA, MB, radius=2, useFeatures=True)
+        S_ap    = _sim_mat_ap(MA, MB, nBits=4096)
+        S_delta = _sim_mat_delta(pA, MA, pB, MB, radius=2, useFeatures=False)
+    with span("mcs", tool="rdFMCS", compound=pair_label, shape=(len(MA), len(MB)), skipped=not use_mcs):
+        S_mcs   = _sim_mat_mcs(MA, MB, timeout=1) if use_mcs else np.zeros_like(S_ap)
+
+    # Pairwise matrices (aglycone): recompute changed rows/columns only
     if include_aglycone:
-        S_ecfp_ag  = _sim_mat_ecfp(MA_ag, MB_ag, radius=2, useFeatures=False)
-        S_fcfp_ag  = _sim_mat_ecfp(MA_ag, MB_ag, radius=2, useFeatures=True)
-        S_ap_ag    = _sim_mat_ap(MA_ag, MB_ag, nBits=4096)
-        S_delta_ag = _sim_mat_delta(pA, MA_ag, pB, MB_ag, radius=2, useFeatures=False)
-        S_mcs_ag   = _sim_mat_mcs(MA_ag, MB_ag, timeout=1) if use_mcs else np.zeros_like(S_ap_ag)
+        with span("fingerprint_matrices_aglycone", compound=pair_label, shape=(len(MA_ag), len(MB_ag))) as rec:
+            S_ecfp_ag  = _aglycone_matrix(S_ecfp, lambda a, b: _sim_mat_ecfp(a, b, radius=2, useFeatures=False), MA_ag, MB_ag, rows, cols)
+            S_fcfp_ag  = _aglycone_matrix(S_fcfp, lambda a, b: _sim_mat_ecfp(a, b, radius=2, useFeatures=True), MA_ag, MB_ag, rows, cols)
+            S_ap_ag    = _aglycone_matrix(S_ap, lambda a, b: _sim_mat_ap(a, b, nBits=4096), MA_ag, MB_ag, rows, cols)
+            S_delta_ag = _aglycone_matrix(S_delta, lambda a, b: _sim_mat_delta(pA, a, pB, b, radius=2, useFeatures=False), MA_ag, MB_ag, rows, cols)
+            rec["recomputed_cells"] = len(rows) * len(MB) + (len(MA) - len(rows)) * len(cols)
+            rec["reused_cells"] = S_ap.size - rec["recomputed_cells"]
+        with span("mcs_aglycone", tool="rdFMCS", compound=pair_label, shape=(len(MA_ag), len(MB_ag)), skipped=not use_mcs):
+            S_mcs_ag   = _aglycone_matrix(S_mcs, lambda a, b: _sim_mat_mcs(a, b, timeout=1), MA_ag, MB_ag, rows, cols) if use_mcs else np.zeros_like(S_ap_ag)
+    elif MA_ag is not MA:
+        with span("fingerprint_matrices_aglycone", compound=pair_label, shape=(len(MA_ag), len(MB_ag)),
+                  recomputed_cells=0, reused_cells=S_ap.size):
+            pass
 
     agg = _assignment_score if aggregator == "assignment" else _chamfer_symmetric
 
@@ -2212,14 +2322,8 @@ def compare_metabolite_sets(
         else:
             comps[key] = val_full
 
-    # Simple fusion (tune on your calibration set)
-    fused = (
-        0.45*comps["ecfp"] +
-        0.20*comps["fcfp"] +
-        0.20*comps["ap"]   +
-        0.10*comps["delta"]+
-        0.05*comps["mcs"]
-    )
+    # Simple fusion (tune on your calibration set; weights live in the profile)
+    fused = (profile or DEFAULT_PROFILE).fuse(comps)
     comps["fused"] = float(fused)
     return comps
 
@@ -2245,11 +2349,19 @@ def run_metabolic_similarity_analysis_v2(
     cutoff: float = 0.01,
     *,
     weight_temp: float = 1.75,
-    aggregator: str = "chamfer"
+    aggregator: str = "chamfer",
+    profile: ScoringProfile = None,
+    target_mets: dict = None,
+    backend: str = None
 ):
-    # 1) Get high-plausibility metabolites (your existing function returns dict {smi: score})
-    target_mets = _get_sygma_metabolites(target_smiles, score_cutoff=cutoff)
-    sur_mets    = _get_sygma_metabolites(surrogate_smiles, score_cutoff=cutoff)
+    # 1) Get high-plausibility metabolites as {smi: score} from the metabolism backend
+    #    (RA_METABOLISM_BACKEND, default SyGMa); callers screening many surrogates
+    #    against one target can pass target_mets in
+    predictor = get_backend(backend)
+    if target_mets is None:
+        target_mets = predictor.metabolites(target_smiles, cutoff)
+    target_mets = dict(target_mets)
+    sur_mets    = predictor.metabolites(surrogate_smiles, cutoff)
 
     # --- coverage-aware parent fallback (keep dict shape!) ---
     coverage_flag = "ok"
@@ -2277,12 +2389,13 @@ def run_metabolic_similarity_analysis_v2(
         weight_temp=weight_temp,
         aggregator=aggregator,
         include_aglycone=True,
-        use_mcs=True
+        use_mcs=True,
+        profile=profile
     )
 
     # 4) Bin the fused score
     fused = float(comps.get("fused", 0.0))
-    assigned = _assign_score_value_v2(fused)
+    assigned = _assign_score_value_v2(fused, profile)
 
     # 5) Extract component scores (defensive .get() in case a key is missing)
     ecfp  = float(comps.get("ecfp",  0.0))
@@ -2308,12 +2421,9 @@ def run_metabolic_similarity_analysis_v2(
     )
 
 
-def _assign_score_value_v2(fused: float) -> float:
-    # Provisional mapping 
-    if fused >= 0.80: return 1.0
-    if fused >= 0.60: return 0.8
-    if fused >= 0.40: return 0.5
-    return 0.0
+def _assign_score_value_v2(fused: float, profile: ScoringProfile = None) -> float:
+    # Provisional mapping (default bins 0.80/0.60/0.40 -> 1.0/0.8/0.5)
+    return (profile or DEFAULT_PROFILE).metabolic_score(fused)
 
 
 # In[11]:
@@ -2333,44 +2443,101 @@ def calculate_tanimoto_similarity(smiles1: str, smiles2: str) -> float:
         float: The Tanimoto similarity score (between 0.0 and 1.0),
                or 0.0 if either SMILES is invalid.
     """
+    return calculate_multi_fp_similarity(smiles1, smiles2, kinds=("morgan",))["morgan"]
+
+def calculate_multi_fp_similarity(smiles1: str, smiles2: str, kinds=FP_KINDS) -> dict:
+    """
+    Parent Tanimoto for several fingerprint types (Morgan/ECFP4, FCFP4, Atom Pair,
+    Topological Torsion, MACCS) from a single parse of each SMILES.
+    Generators are shared (ra_core.fingerprints); "morgan" equals the classic
+    radius-2, 2048-bit Morgan bit vector. All 0.0 if either SMILES is invalid.
+    """
     try:
-        # Convert SMILES to RDKit molecule objects
         mol1 = Chem.MolFromSmiles(smiles1)
         mol2 = Chem.MolFromSmiles(smiles2)
 
         if mol1 is None or mol2 is None:
             print("   -> Warning: Could not parse one or both SMILES strings.")
-            return 0.0
+            return {k: 0.0 for k in kinds}
 
-        # Generate Morgan fingerprints for each molecule
-        # Radius 2 is a standard setting for general-purpose similarity
-        fp1 = AllChem.GetMorganFingerprintAsBitVect(mol1, 2, nBits=2048)
-        fp2 = AllChem.GetMorganFingerprintAsBitVect(mol2, 2, nBits=2048)
-
-        # Calculate and return the Tanimoto similarity
-        return TanimotoSimilarity(fp1, fp2)
+        return multi_fp_similarity_mols(mol1, mol2, kinds)
 
     except:
-        return 0.0
+        return {k: 0.0 for k in kinds}
 
 
 # In[13]:
 
 
-def run_full_read_across_assessment(target_name: str, target_smiles: str, surrogate_name: str, surrogate_smiles: str) -> pd.DataFrame:
+MODULES = ("physchem", "metabolic", "structural_alerts", "reactive_metabolites", "tanimoto")
+
+@contextmanager
+def _module_step(module: str, progress=None):
+    """Span for one pipeline module, reporting start/done to an optional progress(module, state) callback."""
+    if progress: progress(module, "running")
+    with span(f"module:{module}"):
+        yield
+    if progress: progress(module, "done")
+
+def run_full_read_across_assessment(target_name: str, target_smiles: str, surrogate_name: str, surrogate_smiles: str,
+                                    *, profile: ScoringProfile = None, evidence_store=None, progress=None) -> pd.DataFrame:
     """
     Executes all analysis modules and compiles a comprehensive, report-ready DataFrame.
+
+    Per-stage timings (tool, compound, duration, cache hit, bytes in/out, RSS)
+    are attached as ``df.attrs["timings"]`` (list of span dicts); see
+    ra_core.profiling for summaries and Chrome trace export. Tools whose run
+    failed for this pair (scored as if they found nothing) are listed in
+    ``df.attrs["tool_failures"]``.
+
+    Scores use `profile` (ra_core.scoring; default weights/bins). The raw,
+    profile-independent evidence is attached as ``df.attrs["evidence"]`` and,
+    if an ra_core.evidence.EvidenceStore is given, persisted for re-scoring.
+
+    `progress(module, state)` is called as each of MODULES starts ("running")
+    and finishes ("done"); used by ra_core.jobs for per-module progress.
     """
-    # --- Run all individual modules to get scores and detailed results ---
-    pchem_score, target_pchem_props, surrogate_pchem_props = run_physicochemical_analysis(target_name, target_smiles, surrogate_name, surrogate_smiles)
-    (metabolic_score, target_met_count, surrogate_met_count, target_met_list, surrogate_met_list, ms_ecfp, ms_fcfp, ms_ap, ms_delta, ms_mcs, ms_fused) = run_metabolic_similarity_analysis_v2(target_smiles, surrogate_smiles)
-    struct_score, mut_score, dart_score, cramer_score, target_ames, surrogate_ames, target_dart, surrogate_dart, cramer_divergence, target_cramer, surrogate_cramer= run_structural_alert_analysis(target_smiles, surrogate_smiles)
-    reactive_metabolite_match, target_alerts, surrogate_alerts = run_reactive_metabolite_analysis(target_smiles, surrogate_smiles)
-    tanimoto_score = calculate_tanimoto_similarity(target_smiles, surrogate_smiles)
+    from ra_core.evidence import build_pair_evidence
+    profile = profile or DEFAULT_PROFILE
+    # This pair's spans, also forwarded to an outer profiler (e.g. a batch run)
+    # that concurrent pairs share
+    prof = Profiler(label=f"{target_name} vs {surrogate_name}", parent=current_profiler())
+    with prof:
+        with span("pair", compound=f"{target_smiles} | {surrogate_smiles}"):
+            # --- Run all individual modules to get scores and detailed results ---
+            with _module_step("physchem", progress):
+                pchem_score, target_pchem_props, surrogate_pchem_props = run_physicochemical_analysis(target_name, target_smiles, surrogate_name, surrogate_smiles, profile=profile)
+            with _module_step("metabolic", progress):
+                (metabolic_score, target_met_count, surrogate_met_count, target_met_list, surrogate_met_list, ms_ecfp, ms_fcfp, ms_ap, ms_delta, ms_mcs, ms_fused) = run_metabolic_similarity_analysis_v2(target_smiles, surrogate_smiles, profile=profile)
+            with _module_step("structural_alerts", progress):
+                struct_score, mut_score, dart_score, cramer_score, target_ames, surrogate_ames, target_dart, surrogate_dart, cramer_divergence, target_cramer, surrogate_cramer= run_structural_alert_analysis(target_smiles, surrogate_smiles, profile=profile)
+            with _module_step("reactive_metabolites", progress):
+                reactive_metabolite_match, target_alerts, surrogate_alerts = run_reactive_metabolite_analysis(target_smiles, surrogate_smiles)
+            with _module_step("tanimoto", progress):
+                fp_sims = calculate_multi_fp_similarity(target_smiles, surrogate_smiles)
+                tanimoto_score = fp_sims["morgan"]
 
     # --- Calculate Final Total Score ---
     total_score = pchem_score + metabolic_score + struct_score
 
+    # --- Raw evidence (for re-scoring under other profiles) ---
+    evidence = build_pair_evidence(
+        target_name, target_smiles, surrogate_name, surrogate_smiles,
+        target_props=target_pchem_props, surrogate_props=surrogate_pchem_props,
+        mut_score=mut_score, dart_score=dart_score, cramer_score=cramer_score,
+        target_ames=target_ames, surrogate_ames=surrogate_ames,
+        target_dart=target_dart, surrogate_dart=surrogate_dart,
+        cramer_divergence=cramer_divergence, target_cramer=target_cramer, surrogate_cramer=surrogate_cramer,
+        components={"ecfp": ms_ecfp, "fcfp": ms_fcfp, "ap": ms_ap, "delta": ms_delta, "mcs": ms_mcs},
+        target_mets=target_met_list, surrogate_mets=surrogate_met_list,
+        tanimoto=tanimoto_score, fp_similarity=fp_sims, reactive_match=reactive_metabolite_match,
+        target_reactive=target_alerts, surrogate_reactive=surrogate_alerts,
+        live_total=total_score, profile=profile,
+    )
+    if evidence_store is not None:
+        evidence_store.put(evidence)
+    wm, wd, wc = profile.structural_weights
+
     # --- Build the report row by row ---
     report = []
     report.append({'Parameter': 'Target Name', 'Target Result': target_name, 'Surrogate Result': ''})
@@ -2380,6 +2547,8 @@ def run_full_read_across_assessment(target_name: str, target_smiles: str, surrog
 
     report.append({'Parameter': '---', 'Target Result': '', 'Surrogate Result': ''})
     report.append({'Parameter': 'Generic Tanimoto Similarity', 'Target Result': tanimoto_score, 'Surrogate Result': tanimoto_score})
+    for kind, sim in fp_sims.items():
+        report.append({'Parameter': f'  - {FP_LABELS[kind]}', 'Target Result': sim, 'Surrogate Result': sim})
     report.append({'Parameter': '---', 'Target Result': '', 'Surrogate Result': ''})
 
     # Physicochemical Section
@@ -2405,13 +2574,13 @@ def run_full_read_across_assessment(target_name: str, target_smiles: str, surrog
     
     # Structural Alerts Section
     report.append({'Parameter': 'Structural Alert Module Score', 'Target Result': struct_score, 'Surrogate Result': struct_score})
-    report.append({'Parameter': '  - Mutagenicity Similarity Score (50%)', 'Target Result': mut_score, 'Surrogate Result': mut_score})
+    report.append({'Parameter': f'  - Mutagenicity Similarity Score ({wm:.0%})', 'Target Result': mut_score, 'Surrogate Result': mut_score})
     report.append({'Parameter': '    - Target Ames Alerts', 'Target Result': ', '.join(target_ames) or 'None', 'Surrogate Result': ''})
     report.append({'Parameter': '    - Surrogate Ames Alerts', 'Target Result': '', 'Surrogate Result': ', '.join(surrogate_ames) or 'None'})
-    report.append({'Parameter': '  - DART Similarity Score (30%)', 'Target Result': dart_score, 'Surrogate Result': dart_score})
+    report.append({'Parameter': f'  - DART Similarity Score ({wd:.0%})', 'Target Result': dart_score, 'Surrogate Result': dart_score})
     report.append({'Parameter': '    - Target DART Alerts', 'Target Result': ', '.join(target_dart) or 'None', 'Surrogate Result': ''})
     report.append({'Parameter': '    - Surrogate DART Alerts', 'Target Result': '', 'Surrogate Result': ', '.join(surrogate_dart) or 'None'})
-    report.append({'Parameter': '  - Cramer Path Similarity Score (20%)', 'Target Result': cramer_score, 'Surrogate Result': cramer_score})
+    report.append({'Parameter': f'  - Cramer Path Similarity Score ({wc:.0%})', 'Target Result': cramer_score, 'Surrogate Result': cramer_score})
     report.append({'Parameter': '    - Cramer Path Divergence', 'Target Result': cramer_divergence, 'Surrogate Result': cramer_divergence})
 
     # NEW: explicit Cramer class + divergence point
@@ -2427,7 +2596,13 @@ def run_full_read_across_assessment(target_name: str, target_smiles: str, surrog
     report.append({'Parameter': '---', 'Target Result': '', 'Surrogate Result': ''})
     report.append({'Parameter': 'TOTAL SCORE (Sum of Modules)', 'Target Result': total_score, 'Surrogate Result': total_score})
 
-    return pd.DataFrame(report).set_index('Parameter')
+    df = pd.DataFrame(report).set_index('Parameter')
+    df.attrs["timings"] = list(prof.spans)
+    df.attrs["evidence"] = evidence
+    # Tool runs that failed or timed out for this pair (not PubChem: RDKit values are its designed fallback)
+    df.attrs["tool_failures"] = sorted({s["stage"] for s in prof.spans
+                                        if s.get("failed") and s["stage"] in ("toxtree", "biotransformer", "sygma")})
+    return df
 
 
 # In[14]:
@@ -2520,13 +2695,19 @@ def _df_to_sections(df_vertical: pd.DataFrame) -> list:
     if ident_rows:
         sections.append(("Identity", ident_rows))
 
-    # Generic Tanimoto (if present)
+    # Generic Tanimoto (if present) + per-fingerprint sub-rows that follow it
+    tanimoto_rows = set()
     if "Generic Tanimoto Similarity" in df_vertical.index:
         row = df_vertical.loc["Generic Tanimoto Similarity"]
-        sections.append((
-            "Generic Tanimoto",
-            [("Tanimoto (parent)", row.get(tcol, ""), row.get(scol, ""))]
-        ))
+        rows = [("Tanimoto (parent)", row.get(tcol, ""), row.get(scol, ""))]
+        params = list(df_vertical.index)
+        for param in params[params.index("Generic Tanimoto Similarity") + 1:]:
+            if not _looks_like_subitem(param):
+                break
+            sub = df_vertical.loc[param]
+            rows.append((param.strip().lstrip("- ").strip(), sub.get(tcol, ""), sub.get(scol, "")))
+            tanimoto_rows.add(param)
+        sections.append(("Generic Tanimoto", rows))
 
     # Module sections (walk rows in order)
     current = None
@@ -2539,7 +2720,7 @@ def _df_to_sections(df_vertical: pd.DataFrame) -> list:
         current, bucket = None, []
 
     for param, row in df_vertical.iterrows():  # <-- iterrows fixes the unpack error
-        if param in _IDENTITY_KEYS or param == "Generic Tanimoto Similarity" or _is_break(param):
+        if param in _IDENTITY_KEYS or param == "Generic Tanimoto Similarity" or param in tanimoto_rows or _is_break(param):
             continue
 
         if param in _TOP_LEVEL_ANCHORS:
@@ -2632,7 +2813,9 @@ def create_excel_report(
     pairs: List[Tuple[str, str, str, str]],
     out_path: str,
     *,
-    sheet_name_fmt: Optional[str] = "{i:02d} - {tname} vs {sname}"
+    sheet_name_fmt: Optional[str] = "{i:02d} - {tname} vs {sname}",
+    executor=None,
+    max_workers: Optional[int] = None,
 ):
     """
     Run your full assessment for each (target_name, target_smiles, surrogate_name, surrogate_smiles),
@@ -2647,23 +2830,23 @@ def create_excel_report(
     sheet_name_fmt : str
         Optional format for sheet names (31 char limit applies after formatting).
         Tokens: {i}, {tname}, {sname}
+    executor, max_workers :
+        Pairs are computed concurrently (ra_core.batch.iter_pair_results) and
+        sheets are written here, in input order, as results become available.
     """
+    from ra_core.batch import iter_pair_results
     wb = xlsxwriter.Workbook(out_path)
 
-    for i, (tname, tsmi, sname, ssmi) in enumerate(pairs, start=1):
-        # Run your existing end-to-end function (returns vertical DF)
-        df_vertical = run_full_read_across_assessment(tname, tsmi, sname, ssmi)
-
+    for i, (tname, tsmi, sname, ssmi), df_vertical in iter_pair_results(pairs, executor=executor, max_workers=max_workers):
         # Convert to sections
         sections = _df_to_sections(df_vertical)
 
         # Build a safe sheet name
         safe_t = (tname or "Target")[:15]
         safe_s = (sname or "Surrogate")[:15]
-        sheet_name = sheet_name_fmt.format(i=i, tname=safe_t, sname=safe_s)
+        sheet_name = sheet_name_fmt.format(i=i + 1, tname=safe_t, sname=safe_s)
 
         # Write sheet
         _write_vertical_sheet(wb, sheet_name, sections)
 
     wb.close()
-
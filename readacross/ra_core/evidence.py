@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/evidence.py
+#
+# Layer 1 of scoring: raw per-module evidence for a pair (alert sets, Cramer
+# paths, metabolite component similarities, physchem properties), persisted in
+# SQLite. Layer 2 (ra_core.scoring.rescore_frame) turns stored evidence into
+# scores under any ScoringProfile without touching Toxtree/SyGMa/MCS again.
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Iterable
+
+import pandas as pd
+
+from ra_core.scoring import ScoringProfile, DEFAULT_PROFILE, rescore_frame
+
+IDENTITY_COLUMNS = ["target_name", "target_smiles", "surrogate_name", "surrogate_smiles"]
+
+# Profile-independent numbers that rescore_frame() needs. physchem_ok = 0 when
+# the live run could not compute properties (invalid SMILES) and scored 0.
+NUMERIC_COLUMNS = [
+    "mut_score", "dart_score", "cramer_score",
+    "ms_ecfp", "ms_fcfp", "ms_ap", "ms_delta", "ms_mcs",
+    "t_mw", "s_mw", "t_logp", "s_logp", "t_charge", "s_charge", "t_voc", "s_voc",
+    "physchem_ok", "tanimoto", "reactive_match",
+]
+# The live run's total and the profile it used, for verify_rescore()
+LIVE_COLUMNS = ["live_total", "profile"]
+
+
+def pair_key(target_name, target_smiles, surrogate_name, surrogate_smiles) -> str:
+    # Names matter: PubChem properties are looked up by name first
+    raw = "\t".join(str(x or "") for x in (target_name, target_smiles, surrogate_name, surrogate_smiles))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def build_pair_evidence(
+    target_name, target_smiles, surrogate_name, surrogate_smiles,
+    *, target_props: dict, surrogate_props: dict,
+    mut_score, dart_score, cramer_score,
+    target_ames, surrogate_ames, target_dart, surrogate_dart,
+    cramer_divergence, target_cramer, surrogate_cramer,
+    components: dict, target_mets: list, surrogate_mets: list,
+    tanimoto, reactive_match, target_reactive, surrogate_reactive,
+    fp_similarity: dict = None, live_total: float = None, profile: ScoringProfile = None,
+) -> dict:
+    """Flatten module outputs into one evidence record (numeric columns + JSON details)."""
+    rec = {
+        "pair_key": pair_key(target_name, target_smiles, surrogate_name, surrogate_smiles),
+        "target_name": target_name, "target_smiles": target_smiles,
+        "surrogate_name": surrogate_name, "surrogate_smiles": surrogate_smiles,
+        "mut_score": float(mut_score), "dart_score": float(dart_score), "cramer_score": float(cramer_score),
+        "tanimoto": float(tanimoto), "reactive_match": float(reactive_match),
+    }
+    for k in ("ecfp", "fcfp", "ap", "delta", "mcs"):
+        rec[f"ms_{k}"] = float(components.get(k, 0.0))
+    for prefix, props in (("t", target_props), ("s", surrogate_props)):
+        rec[f"{prefix}_mw"] = props.get("MW")
+        rec[f"{prefix}_logp"] = props.get("logP")
+        rec[f"{prefix}_charge"] = props.get("Charge")
+        rec[f"{prefix}_voc"] = float(bool(props.get("is_VOC")))
+    rec["physchem_ok"] = float(bool(target_props) and bool(surrogate_props))
+    rec["live_total"] = float(live_total) if live_total is not None else None
+    rec["profile"] = json.dumps(profile.to_dict(), sort_keys=True) if profile is not None else None
+    rec["details"] = {
+        "target_props": target_props, "surrogate_props": surrogate_props,
+        "target_ames": list(target_ames), "surrogate_ames": list(surrogate_ames),
+        "target_dart": list(target_dart), "surrogate_dart": list(surrogate_dart),
+        "cramer_divergence": cramer_divergence,
+        "target_cramer": target_cramer, "surrogate_cramer": surrogate_cramer,
+        "target_metabolites": list(target_mets), "surrogate_metabolites": list(surrogate_mets),
+        "target_reactive": list(target_reactive), "surrogate_reactive": list(surrogate_reactive),
+        "fp_similarity": dict(fp_similarity or {}),
+    }
+    return rec
+
+
+class EvidenceStore:
+    """SQLite-backed store of pair evidence records (one row per pair_key)."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        cols = ", ".join(f"{c} TEXT" for c in IDENTITY_COLUMNS) + ", " + ", ".join(f"{c} REAL" for c in NUMERIC_COLUMNS)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS pair_evidence (pair_key TEXT PRIMARY KEY, {cols},"
+            " live_total REAL, profile TEXT, details TEXT, created REAL)"
+        )
+        # Stores written before a column existed: add it (NULL for old rows)
+        have = {r[1] for r in self._conn.execute("PRAGMA table_info(pair_evidence)")}
+        for c in NUMERIC_COLUMNS + LIVE_COLUMNS:
+            if c not in have:
+                self._conn.execute(f"ALTER TABLE pair_evidence ADD COLUMN {c} {'TEXT' if c == 'profile' else 'REAL'}")
+        self._conn.commit()
+
+    def put(self, rec: dict) -> None:
+        cols = ["pair_key"] + IDENTITY_COLUMNS + NUMERIC_COLUMNS + LIVE_COLUMNS + ["details", "created"]
+        vals = [rec["pair_key"]] + [rec.get(c) for c in IDENTITY_COLUMNS + NUMERIC_COLUMNS + LIVE_COLUMNS]
+        vals += [json.dumps(rec.get("details", {}), default=str), time.time()]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO pair_evidence ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                vals,
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM pair_evidence WHERE pair_key = ?", (key,))
+            row = cur.fetchone()
+            names = [d[0] for d in cur.description]
+        if row is None:
+            return None
+        rec = dict(zip(names, row))
+        rec["details"] = json.loads(rec["details"] or "{}")
+        return rec
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pair_evidence").fetchone()[0]
+
+    def load_frame(self, keys: Iterable[str] = None, *, with_details: bool = False) -> pd.DataFrame:
+        """Numeric evidence as a DataFrame indexed by pair_key (optionally restricted to `keys`)."""
+        cols = ["pair_key"] + IDENTITY_COLUMNS + NUMERIC_COLUMNS + LIVE_COLUMNS + (["details"] if with_details else [])
+        sql = f"SELECT {', '.join(cols)} FROM pair_evidence"
+        with self._lock:
+            df = pd.read_sql_query(sql, self._conn)
+        df = df.set_index("pair_key")
+        if keys is not None:
+            df = df.loc[df.index.intersection(list(keys))]
+        return df
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def rescore(store_or_frame, profile: ScoringProfile = DEFAULT_PROFILE) -> pd.DataFrame:
+    """Identity columns + module scores/total for every stored pair under `profile`."""
+    ev = store_or_frame.load_frame() if isinstance(store_or_frame, EvidenceStore) else store_or_frame
+    scores = rescore_frame(ev, profile)
+    ident = [c for c in IDENTITY_COLUMNS if c in ev.columns]
+    return pd.concat([ev[ident], scores], axis=1)
+
+
+def verify_rescore(store_or_frame, atol: float = 1e-9) -> pd.DataFrame:
+    """
+    Re-score every row under the profile its live run used and return the rows
+    whose total differs from the live total (empty = re-scoring reproduces the
+    pipeline). Rows stored without a live total are skipped.
+    """
+    ev = store_or_frame.load_frame() if isinstance(store_or_frame, EvidenceStore) else store_or_frame
+    ev = ev[ev["live_total"].notna() & ev["profile"].notna()] if "live_total" in ev.columns else ev.iloc[:0]
+    bad = []
+    for prof_json, grp in ev.groupby("profile"):
+        scores = rescore_frame(grp, ScoringProfile.from_dict(json.loads(prof_json)))
+        diff = (scores["total_score"] - grp["live_total"].astype(float)).abs()
+        mism = diff > atol
+        if mism.any():
+            bad.append(pd.concat([grp.loc[mism, IDENTITY_COLUMNS + ["live_total"]],
+                                  scores.loc[mism, ["pchem_score", "total_score"]]], axis=1))
+    return pd.concat(bad) if bad else pd.DataFrame(columns=IDENTITY_COLUMNS + ["live_total", "pchem_score", "total_score"])
+
+
+def main(argv=None) -> int:
+    """python -m ra_core.evidence --db evidence.sqlite --profile <name> [--out scores.csv] | --verify"""
+    import argparse
+    from ra_core.scoring import load_profile
+    ap = argparse.ArgumentParser(description="Re-score stored pair evidence under a scoring profile")
+    ap.add_argument("--db", required=True)
+    ap.add_argument("--profile", default="default", help="profile name (profiles dir) or path to .json")
+    ap.add_argument("--out", help="CSV output (default: print the top rows)")
+    ap.add_argument("--verify", action="store_true",
+                    help="check that re-scoring reproduces every stored live total; exit 1 if not")
+    args = ap.parse_args(argv)
+
+    store = EvidenceStore(args.db)
+    if args.verify:
+        bad = verify_rescore(store)
+        print(f"[EVIDENCE] {len(bad)} of {len(store)} pairs re-score to a different total")
+        if len(bad):
+            print(bad.to_string())
+        return 1 if len(bad) else 0
+    t0 = time.perf_counter()
+    ev = store.load_frame()
+    t1 = time.perf_counter()
+    out = rescore(ev, load_profile(args.profile))
+    t2 = time.perf_counter()
+    print(f"[EVIDENCE] {len(out)} pairs: load {t1 - t0:.2f}s, rescore {t2 - t1:.3f}s")
+    if args.out:
+        out.to_csv(args.out)
+    else:
+        print(out.sort_values("total_score", ascending=False).head(20).to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/fingerprints.py
+#
+# Fingerprint layer on rdFingerprintGenerator. Generators are built once per
+# process and reused; one call computes every requested fingerprint type for a
+# parsed molecule, and bulk helpers return similarity vectors / matrices.
+#
+#   fps = compute_fps(mol)                       # {"morgan": ..., "fcfp": ..., ...}
+#   multi_fp_similarity("CCO", "CCN")            # {"morgan": 0.33, ..., "maccs": 0.5}
+#   bulk_similarity(fps["morgan"], [f["morgan"] for f in library])
+#
+# "morgan" is bit-identical to AllChem.GetMorganFingerprintAsBitVect(m, 2, nBits=2048),
+# so existing Tanimoto numbers do not move.
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from rdkit import Chem, DataStructs
+from rdkit.Chem import rdFingerprintGenerator, rdMolDescriptors
+
+FP_KINDS = ("morgan", "fcfp", "atompair", "torsion", "maccs")
+
+FP_LABELS = {
+    "morgan": "Morgan (ECFP4, 2048)",
+    "fcfp": "FCFP4 (2048)",
+    "atompair": "Atom Pair (2048)",
+    "torsion": "Topological Torsion (2048)",
+    "maccs": "MACCS keys",
+}
+
+FP_SIZE = 2048
+
+_GEN_LOCK = threading.Lock()
+_GENERATORS: Dict[str, object] = {}
+
+
+def _build(kind: str):
+    if kind == "morgan":
+        return rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=FP_SIZE)
+    if kind == "fcfp":
+        return rdFingerprintGenerator.GetMorganGenerator(
+            radius=2, fpSize=FP_SIZE,
+            atomInvariantsGenerator=rdFingerprintGenerator.GetMorganFeatureAtomInvGen(),
+        )
+    if kind == "atompair":
+        return rdFingerprintGenerator.GetAtomPairGenerator(fpSize=FP_SIZE)
+    if kind == "torsion":
+        return rdFingerprintGenerator.GetTopologicalTorsionGenerator(fpSize=FP_SIZE)
+    raise ValueError(f"Unknown fingerprint kind: {kind!r}")
+
+
+def generator(kind: str):
+    """Process-wide generator for `kind` (MACCS has none; see compute_fps)."""
+    gen = _GENERATORS.get(kind)
+    if gen is None:
+        with _GEN_LOCK:
+            gen = _GENERATORS.get(kind)
+            if gen is None:
+                gen = _GENERATORS[kind] = _build(kind)
+    return gen
+
+
+def compute_fp(mol: Chem.Mol, kind: str):
+    if kind == "maccs":
+        return rdMolDescriptors.GetMACCSKeysFingerprint(mol)
+    return generator(kind).GetFingerprint(mol)
+
+
+def compute_fps(mol: Chem.Mol, kinds: Sequence[str] = FP_KINDS) -> Dict[str, object]:
+    """All requested fingerprints for one already-parsed molecule."""
+    return {k: compute_fp(mol, k) for k in kinds}
+
+
+def fps_from_smiles(smiles_list: Iterable[str], kind: str = "morgan") -> List[Optional[object]]:
+    """One fingerprint per SMILES (None where the SMILES does not parse)."""
+    out = []
+    for s in smiles_list:
+        m = Chem.MolFromSmiles(s) if isinstance(s, str) else None
+        out.append(compute_fp(m, kind) if m is not None else None)
+    return out
+
+
+def bulk_similarity(query, fps: Sequence) -> np.ndarray:
+    """Tanimoto of `query` against every fingerprint in `fps`."""
+    if not fps:
+        return np.zeros(0)
+    return np.asarray(DataStructs.BulkTanimotoSimilarity(query, list(fps)), dtype=float)
+
+
+def similarity_matrix(fpsA: Sequence, fpsB: Sequence) -> np.ndarray:
+    """(len(fpsA), len(fpsB)) Tanimoto matrix, one bulk call per row."""
+    S = np.zeros((len(fpsA), len(fpsB)), dtype=float)
+    if len(fpsB):
+        for i, fa in enumerate(fpsA):
+            S[i, :] = DataStructs.BulkTanimotoSimilarity(fa, list(fpsB))
+    return S
+
+
+def multi_fp_similarity_mols(mol1: Chem.Mol, mol2: Chem.Mol, kinds: Sequence[str] = FP_KINDS) -> Dict[str, float]:
+    f1, f2 = compute_fps(mol1, kinds), compute_fps(mol2, kinds)
+    return {k: DataStructs.TanimotoSimilarity(f1[k], f2[k]) for k in kinds}
+
+
+def multi_fp_similarity(smiles1: str, smiles2: str, kinds: Sequence[str] = FP_KINDS) -> Dict[str, float]:
+    """Tanimoto per fingerprint kind; all 0.0 if either SMILES is invalid."""
+    m1, m2 = Chem.MolFromSmiles(smiles1), Chem.MolFromSmiles(smiles2)
+    if m1 is None or m2 is None:
+        return {k: 0.0 for k in kinds}
+    return multi_fp_similarity_mols(m1, m2, kinds)
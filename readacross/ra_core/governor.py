@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/governor.py
+#
+# Cross-process limits for JVM tool launches. Every Toxtree / BioTransformer
+# run reserves -Xmx worth of heap; with several analysts, job workers and batch
+# pools on one container, unbounded launches end in the OOM killer. Before a
+# launch the caller takes
+#   - one of N per-tool slots            (RA_TOXTREE_SLOTS, RA_BT_SLOTS)
+#   - ceil(heap / chunk) heap tokens out of RA_JVM_HEAP_BUDGET_MB / RA_JVM_HEAP_CHUNK_MB
+# Slots and tokens are flock()ed files under RA_GOVERNOR_DIR, so they are shared
+# by every process on the host and released by the kernel if a holder dies.
+# Waiting longer than RA_JVM_QUEUE_TIMEOUT_S raises GovernorTimeout; the tool
+# runners treat that like a failed run instead of piling up more JVMs.
+#
+# External web APIs get a host-wide token bucket (rate_limit()): PubChem allows
+# 5 requests/s (RA_PUBCHEM_RATE, burst RA_PUBCHEM_BURST) however many threads
+# and worker processes are fetching.
+import os
+import math
+import time
+import fcntl
+import random
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Optional, List
+
+
+def _container_memory_mb() -> Optional[int]:
+    """cgroup v2/v1 memory limit, else physical RAM (MB); None if unknown."""
+    for p in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            raw = Path(p).read_text().strip()
+            if raw != "max" and int(raw) < 1 << 50:
+                return int(raw) // (1024 * 1024)
+        except (OSError, ValueError):
+            pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _default_budget_mb() -> int:
+    # Leave 40% of the container for Python, RDKit and the JVMs' non-heap memory
+    mem = _container_memory_mb()
+    return max(1024, int(mem * 0.6)) if mem else 3072
+
+
+GOVERNOR_DIR = Path(os.environ.get("RA_GOVERNOR_DIR", "/tmp/ra_governor"))
+HEAP_BUDGET_MB = int(os.environ.get("RA_JVM_HEAP_BUDGET_MB", _default_budget_mb()))
+HEAP_CHUNK_MB = int(os.environ.get("RA_JVM_HEAP_CHUNK_MB", "256"))
+QUEUE_TIMEOUT_S = float(os.environ.get("RA_JVM_QUEUE_TIMEOUT_S", "900"))
+TOOL_SLOTS = {
+    "toxtree": int(os.environ.get("RA_TOXTREE_SLOTS", "2")),
+    "biotransformer": int(os.environ.get("RA_BT_SLOTS", "1")),
+}
+# Per-launch wall-clock limits (seconds) for run_subprocess(timeout=...)
+TOOL_TIMEOUT_S = {
+    "toxtree": float(os.environ.get("RA_TOXTREE_TIMEOUT_S", "300")),
+    "biotransformer": float(os.environ.get("RA_BT_TIMEOUT_S", "600")),
+}
+
+# Requests per second and bucket size per external web API (rate_limit())
+HTTP_RATES = {
+    "pubchem": (float(os.environ.get("RA_PUBCHEM_RATE", "5")), int(os.environ.get("RA_PUBCHEM_BURST", "1"))),
+}
+
+
+class GovernorTimeout(RuntimeError):
+    """No slot / heap budget became free within the queue timeout."""
+
+
+# Per-process queueing metrics (see metrics())
+_METRICS_LOCK = threading.Lock()
+_METRICS = {"launches": 0, "waited": 0, "wait_s_total": 0.0, "wait_s_max": 0.0, "queue_timeouts": 0, "kills": 0,
+            "http_requests": 0, "http_wait_s_total": 0.0}
+
+
+class _LockPool:
+    """N interchangeable flock()ed files; take(k) grabs k of them or none."""
+
+    def __init__(self, name: str, size: int):
+        self.dir = GOVERNOR_DIR / name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.size = max(1, size)
+        self.paths = [self.dir / f"{i:04d}.lock" for i in range(self.size)]
+
+    def take(self, k: int) -> Optional[List[int]]:
+        fds = []
+        for p in random.sample(self.paths, len(self.paths)):
+            fd = os.open(p, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            fds.append(fd)
+            if len(fds) == k:
+                return fds
+        # All-or-nothing: never sit on a partial heap reservation
+        self.release(fds)
+        return None
+
+    @staticmethod
+    def release(fds: List[int]) -> None:
+        for fd in fds:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+    def in_use(self) -> int:
+        busy = 0
+        for p in self.paths:
+            fd = os.open(p, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except BlockingIOError:
+                busy += 1
+            finally:
+                os.close(fd)
+        return busy
+
+
+_POOLS = {}
+
+
+def _pool(name: str, size: int) -> _LockPool:
+    if name not in _POOLS:
+        _POOLS[name] = _LockPool(name, size)
+    return _POOLS[name]
+
+
+def _heap_pool() -> _LockPool:
+    return _pool("heap", HEAP_BUDGET_MB // HEAP_CHUNK_MB)
+
+
+def parse_heap_mb(xmx) -> int:
+    """'2G' / '512m' / '1048576' (bytes, as -Xmx accepts) -> MB."""
+    x = str(xmx).strip().lower()
+    units = {"k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+    if x and x[-1] in units:
+        return max(1, int(float(x[:-1]) * units[x[-1]]))
+    return max(1, int(x) // (1024 * 1024))
+
+
+def heap_tokens(heap_mb: int) -> int:
+    return min(_heap_pool().size, max(1, math.ceil(heap_mb / HEAP_CHUNK_MB)))
+
+
+@contextmanager
+def governed(tool: str, heap_mb: int, *, rec: dict = None, queue_timeout: float = None):
+    """
+    Hold one `tool` slot and heap tokens for `heap_mb` for the duration of the
+    block. Waits with backoff; raises GovernorTimeout after `queue_timeout`.
+    Queue wait is written to rec["queue_s"].
+    """
+    slots = _pool(tool, TOOL_SLOTS.get(tool, 1))
+    heap = _heap_pool()
+    need = heap_tokens(heap_mb)
+    limit = QUEUE_TIMEOUT_S if queue_timeout is None else queue_timeout
+    t0 = time.monotonic()
+    delay = 0.02
+    held_slot = held_heap = None
+    while True:
+        held_slot = slots.take(1)
+        if held_slot is not None:
+            held_heap = heap.take(need)
+            if held_heap is not None:
+                break
+            slots.release(held_slot)
+        waited = time.monotonic() - t0
+        if waited >= limit:
+            with _METRICS_LOCK:
+                _METRICS["queue_timeouts"] += 1
+            raise GovernorTimeout(
+                f"{tool}: no slot/heap ({heap_mb} MB) free after {waited:.0f}s "
+                f"(slots {slots.size}, budget {HEAP_BUDGET_MB} MB)"
+            )
+        time.sleep(delay * (0.5 + random.random()))
+        delay = min(delay * 2, 1.0)
+
+    wait = time.monotonic() - t0
+    with _METRICS_LOCK:
+        _METRICS["launches"] += 1
+        _METRICS["wait_s_total"] += wait
+        _METRICS["wait_s_max"] = max(_METRICS["wait_s_max"], wait)
+        if wait > 0.05:
+            _METRICS["waited"] += 1
+    if rec is not None:
+        rec["queue_s"] = wait
+        rec["heap_mb"] = heap_mb
+    try:
+        yield
+    finally:
+        if rec is not None and rec.get("timed_out"):
+            with _METRICS_LOCK:
+                _METRICS["kills"] += 1
+        heap.release(held_heap)
+        slots.release(held_slot)
+
+
+def rate_limit(api: str, *, rec: dict = None) -> float:
+    """
+    Take one request token for `api` from its host-wide bucket, sleeping until
+    the token is due. The bucket state ("tokens last_time") lives in a flock()ed
+    file; a caller that finds it empty reserves the next token (the count goes
+    negative) so later callers queue behind it. Returns the wait in seconds.
+    """
+    rate, burst = HTTP_RATES.get(api, (1.0, 1))
+    if rate <= 0:
+        return 0.0
+    GOVERNOR_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(GOVERNOR_DIR / f"{api}.rate", os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        now = time.time()
+        try:
+            tokens, last = (float(x) for x in os.pread(fd, 64, 0).split())
+        except ValueError:
+            tokens, last = float(burst), now
+        tokens = min(float(burst), tokens + max(0.0, now - last) * rate) - 1.0
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"{tokens:.6f} {now:.6f}".encode("ascii"), 0)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+    wait = max(0.0, -tokens / rate)
+    if wait > 0:
+        time.sleep(wait)
+    with _METRICS_LOCK:
+        _METRICS["http_requests"] += 1
+        _METRICS["http_wait_s_total"] += wait
+    if rec is not None:
+        rec["rate_wait_s"] = rec.get("rate_wait_s", 0.0) + wait
+    return wait
+
+
+def metrics() -> dict:
+    """This process's queueing counters plus host-wide slot / heap occupancy."""
+    with _METRICS_LOCK:
+        out = dict(_METRICS)
+    out["heap_budget_mb"] = HEAP_BUDGET_MB
+    out["heap_in_use_mb"] = _heap_pool().in_use() * HEAP_CHUNK_MB
+    for tool, n in TOOL_SLOTS.items():
+        out[f"{tool}_slots"] = n
+        out[f"{tool}_busy"] = _pool(tool, n).in_use()
+    return out
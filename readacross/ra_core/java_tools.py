@@ -5,37 +5,31 @@
 
 
 # ra_core/java_tools.py
-import os, subprocess, tempfile, shutil
-from pathlib import Path
+#
+# Thin convenience wrapper kept for older callers. JVM discovery, JAR
+# resolution, governor slots, AppCDS, timeouts and retries all live in
+# ra_core.tool_runtime; this only builds BioTransformer's CLI.
+from ra_core import tool_runtime
+from ra_core.governor import GovernorTimeout, parse_heap_mb
+from ra_core.tool_io import scratch_dir
 
-APP_ROOT = Path(__file__).resolve().parents[1]
-
-def _java_bin():
-    # Prefer env override; else system java
-    jb = os.environ.get("JAVA_BIN") or shutil.which("java")
-    if not jb:
-        raise RuntimeError("Java not available. Set JAVA_BIN or install OpenJDK.")
-    return jb
 
 def run_biotransformer(smiles: str, *, xmx="2G", timeout=120) -> list[str]:
-    """Example: run your JAR via CLI and return raw lines (adjust flags/parse as needed)."""
-    jar = APP_ROOT / "tools" / "biotransformer" / "BioTransformer.jar"
-    if not jar.exists():
-        raise RuntimeError(f"JAR not found: {jar}")
-
-    with tempfile.TemporaryDirectory() as td:
-        out = Path(td) / "bt_out.tsv"
-        cmd = [
-            _java_bin(), f"-Xmx{xmx}", "-jar", str(jar),
-            "--smiles", smiles,
-            "--task", "metabolism",
-            "--output", str(out),
-        ]
-        res = subprocess.run(cmd, text=True, capture_output=True, timeout=timeout)
+    """Run BioTransformer (allHuman, one step) on `smiles` and return the raw output CSV lines."""
+    p = tool_runtime.profile("biotransformer")
+    if not p.available:
+        raise RuntimeError("BioTransformer not available. Install the distro or set JAVA_BIN_BIOTRANSFORMER.")
+
+    with scratch_dir("biotransformer") as td:
+        out = td / "bt_out.csv"
+        args = ["-k", "pred", "-b", "allHuman", "-ismi", smiles, "-ocsv", str(out), "-s", "1"]
+        try:
+            res = tool_runtime.run_tool(p, args, expect=out, heap_mb=parse_heap_mb(xmx), timeout_s=timeout)
+        except GovernorTimeout:
+            return []
         if res.returncode != 0:
             # You can log res.stderr
             return []
         if not out.exists():
             return []
         return out.read_text(encoding="utf-8", errors="ignore").splitlines()
-
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/jobs.py
+#
+# Local job queue for the Streamlit app: pairs are submitted to a SQLite table
+# and run by a small, fixed number of worker processes, so a multi-minute pair
+# does not block the session, concurrent analysts share the same bounded set of
+# JVM launches, and a page reload only needs the job id to pick the result up.
+#
+#   q = JobQueue()                       # RA_JOB_DB, default <app>/jobs.sqlite
+#   procs = start_workers(q.path, n=2)   # RA_JOB_WORKERS
+#   job_id = q.submit(tname, tsmi, sname, ssmi)
+#   q.get(job_id)["status"], q.get(job_id)["progress"], q.result(job_id)
+#
+# Identical submissions (same pair + scoring profile) map to one job; finished
+# results are kept in the database, so re-running a pair is instant. A result
+# scored on a failed or timed-out tool run (df.attrs["tool_failures"]) is
+# handed to its job but marked `degraded`: the next identical submission runs
+# the pair again instead of reusing it.
+#
+# A job whose worker dies (crash, OOM kill) or stops heart-beating is queued
+# again, at most RA_JOB_MAX_ATTEMPTS times in all; after that it is marked
+# failed rather than taking down worker after worker.
+#
+# Workers register in a `workers` table: "warming" while they run the
+# ra_core.warmup canary, then "ready" (or "failed"), with a heartbeat while
+# alive. `python -m ra_core.warmup check --workers N` reads it.
+#
+#   python -m ra_core.jobs worker --n 2     # run workers outside the app
+#   RA_JOB_EXTERNAL=1                       # the app then starts none itself
+# Both start_workers() and the worker CLI restart worker processes that exit.
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+import multiprocessing as mp
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from ra_core.scoring import APP_ROOT, ScoringProfile, DEFAULT_PROFILE
+
+JOB_DB = Path(os.environ.get("RA_JOB_DB", APP_ROOT / "jobs.sqlite"))
+JOB_WORKERS = int(os.environ.get("RA_JOB_WORKERS", "2"))
+# A running job whose worker stopped heart-beating for this long is re-queued
+STALE_S = float(os.environ.get("RA_JOB_STALE_S", "120"))
+# Claims per job before a job that keeps losing its worker is failed
+MAX_ATTEMPTS = int(os.environ.get("RA_JOB_MAX_ATTEMPTS", "3"))
+HEARTBEAT_S = 10.0
+# Workers run the ra_core.warmup canary (and RA_WARM_COMPOUNDS) before their first job
+JOB_WARMUP = os.environ.get("RA_JOB_WARMUP", "1").strip().lower() not in {"0", "false", "no"}
+# Workers are started at container start (python -m ra_core.jobs worker), not by the app
+EXTERNAL_WORKERS = os.environ.get("RA_JOB_EXTERNAL", "0").strip().lower() in {"1", "true", "yes"}
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+def job_key(target_name, target_smiles, surrogate_name, surrogate_smiles, profile: ScoringProfile = None) -> str:
+    from ra_core.evidence import pair_key
+    prof = json.dumps((profile or DEFAULT_PROFILE).to_dict(), sort_keys=True)
+    raw = pair_key(target_name, target_smiles, surrogate_name, surrogate_smiles) + "|" + prof
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """SQLite-backed queue; safe to use from several processes (one connection each)."""
+
+    def __init__(self, path=None):
+        self.path = str(path or JOB_DB)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, target_name TEXT, target_smiles TEXT,"
+            " surrogate_name TEXT, surrogate_smiles TEXT, profile TEXT,"
+            " status TEXT, progress TEXT, error TEXT, result BLOB, worker TEXT,"
+            " created REAL, started REAL, finished REAL, heartbeat REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        have = {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "degraded" not in have:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN degraded TEXT")
+        if "attempts" not in have:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            " worker TEXT PRIMARY KEY, pid INTEGER, status TEXT, report TEXT, started REAL, heartbeat REAL)"
+        )
+
+    def _exec(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args)
+
+    # ---------- client side ----------
+    def submit(self, target_name, target_smiles, surrogate_name, surrogate_smiles,
+               profile: ScoringProfile = None) -> str:
+        """Queue a pair (or attach to an identical queued/running/finished job); returns the job id.
+        Failed jobs and degraded results are queued again."""
+        profile = profile or DEFAULT_PROFILE
+        jid = job_key(target_name, target_smiles, surrogate_name, surrogate_smiles, profile)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT status, degraded FROM jobs WHERE job_id = ?", (jid,)).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO jobs (job_id, target_name, target_smiles, surrogate_name, surrogate_smiles,"
+                        " profile, status, progress, created) VALUES (?, ?, ?, ?, ?, ?, 'queued', '{}', ?)",
+                        (jid, target_name, target_smiles, surrogate_name, surrogate_smiles,
+                         json.dumps(profile.to_dict()), now),
+                    )
+                elif row[0] == "failed" or (row[0] == "done" and row[1]):
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'queued', progress = '{}', error = NULL, degraded = NULL,"
+                        " worker = NULL, attempts = 0, created = ? WHERE job_id = ?",
+                        (now, jid),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return jid
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Status record without the result payload (status, progress, error, degraded, timestamps, queue position)."""
+        cur = self._exec(
+            "SELECT job_id, target_name, surrogate_name, status, progress, error, degraded, worker, attempts,"
+            " created, started, finished FROM jobs WHERE job_id = ?", (job_id,)
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        rec = dict(zip([d[0] for d in cur.description], row))
+        rec["progress"] = json.loads(rec["progress"] or "{}")
+        rec["queue_position"] = None
+        if rec["status"] == "queued":
+            rec["queue_position"] = self._exec(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < ?", (rec["created"],)
+            ).fetchone()[0]
+        return rec
+
+    def result(self, job_id: str) -> Optional[pd.DataFrame]:
+        row = self._exec("SELECT result FROM jobs WHERE job_id = ? AND status = 'done'", (job_id,)).fetchone()
+        return pickle.loads(row[0]) if row and row[0] is not None else None
+
+    def counts(self) -> dict:
+        rows = self._exec("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {s: dict(rows).get(s, 0) for s in STATUSES}
+
+    # ---------- worker side ----------
+    def _release(self, where: str, args: tuple) -> int:
+        """Queue running jobs matching `where` again, or fail them once they used up MAX_ATTEMPTS.
+        Runs inside the caller's transaction."""
+        now = time.time()
+        self._conn.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE status = 'running' AND attempts >= ? AND "
+            + where, (now, f"worker died or stalled on each of {MAX_ATTEMPTS} attempts; not retried",
+                      MAX_ATTEMPTS, *args),
+        )
+        return self._conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND " + where, args
+        ).rowcount
+
+    def release_worker(self, worker: str) -> int:
+        """Jobs of a worker known to be dead: re-queue (or fail) them now instead of after STALE_S."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                n = self._release("worker = ?", (worker,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return n
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Atomically take the oldest queued job (after re-queuing stale running ones)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._release("heartbeat < ?", (now - STALE_S,))
+                cur = self._conn.execute(
+                    "SELECT job_id, target_name, target_smiles, surrogate_name, surrogate_smiles, profile"
+                    " FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+                )
+                row = cur.fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started = ?, heartbeat = ?,"
+                        " attempts = attempts + 1 WHERE job_id = ?",
+                        (worker, now, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(zip([d[0] for d in cur.description], row), worker=worker) if row else None
+
+    # A job re-queued as stale may already belong to another worker: the
+    # updates below only apply while `worker` still owns the running job.
+    _OWNED = " WHERE job_id = ? AND status = 'running' AND worker = ?"
+
+    def set_progress(self, job_id: str, module: str, state: str, worker: str) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT progress FROM jobs" + self._OWNED, (job_id, worker)).fetchone()
+            if row is None:
+                return
+            prog = json.loads(row[0] or "{}")
+            prog[module] = state
+            self._conn.execute("UPDATE jobs SET progress = ?, heartbeat = ?" + self._OWNED,
+                               (json.dumps(prog), time.time(), job_id, worker))
+
+    def heartbeat(self, job_id: str, worker: str) -> None:
+        self._exec("UPDATE jobs SET heartbeat = ?" + self._OWNED, (time.time(), job_id, worker))
+
+    def finish(self, job_id: str, df: pd.DataFrame, worker: str) -> bool:
+        """Store the result; False (nothing stored) if `worker` no longer owns the job."""
+        degraded = ", ".join(df.attrs.get("tool_failures") or ()) or None
+        cur = self._exec("UPDATE jobs SET status = 'done', result = ?, degraded = ?, finished = ?" + self._OWNED,
+                         (pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL), degraded, time.time(), job_id, worker))
+        return cur.rowcount > 0
+
+    def fail(self, job_id: str, error: str, worker: str) -> bool:
+        cur = self._exec("UPDATE jobs SET status = 'failed', error = ?, finished = ?" + self._OWNED,
+                         (error, time.time(), job_id, worker))
+        return cur.rowcount > 0
+
+    def register_worker(self, worker: str, status: str, report: Optional[dict] = None) -> None:
+        now = time.time()
+        self._exec(
+            "INSERT INTO workers (worker, pid, status, report, started, heartbeat) VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(worker) DO UPDATE SET status = excluded.status, report = excluded.report,"
+            " heartbeat = excluded.heartbeat",
+            (worker, os.getpid(), status, json.dumps(report, default=str) if report else None, now, now),
+        )
+
+    def worker_heartbeat(self, worker: str) -> None:
+        self._exec("UPDATE workers SET heartbeat = ? WHERE worker = ?", (time.time(), worker))
+
+    def workers(self, max_age: float = STALE_S) -> list:
+        """Workers that heart-beat within `max_age` seconds: worker, pid, status, started, heartbeat."""
+        cur = self._exec("SELECT worker, pid, status, started, heartbeat FROM workers WHERE heartbeat >= ?"
+                         " ORDER BY started", (time.time() - max_age,))
+        return [dict(zip([d[0] for d in cur.description], row)) for row in cur.fetchall()]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ---------- Workers ----------
+def run_job(queue: JobQueue, job: dict) -> None:
+    from ra_core import core
+    jid, worker = job["job_id"], job["worker"]
+    stop = threading.Event()
+
+    def _beat():
+        while not stop.wait(HEARTBEAT_S):
+            queue.heartbeat(jid, worker)
+
+    beater = threading.Thread(target=_beat, daemon=True)
+    beater.start()
+    try:
+        profile = ScoringProfile.from_dict(json.loads(job["profile"])) if job.get("profile") else DEFAULT_PROFILE
+        df = core.run_full_read_across_assessment(
+            job["target_name"], job["target_smiles"], job["surrogate_name"], job["surrogate_smiles"],
+            profile=profile, progress=lambda module, state: queue.set_progress(jid, module, state, worker),
+        )
+        if not queue.finish(jid, df, worker):
+            print(f"[JOBS] job {jid[:10]} was re-queued while running here; result dropped")
+        elif df.attrs.get("tool_failures"):
+            print(f"[JOBS] job {jid[:10]} done with failed tools ({', '.join(df.attrs['tool_failures'])}); not reused")
+    except Exception as e:
+        print(f"[JOBS] job {jid[:10]} failed: {type(e).__name__}: {e}")
+        queue.fail(jid, f"{type(e).__name__}: {e}", worker)
+    finally:
+        stop.set()
+
+
+def worker_main(db_path=None, hook: Optional[str] = None, poll_s: float = 0.5, max_jobs: Optional[int] = None) -> None:
+    """Worker process loop: warm up once, then claim and run jobs until killed (or max_jobs)."""
+    from ra_core.workers import init_worker
+    from ra_core import warmup
+    queue = JobQueue(db_path)
+    name = f"{os.uname().nodename}:{os.getpid()}"
+    queue.register_worker(name, "warming")
+    try:
+        init_worker(hook=hook, warm=JOB_WARMUP)
+    except Exception as e:
+        queue.register_worker(name, "failed", {"error": f"{type(e).__name__}: {e}"})
+        raise
+    report = warmup.readiness()["report"]
+    queue.register_worker(name, report["status"] if report else "ready", report)
+
+    def _beat():
+        while True:
+            time.sleep(HEARTBEAT_S)
+            queue.worker_heartbeat(name)
+
+    threading.Thread(target=_beat, name="ra-worker-heartbeat", daemon=True).start()
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = queue.claim(name)
+        if job is None:
+            time.sleep(poll_s)
+            continue
+        print(f"[JOBS] {name} running {job['target_name']} vs {job['surrogate_name']} ({job['job_id'][:10]})")
+        run_job(queue, job)
+        done += 1
+
+
+def _spawn_worker(db_path=None, hook: Optional[str] = None):
+    p = mp.get_context("spawn").Process(target=worker_main, args=(db_path, hook), daemon=True)
+    p.start()
+    return p
+
+
+def supervise_workers(procs: list, db_path=None, hook: Optional[str] = None,
+                      poll_s: float = 5.0, stop: Optional[threading.Event] = None) -> None:
+    """
+    Restart worker processes in `procs` (in place) that exit, until `stop` is
+    set. The dead worker's running job is released at once. A worker that dies
+    within a minute of starting (e.g. failed warm-up) is restarted with
+    exponential backoff, up to 5 minutes.
+    """
+    stop = stop or threading.Event()
+    queue = JobQueue(db_path)
+    started = [time.monotonic()] * len(procs)
+    delay = [0.0] * len(procs)
+    due = [None] * len(procs)
+    while not stop.wait(poll_s):
+        for i, p in enumerate(procs):
+            if p.is_alive():
+                continue
+            now = time.monotonic()
+            if due[i] is None:
+                name = f"{os.uname().nodename}:{p.pid}"
+                n = queue.release_worker(name)
+                delay[i] = min(max(delay[i] * 2, poll_s), 300.0) if now - started[i] < 60 else 0.0
+                due[i] = now + delay[i]
+                print(f"[JOBS] worker {name} exited ({p.exitcode}); {n} job(s) released, "
+                      f"restarting in {delay[i]:.0f}s")
+            if now >= due[i]:
+                procs[i] = _spawn_worker(db_path, hook)
+                started[i], due[i] = now, None
+
+
+def start_workers(db_path=None, n: int = None, hook: Optional[str] = None, supervise: bool = True) -> list:
+    """Start `n` daemon worker processes (spawn) for the queue at `db_path`, restarted
+    by a supervisor thread when they exit (see supervise_workers)."""
+    procs = [_spawn_worker(db_path, hook) for _ in range(n or JOB_WORKERS)]
+    print(f"[JOBS] started {len(procs)} workers on {db_path or JOB_DB}")
+    if supervise:
+        threading.Thread(target=supervise_workers, args=(procs, db_path, hook),
+                         name="ra-job-supervisor", daemon=True).start()
+    return procs
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="Read-across job queue")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run worker processes in the foreground")
+    w.add_argument("--db", default=None)
+    w.add_argument("--n", type=int, default=JOB_WORKERS)
+    w.add_argument("--hook", default=None, help="module:function to call in each worker after import")
+    s = sub.add_parser("status", help="print job counts")
+    s.add_argument("--db", default=None)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        print(JobQueue(args.db).counts())
+        return 0
+    procs = start_workers(args.db, args.n, args.hook, supervise=False)
+    try:
+        supervise_workers(procs, args.db, args.hook)
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/jvm_cds.py
+#
+# Cheaper JVM launches for the bundled JARs. Neither Toxtree nor BioTransformer
+# can run as a persistent worker from their CLIs, so every call starts a fresh
+# JVM. Most of that startup goes into loading and verifying the same few
+# thousand classes. An AppCDS archive per (java, JAR) maps them in pre-parsed:
+#   JDK 13+  the first real launch runs with -XX:ArchiveClassesAtExit
+#   JDK 11   the first real launch writes a class list, then a short
+#            -Xshare:dump run builds the archive from it
+# Later launches add -XX:SharedArchiveFile. Every launch runs with -Xshare:auto,
+# so a stale or unreadable archive is silently ignored, never fatal.
+# Per-tool startup flags (RA_JVM_FLAGS_TOXTREE / RA_JVM_FLAGS_BIOTRANSFORMER)
+# favour short runs: SerialGC, no perf-data file, and C1 only for Toxtree.
+# BioTransformer keeps C2 because its long predictions need it.
+#
+#   with jvm_cds.launch("toxtree", java_bin, jar, dump_args=["-Xmx512m"]) as cds:
+#       cmd = [java_bin, "-Xmx512m", *cds.flags, "-jar", str(jar), ...]
+#       res = run_subprocess(cmd, ...)
+#       cds.ok = res.returncode == 0
+#
+# An archive is only fully used under the heap / GC options it was dumped
+# with. Training runs therefore use the launch command itself, and the JDK 11
+# -Xshare:dump step gets the same options (dump_args).
+#
+#   RA_JVM_CDS=0        disable archives (flags still apply)
+#   RA_CDS_DIR          where archives live (default <tmp>/ra_cds)
+import os
+import re
+import sys
+import fcntl
+import shlex
+import hashlib
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+ENABLED = os.environ.get("RA_JVM_CDS", "1").strip().lower() not in {"0", "false", "no"}
+CDS_DIR = Path(os.environ.get("RA_CDS_DIR") or Path(tempfile.gettempdir()) / "ra_cds")
+
+_DEFAULT_FLAGS = {
+    "toxtree": "-XX:TieredStopAtLevel=1 -XX:+UseSerialGC -XX:-UsePerfData",
+    "biotransformer": "-XX:+UseSerialGC -XX:-UsePerfData",
+}
+
+
+def tool_flags(tool: str) -> List[str]:
+    env = os.environ.get(f"RA_JVM_FLAGS_{tool.upper()}")
+    return shlex.split(env if env is not None else _DEFAULT_FLAGS.get(tool, ""))
+
+
+_VERSIONS = {}
+_VERSIONS_LOCK = threading.Lock()
+
+
+def java_major(java_bin: str) -> Optional[int]:
+    """Feature version of `java_bin` (8, 11, 17, ...), cached; None if it cannot be run."""
+    with _VERSIONS_LOCK:
+        if java_bin in _VERSIONS:
+            return _VERSIONS[java_bin]
+    major = None
+    try:
+        out = subprocess.run([java_bin, "-version"], capture_output=True, text=True, timeout=30)
+        m = re.search(r'version "(\d+)(?:\.(\d+))?', out.stderr + out.stdout)
+        if m:
+            major = int(m.group(2)) if m.group(1) == "1" else int(m.group(1))
+    except (OSError, subprocess.SubprocessError):
+        pass
+    with _VERSIONS_LOCK:
+        _VERSIONS[java_bin] = major
+    return major
+
+
+def archive_path(tool: str, java_bin: str, jar: Path) -> Path:
+    """Archive name is tied to the java binary, JAR identity and startup flags."""
+    st = Path(jar).stat()
+    key = "|".join([str(Path(java_bin).resolve()), str(java_major(java_bin)), str(Path(jar).resolve()),
+                    str(st.st_size), str(int(st.st_mtime)), " ".join(tool_flags(tool))])
+    return CDS_DIR / f"{tool}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.jsa"
+
+
+class _Launch:
+    def __init__(self, flags: List[str]):
+        self.flags = flags
+        self.ok = False
+        self.training = False
+
+
+def _try_lock(path: Path):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fd
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+
+def _dump_from_classlist(java_bin: str, jar: Path, classlist: Path, jsa: Path, flags: List[str]) -> bool:
+    tmp = jsa.with_suffix(".jsa.tmp")
+    cmd = [java_bin, *flags, "-Xshare:dump", f"-XX:SharedClassListFile={classlist}",
+           f"-XX:SharedArchiveFile={tmp}", "-cp", str(jar)]
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    if res.returncode == 0 and tmp.exists():
+        os.replace(tmp, jsa)
+        return True
+    tmp.unlink(missing_ok=True)
+    return False
+
+
+@contextmanager
+def launch(tool: str, java_bin: str, jar, *, cds: Optional[bool] = None, dump_args: Sequence[str] = ()):
+    """
+    Yields an object whose .flags go between the java binary (and -Xmx) and
+    -jar. Set .ok = True after a successful run: a first ("training") run then
+    turns into the archive used by later launches. `dump_args` are the other
+    JVM options of the launch (heap, -D...), repeated in a JDK 11 dump.
+    """
+    jar = Path(jar)
+    flags = tool_flags(tool)
+    use_cds = ENABLED if cds is None else cds
+    major = java_major(java_bin) if use_cds else None
+    if not use_cds or major is None or major < 11:
+        yield _Launch(flags)
+        return
+
+    CDS_DIR.mkdir(parents=True, exist_ok=True)
+    jsa = archive_path(tool, java_bin, jar)
+    if jsa.exists():
+        yield _Launch([*flags, "-Xshare:auto", f"-XX:SharedArchiveFile={jsa}"])
+        return
+
+    # No archive yet: this launch trains it, unless another process already is
+    lock_fd = _try_lock(jsa.with_suffix(".lock"))
+    if lock_fd is None:
+        yield _Launch([*flags, "-Xshare:auto"])
+        return
+    try:
+        if major >= 13:
+            tmp = jsa.with_suffix(".jsa.tmp")
+            ln = _Launch([*flags, "-Xshare:auto", f"-XX:ArchiveClassesAtExit={tmp}"])
+        else:
+            tmp = jsa.with_suffix(".classlist")
+            ln = _Launch([*flags, "-Xshare:auto", f"-XX:DumpLoadedClassList={tmp}"])
+        ln.training = True
+        yield ln
+        if ln.ok and tmp.exists() and tmp.stat().st_size > 0:
+            if major >= 13:
+                os.replace(tmp, jsa)
+            else:
+                _dump_from_classlist(java_bin, jar, tmp, jsa, [*dump_args, *flags])
+            print(f"[CDS] {tool}: {'archive ready ' + str(jsa) if jsa.exists() else 'archive dump failed'}")
+    finally:
+        for leftover in (jsa.with_suffix(".jsa.tmp"), jsa.with_suffix(".classlist")):
+            leftover.unlink(missing_ok=True)
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        os.close(lock_fd)
+
+
+def build(profile, cmd_tail: List[str]) -> bool:
+    """
+    Train the archive for a tool_runtime.ToolProfile now (e.g. at image build
+    time) by running `cmd_tail` once, with the command tool_runtime launches.
+    """
+    from ra_core import tool_runtime
+    p = profile
+    with launch(p.name, p.java_bin, p.jar, dump_args=tool_runtime.jvm_options(p)) as cds:
+        if not cds.training:
+            return archive_path(p.name, p.java_bin, p.jar).exists()
+        res = subprocess.run(tool_runtime.command(p, cmd_tail, cds.flags),
+                             cwd=str(p.workdir) if p.workdir else None, capture_output=True, text=True)
+        cds.ok = res.returncode == 0
+    return archive_path(p.name, p.java_bin, p.jar).exists()
+
+
+def smoke_args(tool: str, workdir: Path) -> List[str]:
+    """CLI arguments for a tiny real run (ethanol) of `tool`, writing into workdir."""
+    workdir = Path(workdir)
+    if tool == "toxtree":
+        inp = workdir / "in.csv"
+        inp.write_text("SMILES\nCCO\n")
+        return ["-n", "-i", str(inp), "-o", str(workdir / "out.csv"), "-m", "toxtree.plugins.ames.AmesMutagenicityRules"]
+    if tool == "biotransformer":
+        return ["-k", "pred", "-b", "allHuman", "-ismi", "CCO", "-ocsv", str(workdir / "out.csv"), "-s", "1"]
+    raise ValueError(f"Unknown tool: {tool!r}")
+
+
+def _main(argv=None) -> int:
+    """python -m ra_core.jvm_cds build  -- train archives for the resolved Toxtree / BioTransformer."""
+    import argparse
+    ap = argparse.ArgumentParser(description="AppCDS archives for the bundled JARs")
+    ap.add_argument("cmd", choices=["build"])
+    ap.parse_args(argv)
+
+    os.environ.setdefault("RA_ALLOW_MISSING_TOOLS", "1")
+    from ra_core import tool_runtime
+    ok = True
+    for tool in ("toxtree", "biotransformer"):
+        p = tool_runtime.profile(tool)
+        if not p.available:
+            continue
+        with tempfile.TemporaryDirectory() as td:
+            ok &= build(p, smoke_args(tool, Path(td)))
+    print(f"[CDS] archives in {CDS_DIR}: {sorted(p.name for p in CDS_DIR.glob('*.jsa'))}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
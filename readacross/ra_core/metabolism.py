@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/metabolism.py
+#
+# One interface over the metabolism predictors. Each backend returns
+# structured metabolites (SMILES, score, reaction label) from a single tool run
+# per compound, held in the shared tool cache (ra_core.cache). The similarity
+# module and the reactive-pathway module read the same run:
+#
+#   get_backend("biotransformer").metabolites(smiles)   # {smi: score} for compare_metabolite_sets
+#   get_backend("biotransformer").reactions(smiles)     # reaction labels for the keyword screen
+#   predict_many(smiles_list)                           # warm every backend for a batch
+#
+# RA_METABOLISM_BACKEND picks the backend the metabolic similarity module uses
+# (default "sygma", which keeps existing scores).
+import os
+import contextvars
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+DEFAULT_BACKEND = os.environ.get("RA_METABOLISM_BACKEND", "sygma").strip().lower() or "sygma"
+
+
+class Metabolite(NamedTuple):
+    smiles: str
+    score: float        # SyGMa plausibility; 1.0 where the tool gives none
+    reaction: str = ""  # SyGMa pathway / BioTransformer reaction name
+    source: str = ""    # backend name
+
+
+class MetabolismBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def predict(self, smiles: str) -> List[Metabolite]:
+        """Every predicted metabolite of `smiles` (one cached tool run)."""
+
+    def metabolites(self, smiles: str, cutoff: float = 0.0) -> Dict[str, float]:
+        """{metabolite SMILES: score} at or above `cutoff`; duplicates keep the highest score."""
+        out = {}
+        for m in self.predict(smiles):
+            if m.smiles and m.score >= cutoff and m.score > out.get(m.smiles, -1.0):
+                out[m.smiles] = m.score
+        return out
+
+    def reactions(self, smiles: str) -> Set[str]:
+        return {m.reaction for m in self.predict(smiles) if m.reaction}
+
+
+class SygmaBackend(MetabolismBackend):
+    name = "sygma"
+
+    def predict(self, smiles):
+        from ra_core import core
+        return core._run_sygma(smiles) or []
+
+    def metabolites(self, smiles, cutoff=0.0):
+        from ra_core import core
+        return core._get_sygma_metabolites(smiles, score_cutoff=cutoff)
+
+
+class BioTransformerBackend(MetabolismBackend):
+    name = "biotransformer"
+
+    def predict(self, smiles):
+        from ra_core import core
+        return core._run_biotransformer(smiles) or []
+
+    def reactions(self, smiles):
+        from ra_core import core
+        return core.run_biotransformer_and_get_reactions(smiles)
+
+
+BACKENDS: Dict[str, MetabolismBackend] = {b.name: b for b in (SygmaBackend(), BioTransformerBackend())}
+
+
+def register_backend(backend: MetabolismBackend) -> None:
+    BACKENDS[backend.name] = backend
+
+
+def get_backend(name: Optional[str] = None) -> MetabolismBackend:
+    name = (name or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown metabolism backend: {name!r} (have {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[name]
+
+
+def predict_many(smiles_list: Iterable[str], backends: Sequence[str] = None, *,
+                 max_workers: Optional[int] = None) -> Dict[tuple, List[Metabolite]]:
+    """
+    Run each backend once per distinct compound on a thread pool; results land
+    in the shared tool cache and are returned as {(backend, smiles): [Metabolite]}.
+    JVM launches inside are still limited by the governor.
+    """
+    names = list(backends or BACKENDS)
+    jobs = [(n, s) for s in dict.fromkeys(smiles_list) for n in names]
+    if not jobs:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, len(jobs))) as ex:
+        futures = {job: ex.submit(contextvars.copy_context().run, get_backend(job[0]).predict, job[1]) for job in jobs}
+        return {job: f.result() for job, f in futures.items()}
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/profiling.py
+#
+# Lightweight per-stage instrumentation for the read-across pipeline.
+# Every expensive step (JVM tools, SyGMa, MCS, PubChem, fingerprints) opens a
+# span; spans are collected by the active Profiler (if any) and can be shown as
+# a table, summarised per stage, or exported as a Chrome trace JSON
+# (open in chrome://tracing or https://ui.perfetto.dev).
+import os
+import json
+import time
+import threading
+import subprocess
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, List, Dict
+
+_ACTIVE = contextvars.ContextVar("ra_profiler", default=None)
+
+
+class Profiler:
+    """
+    Collects span records (plain dicts) from the current context. A child
+    profiler (`parent=`) keeps its own span list, e.g. one pair inside a batch
+    run, and forwards each span to the parent. It shares the parent's time
+    origin, so both traces line up.
+    """
+
+    def __init__(self, label: str = "", parent: Optional["Profiler"] = None):
+        self.label = label
+        self.parent = parent
+        self.t0 = parent.t0 if parent is not None else time.perf_counter()
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _ACTIVE.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _ACTIVE.reset(self._token)
+        self._token = None
+        return False
+
+    def add(self, rec: dict):
+        with self._lock:
+            self.spans.append(rec)
+        if self.parent is not None:
+            self.parent.add(rec)
+
+    def summary(self) -> List[dict]:
+        """Total/count/max duration per stage, slowest stage first."""
+        agg: Dict[str, dict] = {}
+        for s in self.spans:
+            a = agg.setdefault(s["stage"], {"stage": s["stage"], "count": 0, "total_s": 0.0, "max_s": 0.0, "cache_hits": 0})
+            a["count"] += 1
+            a["total_s"] += s["duration_s"]
+            a["max_s"] = max(a["max_s"], s["duration_s"])
+            a["cache_hits"] += 1 if s.get("cache_hit") else 0
+        return sorted(agg.values(), key=lambda a: -a["total_s"])
+
+    def to_chrome_trace(self) -> dict:
+        return spans_to_chrome_trace(self.spans)
+
+
+def current_profiler() -> Optional[Profiler]:
+    return _ACTIVE.get()
+
+
+@contextmanager
+def span(stage: str, *, tool: str = None, compound: str = None, **attrs):
+    """
+    Time a block. Yields the span record so the caller can fill in
+    cache_hit / bytes_in / bytes_out / rss_kb (or any extra key).
+    Without an active Profiler this is just a couple of perf_counter calls.
+    """
+    prof = _ACTIVE.get()
+    rec = {
+        "stage": stage,
+        "tool": tool,
+        "compound": compound,
+        "cache_hit": None,
+        "bytes_in": None,
+        "bytes_out": None,
+        "rss_kb": None,
+        **attrs,
+    }
+    start = time.perf_counter()
+    try:
+        yield rec
+    except BaseException:
+        rec["error"] = True
+        raise
+    finally:
+        rec["duration_s"] = time.perf_counter() - start
+        if prof is not None:
+            rec["start_s"] = start - prof.t0
+            rec["pid"] = os.getpid()
+            rec["tid"] = threading.get_ident()
+            prof.add(rec)
+
+
+def file_size(path) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+# ---------- Subprocess runner that also reports peak RSS ----------
+def _kill_group(proc: subprocess.Popen, grace_s: float = 5.0) -> None:
+    """SIGTERM the child's process group, SIGKILL it if still alive after `grace_s`."""
+    import signal
+    for sig, wait in ((signal.SIGTERM, grace_s), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        if wait is None:
+            return
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            try:
+                if os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None:
+                    return
+            except ChildProcessError:
+                return
+            time.sleep(0.05)
+
+
+def run_subprocess(cmd, *, cwd=None, rec: dict = None, timeout: float = None) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(cmd, cwd=cwd, capture_output=True, text=True) equivalent that
+    reaps the child with os.wait4 so its peak RSS can be recorded in `rec`.
+    Falls back to subprocess.run where wait4 is not available (Windows).
+
+    With `timeout` (seconds) the child's whole process group is terminated
+    (SIGTERM, then SIGKILL) when it overruns; the result then has a negative
+    returncode and rec["timed_out"] = True instead of raising. The result
+    always carries a `timed_out` attribute, whether or not `rec` is given.
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            res = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, timeout=timeout)
+            res.timed_out = False
+        except subprocess.TimeoutExpired as e:
+            if rec is not None:
+                rec["timed_out"] = True
+            res = subprocess.CompletedProcess(cmd, -9, e.stdout or "", f"timed out after {timeout}s")
+            res.timed_out = True
+        return res
+
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                            start_new_session=timeout is not None)
+    out, err = [], []
+
+    def _drain(stream, buf):
+        buf.append(stream.read())
+        stream.close()
+
+    readers = [
+        threading.Thread(target=_drain, args=(proc.stdout, out), daemon=True),
+        threading.Thread(target=_drain, args=(proc.stderr, err), daemon=True),
+    ]
+    for t in readers:
+        t.start()
+
+    reaped = {}
+
+    def _reap():
+        _, reaped["status"], reaped["usage"] = os.wait4(proc.pid, 0)
+
+    reaper = threading.Thread(target=_reap, daemon=True)
+    reaper.start()
+    reaper.join(timeout)
+    timed_out = reaper.is_alive()
+    if timed_out:
+        _kill_group(proc)
+        reaper.join()
+    for t in readers:
+        t.join()
+    proc.returncode = os.waitstatus_to_exitcode(reaped["status"])
+
+    if rec is not None:
+        # kilobytes on Linux; note the forked child starts from the parent's
+        # high-water mark, so tiny tools report ~interpreter size. JVMs dwarf it.
+        rec["rss_kb"] = reaped["usage"].ru_maxrss
+        rec["returncode"] = proc.returncode
+        if timed_out:
+            rec["timed_out"] = True
+    stderr = "".join(err)
+    if timed_out:
+        stderr += f"\n[killed after {timeout}s timeout]"
+    res = subprocess.CompletedProcess(cmd, proc.returncode, "".join(out), stderr)
+    res.timed_out = timed_out
+    return res
+
+
+# ---------- Export ----------
+def spans_to_chrome_trace(spans: List[dict]) -> dict:
+    """Chrome trace-event format ("X" complete events, microseconds)."""
+    events = []
+    for s in spans:
+        args = {k: v for k, v in s.items()
+                if k not in ("stage", "start_s", "duration_s", "pid", "tid") and v is not None}
+        events.append({
+            "name": s["stage"],
+            "cat": s.get("tool") or s["stage"],
+            "ph": "X",
+            "ts": round(s.get("start_s", 0.0) * 1e6),
+            "dur": round(s["duration_s"] * 1e6),
+            "pid": s.get("pid", 0),
+            "tid": s.get("tid", 0),
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(spans: List[dict], path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(spans_to_chrome_trace(spans), f, default=str)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/reactive.py
+#
+# Reactive-metabolite keyword matching. A keyword set (or a {category: [patterns]}
+# taxonomy) is compiled once into a single regex. The alternation sits inside a
+# lookahead and is ordered longest-first, so every start position yields its
+# longest pattern. The shorter patterns that also match there are exactly its
+# prefixes, which are precomputed. The result is the same set of hits as testing
+# each pattern with `in` (overlaps included), from one regex pass per reaction.
+#
+#   m = compile_keywords(REACTIVE_PATHWAY_KEYWORDS)
+#   m.extract(reactions)                  # {"epoxidation", ...}  (as _extract_alerts)
+#   m.count(reactions)                    # {"epoxidation": 3, ...}  rows hitting each category
+#   m.count_frame(bt_df, by="compound")   # one row per compound, one column per category
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Union
+
+import pandas as pd
+
+Keywords = Union[Iterable[str], Dict[str, Iterable[str]]]
+
+
+def _normalize(keywords: Keywords) -> Dict[str, List[str]]:
+    """category -> lowercase patterns (a plain keyword list is its own taxonomy)."""
+    if isinstance(keywords, dict):
+        return {str(k).strip().lower(): [str(p).lower() for p in v] for k, v in keywords.items()}
+    out = {}
+    for k in keywords:
+        tok = str(k).strip().lower()
+        if tok:
+            out[tok] = [tok]
+    return out
+
+
+class KeywordMatcher:
+    """Compiled keyword taxonomy; see module comment for the matching rule."""
+
+    def __init__(self, keywords: Keywords):
+        self.taxonomy = _normalize(keywords)
+        self.categories = sorted(self.taxonomy)
+        pat_to_cats: Dict[str, Set[str]] = {}
+        for cat, pats in self.taxonomy.items():
+            for p in pats:
+                if p:
+                    pat_to_cats.setdefault(p, set()).add(cat)
+        patterns = sorted(pat_to_cats, key=len, reverse=True)
+        # Longest match at a position -> categories of it and of every pattern that prefixes it
+        self._hits = {
+            p: frozenset().union(*(pat_to_cats[q] for q in patterns if p.startswith(q)))
+            for p in patterns
+        }
+        self._regex = re.compile("(?=(" + "|".join(map(re.escape, patterns)) + "))") if patterns else None
+        self._memo: Dict[str, frozenset] = {}
+
+    def categories_in(self, text) -> frozenset:
+        """Categories whose patterns occur in `text` (case-insensitive)."""
+        text = str(text or "").lower()
+        if not text or self._regex is None:
+            return frozenset()
+        hit = self._memo.get(text)
+        if hit is None:
+            found = {m.group(1) for m in self._regex.finditer(text)}
+            hit = frozenset().union(*(self._hits[p] for p in found)) if found else frozenset()
+            if len(self._memo) < 65536:
+                self._memo[text] = hit
+        return hit
+
+    def extract(self, reactions: Iterable) -> Set[str]:
+        alerts: Set[str] = set()
+        for rxn in reactions or ():
+            alerts |= self.categories_in(rxn)
+        return alerts
+
+    def count(self, reactions: Iterable) -> Dict[str, int]:
+        """Number of reactions hitting each category (categories with no hit omitted)."""
+        counts = Counter()
+        for text, n in Counter(str(r or "") for r in (reactions or ())).items():
+            for cat in self.categories_in(text):
+                counts[cat] += n
+        return dict(counts)
+
+    def count_frame(self, df: pd.DataFrame, column: str = "Reaction", by: str = None) -> pd.DataFrame:
+        """
+        Category counts over a whole output table (e.g. many BioTransformer CSVs
+        concatenated). Each distinct reaction string is matched once; the
+        result has one column per category and one row per `by` group (or a
+        single row when `by` is None).
+        """
+        texts = df[column].fillna("").astype(str).str.lower()
+        uniq = texts.drop_duplicates()
+        hits = pd.DataFrame(
+            [[cat in self.categories_in(t) for cat in self.categories] for t in uniq],
+            index=uniq.values, columns=self.categories, dtype=int,
+        )
+        rows = hits.reindex(texts.values)
+        rows.index = df.index
+        if by is None:
+            return rows.sum().to_frame().T
+        return rows.groupby(df[by]).sum()
+
+
+_LOCK = threading.Lock()
+_COMPILED: Dict[tuple, KeywordMatcher] = {}
+
+
+def _key(keywords: Keywords) -> tuple:
+    t = _normalize(keywords)
+    return tuple(sorted((k, tuple(v)) for k, v in t.items()))
+
+
+def compile_keywords(keywords: Keywords) -> KeywordMatcher:
+    """Compiled matcher for a keyword set/taxonomy, built once per distinct content."""
+    key = _key(keywords)
+    m = _COMPILED.get(key)
+    if m is None:
+        with _LOCK:
+            m = _COMPILED.setdefault(key, KeywordMatcher(keywords))
+    return m
+
+
+def graded_similarity(c1: Dict[str, int], c2: Dict[str, int]) -> float:
+    """Weighted Jaccard of two category-count dicts; 1.0 when both are empty."""
+    if not c1 and not c2:
+        return 1.0
+    keys = c1.keys() | c2.keys()
+    inter = sum(min(c1.get(k, 0), c2.get(k, 0)) for k in keys)
+    union = sum(max(c1.get(k, 0), c2.get(k, 0)) for k in keys)
+    return inter / union if union else 0.0
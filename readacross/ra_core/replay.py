@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/replay.py
+#
+# Record / replay of external calls (Java tool launches and PubChem HTTP GETs).
+# With it, the Python side (orchestration, output parsing, caching,
+# parallelism) runs and profiles the same way without Java or network.
+#
+#   RA_TOOL_MODE=live     (default) call the tools and the network
+#   RA_TOOL_MODE=record   call them and store every response as a fixture
+#   RA_TOOL_MODE=replay   serve fixtures only; nothing is launched or fetched
+#
+#   RA_FIXTURE_DIR        fixture store (default benchmarks/recorded/fixtures)
+#   RA_REPLAY_LATENCY     0 (default): return at once; "recorded": sleep the
+#                         recorded duration; a number: recorded duration x it
+#   RA_REPLAY_STRICT=1    a missing fixture raises ReplayMiss instead of
+#                         behaving like a failed tool run / network error
+#
+# A fixture is keyed by a hash of what determines the response: tool name, CLI
+# args with scratch paths reduced to their basenames, and the input text handed
+# to the tool (or the URL for HTTP). The output CSV is stored with the
+# response, one JSON file per key:
+#   <dir>/<kind>/<key[:2]>/<key>.json
+# Files are written sorted and atomically, so re-recording the same inputs
+# gives the same bytes and concurrent recorders never tear a file.
+import os
+import json
+import time
+import hashlib
+import subprocess
+from pathlib import Path
+from typing import Optional, Sequence
+
+APP_ROOT = Path(__file__).resolve().parents[1]
+
+MODES = ("live", "record", "replay")
+MODE = os.environ.get("RA_TOOL_MODE", "live").strip().lower() or "live"
+FIXTURE_DIR = Path(os.environ.get("RA_FIXTURE_DIR") or APP_ROOT / "benchmarks" / "recorded" / "fixtures")
+LATENCY = os.environ.get("RA_REPLAY_LATENCY", "0").strip().lower()
+STRICT = os.environ.get("RA_REPLAY_STRICT", "0").strip().lower() in {"1", "true", "yes"}
+
+if MODE not in MODES:
+    raise ValueError(f"RA_TOOL_MODE must be one of {MODES}, got {MODE!r}")
+
+_OUT = "<out>"
+
+STATS = {"recorded": 0, "replayed": 0, "missing": 0}
+
+
+class ReplayMiss(KeyError):
+    """No fixture for a call made in replay mode (RA_REPLAY_STRICT=1)."""
+
+
+def set_mode(mode: str, *, fixture_dir=None, latency: Optional[str] = None) -> None:
+    """Switch mode at runtime (e.g. from benchmarks.offline before the first call)."""
+    global MODE, FIXTURE_DIR, LATENCY
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    MODE = mode
+    if fixture_dir is not None:
+        FIXTURE_DIR = Path(fixture_dir)
+    if latency is not None:
+        LATENCY = str(latency).strip().lower()
+
+
+def replaying() -> bool:
+    return MODE == "replay"
+
+
+def recording() -> bool:
+    return MODE == "record"
+
+
+# ---------- Store ----------
+def fixture_key(kind: str, material) -> str:
+    blob = json.dumps([kind, material], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _path(kind: str, key: str) -> Path:
+    return FIXTURE_DIR / kind / key[:2] / f"{key}.json"
+
+
+def load(kind: str, key: str) -> Optional[dict]:
+    p = _path(kind, key)
+    if not p.exists():
+        return None
+    with p.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(kind: str, key: str, fixture: dict) -> Path:
+    p = _path(kind, key)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=1, sort_keys=True)
+    os.replace(tmp, p)
+    STATS["recorded"] += 1
+    return p
+
+
+def _sleep(duration_s: float) -> None:
+    if LATENCY in ("", "0", "zero", "none"):
+        return
+    scale = 1.0 if LATENCY == "recorded" else float(LATENCY)
+    if duration_s and scale > 0:
+        time.sleep(duration_s * scale)
+
+
+def _miss(kind: str, what: str) -> None:
+    STATS["missing"] += 1
+    print(f"[REPLAY] no {kind} fixture for {what}")
+    if STRICT:
+        raise ReplayMiss(f"{kind}: {what}")
+
+
+# ---------- Tool launches ----------
+def _normalize_args(args: Sequence[str], expect: Optional[Path], scratch: Optional[Path]) -> list:
+    out = []
+    for a in map(str, args):
+        if expect is not None and a == str(expect):
+            out.append(_OUT)
+        elif scratch is not None and a.startswith(str(scratch)):
+            out.append("<scratch>/" + Path(a).name)
+        else:
+            out.append(a)
+    return out
+
+
+def tool_key(tool: str, args: Sequence[str], *, inputs: Optional[str] = None, expect=None) -> str:
+    from ra_core.tool_io import SCRATCH_ROOT
+    expect = Path(expect) if expect is not None else None
+    return fixture_key("tool", {"tool": tool, "args": _normalize_args(args, expect, SCRATCH_ROOT), "inputs": inputs})
+
+
+def record_tool(tool: str, args: Sequence[str], res: subprocess.CompletedProcess, duration_s: float, *,
+                inputs: Optional[str] = None, expect=None, jar=None) -> None:
+    out = Path(expect) if expect is not None else None
+    save("tool", tool_key(tool, args, inputs=inputs, expect=expect), {
+        "tool": tool,
+        "jar": Path(jar).name if jar else None,
+        "returncode": res.returncode,
+        "stdout": res.stdout,
+        "stderr": res.stderr,
+        "duration_s": round(duration_s, 4),
+        "output": out.read_text(encoding="utf-8", errors="replace") if out is not None and out.exists() else None,
+    })
+
+
+def replay_tool(tool: str, args: Sequence[str], *, inputs: Optional[str] = None, expect=None,
+                rec: dict = None) -> subprocess.CompletedProcess:
+    """The recorded result of a launch; its output file is written back to `expect`."""
+    fx = load("tool", tool_key(tool, args, inputs=inputs, expect=expect))
+    if fx is None:
+        _miss("tool", f"{tool} {' '.join(map(str, args))[:120]}")
+        fx = {"returncode": 1, "stdout": "", "stderr": "[REPLAY] no fixture", "duration_s": 0.0, "output": None}
+    else:
+        STATS["replayed"] += 1
+    _sleep(fx.get("duration_s") or 0.0)
+    if expect is not None and fx.get("output") is not None:
+        Path(expect).write_text(fx["output"], encoding="utf-8")
+    if rec is not None:
+        rec["returncode"] = fx["returncode"]
+        rec["replayed"] = True
+    return subprocess.CompletedProcess(list(map(str, args)), fx["returncode"], fx.get("stdout", ""), fx.get("stderr", ""))
+
+
+# ---------- HTTP ----------
+def http_get(url: str, **kwargs):
+    """requests.get with record/replay; headers and timeout do not enter the key."""
+    import requests
+
+    key = fixture_key("http", {"method": "GET", "url": url})
+    if replaying():
+        fx = load("http", key)
+        if fx is None:
+            _miss("http", url)
+            raise requests.exceptions.ConnectionError(f"[REPLAY] no fixture for {url}")
+        STATS["replayed"] += 1
+        _sleep(fx.get("duration_s") or 0.0)
+        r = requests.Response()
+        r.status_code = fx["status_code"]
+        r._content = fx["text"].encode("utf-8")
+        r.encoding = "utf-8"
+        r.url = url
+        return r
+
+    t0 = time.perf_counter()
+    r = requests.get(url, **kwargs)
+    if recording():
+        save("http", key, {"url": url, "status_code": r.status_code, "text": r.text,
+                           "duration_s": round(time.perf_counter() - t0, 4)})
+    return r
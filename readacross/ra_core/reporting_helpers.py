@@ -9,26 +9,34 @@ import io
 import pandas as pd
 import xlsxwriter
 
-# if you implemented the fancy sectioned writer earlier, import it here.
-# otherwise we'll just dump the vertical dataframe to a single sheet.
+# the fancy sectioned writer lives in core.py (In[14]);
+# if it can't be imported we'll just dump the vertical dataframe to a single sheet.
 
 try:
-    from ra_core.reporting import _df_to_sections, _write_vertical_sheet  # optional
+    from ra_core.core import _df_to_sections, _write_vertical_sheet
     HAVE_SECTIONS = True
 except Exception:
     HAVE_SECTIONS = False
 
-from ra_core.core import run_full_read_across_assessment
+from ra_core.batch import iter_pair_results
 
-def create_excel_report_bytes(pairs, sheet_name_fmt="{i:02d} - {tname} vs {sname}") -> bytes:
+def create_excel_report_bytes(pairs, sheet_name_fmt="{i:02d} - {tname} vs {sname}", *, executor=None, max_workers=None) -> bytes:
     """
     Build an in-memory .xlsx for one or more comparisons. Returns bytes you can download in Streamlit.
+    Pairs are computed concurrently; sheets are written in input order as results arrive.
+    """
+    results = ((pair, df) for _, pair, df in iter_pair_results(pairs, executor=executor, max_workers=max_workers))
+    return write_excel_report_bytes(results, sheet_name_fmt)
+
+def write_excel_report_bytes(results, sheet_name_fmt="{i:02d} - {tname} vs {sname}") -> bytes:
+    """
+    Same workbook as create_excel_report_bytes, from already computed results:
+    an iterable of ((tname, tsmi, sname, ssmi), vertical_df).
     """
     bio = io.BytesIO()
     wb = xlsxwriter.Workbook(bio, {'in_memory': True})
 
-    for i, (tname, tsmi, sname, ssmi) in enumerate(pairs, start=1):
-        df = run_full_read_across_assessment(tname, tsmi, sname, ssmi)
+    for i, ((tname, tsmi, sname, ssmi), df) in enumerate(results, start=1):
         sheet_name = (sheet_name_fmt.format(i=i, tname=(tname or "Target")[:15], sname=(sname or "Surrogate")[:15]))[:31]
 
         if HAVE_SECTIONS:
@@ -47,4 +55,3 @@ def create_excel_report_bytes(pairs, sheet_name_fmt="{i:02d} - {tname} vs {sname
     wb.close()
     bio.seek(0)
     return bio.getvalue()
-
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/scoring.py
+#
+# Scoring profiles: every weight / threshold / bin that turns raw module
+# evidence into scores. core.py uses the scalar helpers for a single pair;
+# rescore_frame() applies a profile to many stored pairs at once (NumPy), so a
+# new weighting never needs the tools to be re-run (see ra_core.evidence).
+import os
+import json
+from dataclasses import dataclass, field, asdict, replace
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+APP_ROOT = Path(__file__).resolve().parents[1]
+PROFILE_DIR = Path(os.environ.get("RA_PROFILE_DIR", APP_ROOT / "profiles"))
+
+FUSION_KEYS = ("ecfp", "fcfp", "ap", "delta", "mcs")
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    name: str = "default"
+    # Structural alerts: mutagenicity / DART / Cramer path
+    structural_weights: Tuple[float, float, float] = (0.5, 0.3, 0.2)
+    # Metabolic similarity: component fusion and fused -> module score bins
+    fusion_weights: Dict[str, float] = field(default_factory=lambda: {
+        "ecfp": 0.45, "fcfp": 0.20, "ap": 0.20, "delta": 0.10, "mcs": 0.05,
+    })
+    # (lower edge, score), highest edge first; below the last edge scores 0.0
+    metabolic_bins: Tuple[Tuple[float, float], ...] = ((0.80, 1.0), (0.60, 0.8), (0.40, 0.5))
+    # Physchem: rule thresholds and matches -> score
+    mw_rel_tol: float = 0.20
+    logp_abs_tol: float = 1.0
+    physchem_score_map: Dict[int, float] = field(default_factory=lambda: {4: 1.0, 3: 0.6, 2: 0.33})
+
+    # ---------- scalar helpers (single pair) ----------
+    def structural_score(self, mut: float, dart: float, cramer: float) -> float:
+        wm, wd, wc = self.structural_weights
+        return (mut * wm) + (dart * wd) + (cramer * wc)
+
+    def fuse(self, comps: Dict[str, float]) -> float:
+        fused = 0.0
+        for k in FUSION_KEYS:
+            fused += self.fusion_weights.get(k, 0.0) * comps[k]
+        return fused
+
+    def metabolic_score(self, fused: float) -> float:
+        for edge, score in self.metabolic_bins:
+            if fused >= edge:
+                return score
+        return 0.0
+
+    def physchem_matches(self, t: dict, s: dict) -> int:
+        matches = 0
+        if abs(t['MW'] - s['MW']) <= self.mw_rel_tol * t['MW']: matches += 1
+        if abs(t['logP'] - s['logP']) <= self.logp_abs_tol: matches += 1
+        if (t['Charge'] == 0) == (s['Charge'] == 0): matches += 1
+        if t['is_VOC'] == s['is_VOC']: matches += 1
+        return matches
+
+    def physchem_score(self, matches: int) -> float:
+        return self.physchem_score_map.get(matches, 0.0)
+
+    # ---------- serialization ----------
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["physchem_score_map"] = {str(k): v for k, v in self.physchem_score_map.items()}
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ScoringProfile":
+        d = dict(d)
+        if "structural_weights" in d:
+            d["structural_weights"] = tuple(d["structural_weights"])
+        if "metabolic_bins" in d:
+            d["metabolic_bins"] = tuple(tuple(b) for b in d["metabolic_bins"])
+        if "physchem_score_map" in d:
+            d["physchem_score_map"] = {int(k): float(v) for k, v in d["physchem_score_map"].items()}
+        return cls(**d)
+
+    def with_changes(self, **kw) -> "ScoringProfile":
+        return replace(self, **kw)
+
+
+DEFAULT_PROFILE = ScoringProfile()
+
+
+def save_profile(profile: ScoringProfile, directory=None) -> Path:
+    directory = Path(directory or PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile.name}.json"
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(profile.to_dict(), f, indent=2)
+    return path
+
+
+def load_profile(name_or_path, directory=None) -> ScoringProfile:
+    """Load a named profile from the profile dir (or an explicit .json path)."""
+    if name_or_path in (None, "", "default"):
+        return DEFAULT_PROFILE
+    p = Path(name_or_path)
+    if p.suffix != ".json":
+        p = Path(directory or PROFILE_DIR) / f"{name_or_path}.json"
+    with p.open(encoding="utf-8") as f:
+        return ScoringProfile.from_dict(json.load(f))
+
+
+# ---------- vectorized re-scoring ----------
+def _bin_vec(x: np.ndarray, bins) -> np.ndarray:
+    conds = [x >= edge for edge, _ in bins]
+    return np.select(conds, [score for _, score in bins], default=0.0)
+
+
+def rescore_frame(ev: pd.DataFrame, profile: ScoringProfile = DEFAULT_PROFILE) -> pd.DataFrame:
+    """
+    Apply `profile` to a frame of stored evidence (one row per pair; columns as
+    in ra_core.evidence.NUMERIC_COLUMNS). Returns module scores and total.
+    """
+    f = lambda c: ev[c].to_numpy(dtype=float)
+
+    # Structural alerts
+    wm, wd, wc = profile.structural_weights
+    struct = f("mut_score") * wm + f("dart_score") * wd + f("cramer_score") * wc
+
+    # Metabolic similarity
+    fused = np.zeros(len(ev))
+    for k in FUSION_KEYS:
+        fused = fused + profile.fusion_weights.get(k, 0.0) * f(f"ms_{k}")
+    metabolic = _bin_vec(fused, profile.metabolic_bins)
+
+    # Physchem; the live run scores 0 when properties could not be computed
+    # (physchem_ok = 0; older rows without the flag: MW missing)
+    t_mw, s_mw = f("t_mw"), f("s_mw")
+    ok = ~np.isnan(t_mw) & ~np.isnan(s_mw)
+    if "physchem_ok" in ev.columns:
+        flag = f("physchem_ok")
+        ok = np.where(np.isnan(flag), ok, flag > 0)
+    matches = (
+        (np.abs(t_mw - s_mw) <= profile.mw_rel_tol * t_mw).astype(int)
+        + (np.abs(f("t_logp") - f("s_logp")) <= profile.logp_abs_tol)
+        + ((f("t_charge") == 0) == (f("s_charge") == 0))
+        + (f("t_voc") == f("s_voc"))
+    )
+    matches = np.where(ok, matches, 0)
+    lut = np.array([profile.physchem_score_map.get(m, 0.0) for m in range(5)])
+    pchem = np.where(ok, lut[matches], 0.0)
+
+    return pd.DataFrame({
+        "pchem_score": pchem,
+        "physchem_matches": matches,
+        "metabolic_fused": fused,
+        "metabolic_score": metabolic,
+        "struct_score": struct,
+        "total_score": pchem + metabolic + struct,
+    }, index=ev.index)
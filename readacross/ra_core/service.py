@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/service.py
+#
+# Local HTTP/JSON scoring service (stdlib asyncio, no web framework). One
+# long-lived process keeps ra_core.core imported and the tool cache, the
+# standardizer memo, AppCDS archives and the worker pool warm across requests.
+# Scripts such as the LIMS integration no longer pay the import and JVM
+# warm-up on every call.
+#
+#   python -m ra_core.service --port 8765             # RA_SERVICE_HOST / RA_SERVICE_PORT
+#
+#   GET  /health                   liveness, uptime, cache and governor counters
+#   GET  /ready                    200 once the startup warm-up is done, 503 before (ra_core.warmup)
+#   POST /v1/pair                  {"target_name", "target_smiles", "surrogate_name", "surrogate_smiles",
+#                                   "profile"?, "detail"?} -> scores (+ full table when detail)
+#   POST /v1/pairs                 {"pairs": [[tn, ts, sn, ss] | {...}, ...], "profile"?, "detail"?}
+#   POST /v1/screen                {"target_name", "target_smiles", "candidates": [[name, smiles], ...],
+#                                   "config"?: CascadeConfig fields, "profile"?}
+#   POST /v1/compound              {"name", "smiles", "cutoff"?} -> per-compound tool profile
+#   POST /v1/compounds             {"compounds": [[name, smiles] | {...}, ...], "cutoff"?}
+#
+# Batch endpoints answer with one JSON document, or with NDJSON (one result per
+# line, in input order, each sent as soon as it is ready) when the request asks
+# for it: `Accept: application/x-ndjson` or `?stream=1`.
+# "profile" is a scoring profile name, a path to a .json profile, or the
+# profile itself as an object (ra_core.scoring).
+#
+# Pairs and compounds run on one shared thread pool (RA_SERVICE_THREADS), so
+# they share the per-compound tool cache; JVM launches stay bounded by the
+# governor. With RA_SERVICE_PROCESSES=N they run on a persistent process pool
+# from ra_core.workers instead, initialized once at startup.
+# At startup the service runs ra_core.warmup in the background (canary pair,
+# RA_WARM_COMPOUNDS preload), in each pool worker when there is a pool;
+# RA_SERVICE_WARMUP=0 skips it. Missing Toxtree / BioTransformer keeps /ready at
+# 503 (the import fails outright unless RA_ALLOW_MISSING_TOOLS is set).
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+HOST = os.environ.get("RA_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.environ.get("RA_SERVICE_PORT", "8765"))
+THREADS = int(os.environ.get("RA_SERVICE_THREADS", os.environ.get("RA_REPORT_WORKERS", "8")))
+PROCESSES = int(os.environ.get("RA_SERVICE_PROCESSES", "0"))
+MAX_BODY = int(os.environ.get("RA_SERVICE_MAX_BODY", str(16 << 20)))
+MAX_BATCH = int(os.environ.get("RA_SERVICE_MAX_BATCH", "5000"))
+WARMUP = os.environ.get("RA_SERVICE_WARMUP", "1").strip().lower() not in {"0", "false", "no"}
+
+NDJSON = "application/x-ndjson"
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------- JSON ----------
+def _jsonable(obj):
+    """Plain JSON types: numpy scalars unwrapped, NaN/inf -> null, sets sorted."""
+    if isinstance(obj, dict):
+        return {str(k): _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, (set, frozenset)):
+        return sorted(_jsonable(v) for v in obj)
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    return str(obj)
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(_jsonable(obj), separators=(",", ":")).encode("utf-8")
+
+
+# ---------- Request parsing ----------
+PAIR_FIELDS = ("target_name", "target_smiles", "surrogate_name", "surrogate_smiles")
+
+
+def _pair(item) -> tuple:
+    if isinstance(item, dict):
+        pair = tuple(str(item.get(k) or "") for k in PAIR_FIELDS)
+    elif isinstance(item, (list, tuple)) and len(item) == 4:
+        pair = tuple(str(v or "") for v in item)
+    else:
+        raise HTTPError(400, "a pair is {target_name, target_smiles, surrogate_name, surrogate_smiles} or a 4-item list")
+    if not pair[1] or not pair[3]:
+        raise HTTPError(400, "target_smiles and surrogate_smiles are required")
+    return pair
+
+
+def _compound(item) -> tuple:
+    if isinstance(item, dict):
+        name, smiles = str(item.get("name") or ""), str(item.get("smiles") or "")
+    elif isinstance(item, (list, tuple)) and len(item) == 2:
+        name, smiles = (str(v or "") for v in item)
+    else:
+        raise HTTPError(400, "a compound is {name, smiles} or a [name, smiles] list")
+    if not smiles:
+        raise HTTPError(400, "smiles is required")
+    return name, smiles
+
+
+def _cutoff(body: dict) -> float:
+    """SyGMa score cutoff of a compound request: a number in [0, 1] (default 0.01)."""
+    value = body.get("cutoff", 0.01)
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        cutoff = float(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'cutoff' must be a number, got {value!r}")
+    if not 0.0 <= cutoff <= 1.0:
+        raise HTTPError(400, f"'cutoff' must be between 0 and 1, got {cutoff}")
+    return cutoff
+
+
+def _batch(body: dict, key: str, parse) -> list:
+    items = body.get(key)
+    if not isinstance(items, list) or not items:
+        raise HTTPError(400, f"'{key}' must be a non-empty list")
+    if len(items) > MAX_BATCH:
+        raise HTTPError(413, f"at most {MAX_BATCH} {key} per request (RA_SERVICE_MAX_BATCH)")
+    return [parse(i) for i in items]
+
+
+def _profile_dict(spec) -> Optional[dict]:
+    """Resolve the request's scoring profile to a plain dict (picklable for process workers)."""
+    if spec in (None, "", "default"):
+        return None
+    from ra_core.scoring import ScoringProfile, load_profile
+    try:
+        prof = ScoringProfile.from_dict(spec) if isinstance(spec, dict) else load_profile(str(spec))
+    except (OSError, TypeError, ValueError) as e:
+        raise HTTPError(400, f"bad scoring profile: {e}")
+    return prof.to_dict()
+
+
+# ---------- Work items (top level so process workers can run them) ----------
+def score_pair(pair: tuple, profile_dict: Optional[dict] = None, detail: bool = False) -> dict:
+    """One pair -> flat result row (ra_core.batch.summary_row); errors are reported in the row."""
+    from ra_core import core
+    from ra_core.batch import summary_row
+    from ra_core.scoring import ScoringProfile
+    t0 = time.perf_counter()
+    try:
+        profile = ScoringProfile.from_dict(profile_dict) if profile_dict else None
+        df = core.run_full_read_across_assessment(*pair, profile=profile)
+        row = summary_row(pair, df)
+        if detail:
+            row["detail"] = {str(k): [v["Target Result"], v["Surrogate Result"]] for k, v in df.iterrows()}
+        row["error"] = None
+    except Exception as e:
+        row = dict(zip(PAIR_FIELDS, pair))
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - t0, 4)
+    return _jsonable(row)
+
+
+def profile_compound(name: str, smiles: str, cutoff: float = 0.01) -> dict:
+    """Per-compound view of every tool the pair modules use (all from the shared tool cache)."""
+    from ra_core import core
+    from ra_core.metabolism import get_backend
+    from ra_core.standardize import standardize, canonical_key
+    t0 = time.perf_counter()
+    out = {"name": name, "smiles": smiles}
+    try:
+        path, klass = core._get_cramer_decision_path(smiles)
+        out.update({
+            "standardized": standardize(smiles),
+            "key": canonical_key(smiles),
+            "physchem": core._physchem_props(name, smiles),
+            "ames_alerts": core._get_ames_alerts(smiles),
+            "cramer": {"class": klass, "path": path},
+            "dart_alerts": sorted(core.flat_alert_lookup[a]["name"] for a in core._screen_for_dart_alerts(smiles)),
+            "metabolites": get_backend().metabolites(smiles, cutoff),
+            "reactions": sorted(core.run_biotransformer_and_get_reactions(smiles)),
+            "reactive_pathways": core.reactive_pathway_counts(smiles),
+            "error": None,
+        })
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    out["seconds"] = round(time.perf_counter() - t0, 4)
+    return _jsonable(out)
+
+
+def screen(target_name: str, target_smiles: str, candidates: list, config: dict, profile_dict: Optional[dict]) -> list:
+    from ra_core.cascade import CascadeConfig, run_cascade
+    from ra_core.scoring import ScoringProfile
+    try:
+        cfg = CascadeConfig(**{k: tuple(v) if isinstance(v, list) else v for k, v in (config or {}).items()})
+    except TypeError as e:
+        raise HTTPError(400, f"bad 'config': {e}") from None
+    profile = ScoringProfile.from_dict(profile_dict) if profile_dict else None
+    df = run_cascade(target_name, target_smiles, candidates, cfg, profile)
+    return [_jsonable(r) for r in df.to_dict("records")]
+
+
+# ---------- Service ----------
+class ScoringService:
+    def __init__(self, *, threads: int = THREADS, processes: int = PROCESSES, warm: bool = WARMUP):
+        t0 = time.perf_counter()
+        from ra_core import core  # noqa: F401  (alert tables, JAR resolution, tool profiles)
+        self.import_s = time.perf_counter() - t0
+        self.n_threads, self.n_processes = threads, 0
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ra-service")
+        self.pool = None
+        if processes:
+            from ra_core.workers import make_pool, pool_size
+            # Pool workers warm their own tool cache: requests read that one, not the parent's
+            self.n_processes = pool_size(processes)
+            self.pool = make_pool(self.n_processes, warm=warm)
+        self.warm = warm
+        self.started = time.time()
+        self.requests = 0
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/ready"): self.ready,
+            ("POST", "/v1/pair"): self.pair,
+            ("POST", "/v1/pairs"): self.pairs,
+            ("POST", "/v1/screen"): self.screen,
+            ("POST", "/v1/compound"): self.compound,
+            ("POST", "/v1/compounds"): self.compounds,
+        }
+
+    @property
+    def executor(self):
+        return self.pool or self.threads
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- handlers: return a JSON-able object, or an async iterator for NDJSON ---
+    async def health(self, body, stream):
+        from ra_core.cache import TOOL_CACHE
+        from ra_core.governor import metrics
+        from ra_core.standardize import memo_stats
+        from ra_core.warmup import readiness
+        return {"status": "ok", "warmup": readiness()["status"], "uptime_s": round(time.time() - self.started, 1), "requests": self.requests,
+                "import_s": round(self.import_s, 3), "workers": {"threads": self.n_threads,
+                "processes": self.n_processes},
+                "tool_cache": TOOL_CACHE.stats(), "standardize_memo": memo_stats(), "governor": metrics()}
+
+    async def ready(self, body, stream):
+        from ra_core.warmup import readiness
+        state = readiness()
+        return (200 if state["status"] == "ready" or not self.warm else 503), state
+
+    async def pair(self, body, stream):
+        return await self._run(score_pair, _pair(body), _profile_dict(body.get("profile")), bool(body.get("detail")))
+
+    async def pairs(self, body, stream):
+        pairs = _batch(body, "pairs", _pair)
+        prof, detail = _profile_dict(body.get("profile")), bool(body.get("detail"))
+        if self.pool is None:
+            # Threads share the tool cache: run each distinct compound's tools once first
+            from ra_core.batch import unique_compounds, _warm_compound
+            await asyncio.gather(*(self._run(_warm_compound, n, s) for n, s in unique_compounds(pairs)))
+        futures = [self._run(score_pair, p, prof, detail) for p in pairs]
+        return self._ordered(futures) if stream else {"results": [await f for f in futures]}
+
+    async def compound(self, body, stream):
+        name, smiles = _compound(body)
+        return await self._run(profile_compound, name, smiles, _cutoff(body))
+
+    async def compounds(self, body, stream):
+        cutoff = _cutoff(body)
+        futures = [self._run(profile_compound, n, s, cutoff) for n, s in _batch(body, "compounds", _compound)]
+        return self._ordered(futures) if stream else {"results": [await f for f in futures]}
+
+    async def screen(self, body, stream):
+        _, target_smiles = _compound({"name": body.get("target_name"), "smiles": body.get("target_smiles")})
+        candidates = _batch(body, "candidates", _compound)
+        config = body.get("config") or {}
+        if not isinstance(config, dict):
+            raise HTTPError(400, "'config' must be an object of CascadeConfig fields")
+        # The cascade fans out on its own; run it beside the pair pool, not inside it
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, screen, str(body.get("target_name") or ""), target_smiles, candidates, config,
+            _profile_dict(body.get("profile")))
+        if stream:
+            return self._iter(rows)
+        return {"results": rows}
+
+    @staticmethod
+    async def _ordered(futures):
+        for f in futures:
+            yield await f
+
+    @staticmethod
+    async def _iter(rows):
+        for r in rows:
+            yield r
+
+    # --- HTTP/1.1 plumbing ---
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self._send(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {"error": f"body over {MAX_BODY} bytes"}, keep_alive=False)
+                    break
+                raw = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                await self._dispatch(writer, method.upper(), target, headers, raw, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, writer, method, target, headers, raw, keep_alive):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        stream = NDJSON in headers.get("accept", "") or query.get("stream", ["0"])[0] in ("1", "true", "yes")
+        t0 = time.perf_counter()
+        status = 200
+        try:
+            handler = self.routes.get((method, url.path))
+            if handler is None:
+                allowed = [m for m, p in self.routes if p == url.path]
+                raise HTTPError(405 if allowed else 404, f"{method} {url.path} not supported")
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError as e:
+                raise HTTPError(400, f"invalid JSON: {e}")
+            if not isinstance(body, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            result = await handler(body, stream)
+            if hasattr(result, "__aiter__"):
+                await self._send_stream(writer, result, keep_alive)
+            else:
+                if isinstance(result, tuple):
+                    status, result = result
+                await self._send(writer, status, result, keep_alive=keep_alive)
+        except HTTPError as e:
+            status = e.status
+            await self._send(writer, e.status, {"error": str(e)}, keep_alive=keep_alive)
+        except Exception as e:
+            status = 500
+            traceback.print_exc()
+            await self._send(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive=keep_alive)
+        print(f"[SERVICE] {method} {url.path} {status} {time.perf_counter() - t0:.3f}s")
+
+    @staticmethod
+    def _head(status: int, content_type: str, keep_alive: bool, extra: str) -> bytes:
+        return (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n{extra}"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer, status: int, obj, *, keep_alive: bool):
+        data = _dumps(obj)
+        writer.write(self._head(status, "application/json", keep_alive, f"Content-Length: {len(data)}\r\n") + data)
+        await writer.drain()
+
+    async def _send_stream(self, writer, rows, keep_alive: bool):
+        writer.write(self._head(200, NDJSON, keep_alive, "Transfer-Encoding: chunked\r\n"))
+        await writer.drain()
+        async for row in rows:
+            line = _dumps(row) + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host: str = HOST, port: int = PORT, **kw):
+    svc = ScoringService(**kw)
+    server = await asyncio.start_server(svc.handle, host, port)
+    print(f"[SERVICE] listening on http://{host}:{port} (ra_core import {svc.import_s:.1f}s)")
+    if svc.warm:
+        from ra_core.warmup import warm_up_in_background
+        # With a process pool the parent only spawns the (self-warming) workers
+        warm_up_in_background(pool=svc.pool, pool_workers=svc.n_processes,
+                              **({"canary": False, "compounds": ()} if svc.pool else {}))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        svc.close()
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="Read-across HTTP/JSON scoring service")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--threads", type=int, default=THREADS)
+    ap.add_argument("--processes", type=int, default=PROCESSES, help="0 = in-process thread pool (shared cache)")
+    ap.add_argument("--no-warmup", action="store_true", help="skip the startup warm-up (ra_core.warmup)")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, threads=args.threads, processes=args.processes,
+                          warm=WARMUP and not args.no_warmup))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/similarity_index.py
+#
+# Persistent Morgan fingerprint index over a compound inventory, for proposing
+# surrogate candidates instead of requiring the user to already know them.
+#
+#   python -m ra_core.similarity_index build inventory.csv ./inventory_index
+#   python -m ra_core.similarity_index search ./inventory_index "CC(=O)Nc1ccc(O)cc1" -k 20
+#
+# Layout of an index directory:
+#   fps.u64      packed fingerprints (N x nbits/64 uint64), rows sorted by popcount
+#   popcnt.u16   popcount per row
+#   records.tsv  "name<TAB>smiles" per row (same order) + records.off byte offsets
+#   meta.json    nbits, radius, N, bucket starts per popcount
+# Search uses BitBound pruning: a row with popcount b can only reach Tanimoto
+# min(a, b) / max(a, b) against a query with popcount a, and rows are contiguous
+# per popcount, so only a narrow slice of the memmap is ever touched.
+import os
+import csv
+import json
+import heapq
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Tuple, Optional
+
+import numpy as np
+import pandas as pd
+from rdkit import Chem, RDLogger
+from rdkit.Chem import rdFingerprintGenerator
+
+RDLogger.DisableLog('rdApp.*')
+
+_GENERATORS = {}
+
+
+def _morgan_gen(radius: int, nbits: int):
+    key = (radius, nbits)
+    if key not in _GENERATORS:
+        _GENERATORS[key] = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=nbits)
+    return _GENERATORS[key]
+
+
+def _packed_fp(mol, radius: int, nbits: int) -> np.ndarray:
+    """Morgan bits packed into uint64 words (same bits as GetMorganFingerprintAsBitVect)."""
+    bits = _morgan_gen(radius, nbits).GetFingerprintAsNumPy(mol).astype(np.uint8)
+    return np.packbits(bits).view(np.uint64)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount_rows(a: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(a).sum(axis=1, dtype=np.int32)
+else:  # NumPy < 2.0
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount_rows(a: np.ndarray) -> np.ndarray:
+        return _POP8[a.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def _read_inventory(path) -> Iterable[Tuple[str, str]]:
+    """Yield (name, smiles) from a CSV with name/smiles columns or a .smi file."""
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix.lower() in (".smi", ".smiles", ".txt"):
+            for i, line in enumerate(f):
+                parts = line.strip().split(None, 1)
+                if parts:
+                    yield (parts[1] if len(parts) > 1 else f"cmpd_{i}"), parts[0]
+            return
+        reader = csv.DictReader(f)
+        cols = {c.lower(): c for c in reader.fieldnames or []}
+        scol = cols.get("smiles")
+        ncol = cols.get("name") or cols.get("id")
+        if scol is None:
+            raise ValueError(f"{path}: expected a 'smiles' column")
+        for i, row in enumerate(reader):
+            yield (row[ncol] if ncol else f"cmpd_{i}"), row[scol]
+
+
+class SimilarityIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / "meta.json").open(encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.nbits = self.meta["nbits"]
+        self.radius = self.meta["radius"]
+        self.n = self.meta["n"]
+        words = self.nbits // 64
+        self.fps = np.memmap(self.path / "fps.u64", dtype=np.uint64, mode="r", shape=(self.n, words))
+        self.popcnt = np.memmap(self.path / "popcnt.u16", dtype=np.uint16, mode="r", shape=(self.n,))
+        self.bucket_start = np.asarray(self.meta["bucket_start"], dtype=np.int64)  # len nbits + 2
+        self.offsets = np.memmap(self.path / "records.off", dtype=np.uint64, mode="r", shape=(self.n,))
+
+    def __len__(self):
+        return self.n
+
+    # ---------- build ----------
+    @classmethod
+    def build(cls, inventory, out_dir, *, nbits: int = 2048, radius: int = 2, chunk: int = 50000) -> "SimilarityIndex":
+        """Fingerprint an inventory (path or iterable of (name, smiles)) into `out_dir`."""
+        if nbits % 64:
+            raise ValueError("nbits must be a multiple of 64")
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        items = _read_inventory(inventory) if isinstance(inventory, (str, Path)) else inventory
+        words = nbits // 64
+
+        # Pass 1: unsorted fingerprints + records, streamed to disk
+        raw_fp = out / "fps.unsorted"
+        raw_rec = out / "records.unsorted"
+        pcs, offs, n, skipped = [], [], 0, 0
+        with raw_fp.open("wb") as ffp, raw_rec.open("wb") as frec:
+            buf = []
+            for name, smi in items:
+                mol = Chem.MolFromSmiles(smi) if smi else None
+                if mol is None:
+                    skipped += 1
+                    continue
+                fp = _packed_fp(mol, radius, nbits)
+                buf.append(fp)
+                offs.append(frec.tell())
+                frec.write(f"{str(name).replace(chr(9), ' ')}\t{smi}\n".encode("utf-8"))
+                n += 1
+                if len(buf) >= chunk:
+                    block = np.vstack(buf)
+                    pcs.append(_popcount_rows(block))
+                    ffp.write(block.tobytes())
+                    buf = []
+            if buf:
+                block = np.vstack(buf)
+                pcs.append(_popcount_rows(block))
+                ffp.write(block.tobytes())
+
+        if n == 0:
+            # Zero-length files cannot be memory-mapped; there is nothing to search anyway
+            raw_fp.unlink()
+            raw_rec.unlink()
+            raise ValueError(f"inventory has no parsable SMILES ({skipped} rows skipped); nothing to index")
+        popcnt = np.concatenate(pcs)
+        order = np.argsort(popcnt, kind="stable")
+
+        # Pass 2: rows sorted by popcount
+        src = np.memmap(raw_fp, dtype=np.uint64, mode="r", shape=(n, words))
+        dst = np.memmap(out / "fps.u64", dtype=np.uint64, mode="w+", shape=(n, words))
+        for i in range(0, n, chunk):
+            dst[i:i + chunk] = src[order[i:i + chunk]]
+        dst.flush()
+        del dst, src
+        popcnt[order].astype(np.uint16).tofile(out / "popcnt.u16")
+
+        offs = np.asarray(offs, dtype=np.uint64)
+        new_offs = np.empty(n, dtype=np.uint64)
+        with raw_rec.open("rb") as fin, (out / "records.tsv").open("wb") as fout:
+            for j, i in enumerate(order):
+                fin.seek(int(offs[i]))
+                new_offs[j] = fout.tell()
+                fout.write(fin.readline())
+        new_offs.tofile(out / "records.off")
+        raw_fp.unlink()
+        raw_rec.unlink()
+
+        bucket_start = np.searchsorted(popcnt[order], np.arange(nbits + 2)).tolist()
+        with (out / "meta.json").open("w", encoding="utf-8") as f:
+            json.dump({"nbits": nbits, "radius": radius, "n": n, "skipped": skipped,
+                       "bucket_start": bucket_start}, f)
+        print(f"[INDEX] {n} compounds indexed ({skipped} unparsable skipped) -> {out}")
+        return cls(out)
+
+    # ---------- search ----------
+    def _records(self, rows) -> list:
+        out = []
+        with (self.path / "records.tsv").open("rb") as f:
+            for r in rows:
+                f.seek(int(self.offsets[r]))
+                name, smi = f.readline().decode("utf-8").rstrip("\n").split("\t", 1)
+                out.append((name, smi))
+        return out
+
+    def _block_sims(self, q: np.ndarray, qc: int, lo: int, hi: int) -> np.ndarray:
+        inter = _popcount_rows(np.bitwise_and(self.fps[lo:hi], q))
+        union = qc + self.popcnt[lo:hi].astype(np.int32) - inter
+        return np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+
+    def search_fp(self, q: np.ndarray, k: int = 10, threshold: float = 0.0,
+                  n_threads: Optional[int] = None, block_rows: int = 65536):
+        """Top-k (row, similarity) for a packed query; rows below `threshold` are never returned."""
+        qc = int(_popcount_rows(q[None, :])[0])
+        if qc == 0 or self.n == 0:
+            return []
+        # popcount buckets in order of their best reachable similarity
+        counts = np.arange(self.nbits + 1)
+        bound = np.minimum(counts, qc) / np.maximum(np.maximum(counts, qc), 1)
+        nonempty = self.bucket_start[1:] > self.bucket_start[:-1]
+        cand = np.nonzero(nonempty & (bound >= threshold))[0]
+        cand = cand[np.argsort(-bound[cand], kind="stable")]
+
+        heap = []  # (sim, row) min-heap of the current top-k
+        pool = ThreadPoolExecutor(max_workers=n_threads or os.cpu_count() or 1)
+        try:
+            i = 0
+            while i < len(cand):
+                kth = heap[0][0] if len(heap) >= k else threshold
+                if bound[cand[i]] < kth:
+                    break  # no remaining bucket can enter the top-k
+                # gather buckets with the same bound tier into one batch of row ranges
+                ranges, rows = [], 0
+                while i < len(cand) and (rows < block_rows or not ranges):
+                    b = cand[i]
+                    if bound[b] < kth:
+                        break
+                    lo, hi = int(self.bucket_start[b]), int(self.bucket_start[b + 1])
+                    for s in range(lo, hi, block_rows):
+                        ranges.append((s, min(hi, s + block_rows)))
+                    rows += hi - lo
+                    i += 1
+                results = pool.map(lambda r: (r[0], self._block_sims(q, qc, r[0], r[1])), ranges)
+                for lo, sims in results:
+                    keep = np.nonzero(sims >= max(threshold, heap[0][0] if len(heap) >= k else threshold))[0]
+                    if len(keep) > k:
+                        keep = keep[np.argpartition(-sims[keep], k - 1)[:k]]
+                    for j in keep:
+                        item = (float(sims[j]), lo + int(j))
+                        if len(heap) < k:
+                            heapq.heappush(heap, item)
+                        elif item > heap[0]:
+                            heapq.heapreplace(heap, item)
+        finally:
+            pool.shutdown(wait=True)
+        return sorted(((row, sim) for sim, row in heap), key=lambda t: -t[1])
+
+    def search(self, smiles: str, k: int = 10, threshold: float = 0.0, n_threads: Optional[int] = None) -> pd.DataFrame:
+        """Top-k inventory compounds by Morgan Tanimoto to `smiles` (name, smiles, similarity)."""
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            return pd.DataFrame(columns=["name", "smiles", "similarity"])
+        hits = self.search_fp(_packed_fp(mol, self.radius, self.nbits), k=k, threshold=threshold, n_threads=n_threads)
+        recs = self._records([r for r, _ in hits])
+        return pd.DataFrame(
+            [{"name": n, "smiles": s, "similarity": sim} for (n, s), (_, sim) in zip(recs, hits)],
+            columns=["name", "smiles", "similarity"],
+        )
+
+
+# ---------- Pipeline hand-off ----------
+def _canonical(smiles: str) -> Optional[str]:
+    mol = Chem.MolFromSmiles(smiles) if smiles else None
+    return Chem.MolToSmiles(mol) if mol is not None else None
+
+
+def propose_surrogates(index: SimilarityIndex, target_smiles: str, k: int = 10,
+                       threshold: float = 0.0, exclude_self: bool = True) -> pd.DataFrame:
+    """
+    Top-k surrogate candidates for a target. With `exclude_self`, inventory
+    rows that are the target itself (same canonical SMILES) are dropped;
+    different compounds with an identical fingerprint (similarity 1.0) are kept.
+    """
+    if not exclude_self:
+        return index.search(target_smiles, k=k, threshold=threshold)
+    target = _canonical(target_smiles)
+    want = k + 1
+    while True:
+        hits = index.search(target_smiles, k=want, threshold=threshold)
+        # only rows with an identical fingerprint can be the target
+        same = hits["similarity"] >= 1.0 - 1e-12
+        is_self = same & hits["smiles"].map(lambda smi: _canonical(smi) == target)
+        kept = hits[~is_self]
+        # the target may be listed several times: widen until k others remain
+        if len(kept) >= k or len(hits) < want:
+            return kept.head(k).reset_index(drop=True)
+        want += int(is_self.sum())
+
+
+def screen_proposed_surrogates(index: SimilarityIndex, target_name: str, target_smiles: str,
+                               k: int = 10, threshold: float = 0.0, **assess_kw) -> pd.DataFrame:
+    """Propose surrogates from the index and run the full read-across on each."""
+    from ra_core.core import run_full_read_across_assessment
+    rows = []
+    for _, hit in propose_surrogates(index, target_smiles, k=k, threshold=threshold).iterrows():
+        df = run_full_read_across_assessment(target_name, target_smiles, hit["name"], hit["smiles"], **assess_kw)
+        rows.append({
+            "surrogate_name": hit["name"],
+            "surrogate_smiles": hit["smiles"],
+            "index_similarity": hit["similarity"],
+            "total_score": df.loc["TOTAL SCORE (Sum of Modules)", "Target Result"],
+            "pchem_score": df.loc["P-Chem Module Score", "Target Result"],
+            "metabolic_score": df.loc["Metabolic Similarity Module Score", "Target Result"],
+            "struct_score": df.loc["Structural Alert Module Score", "Target Result"],
+        })
+    return pd.DataFrame(rows).sort_values("total_score", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def main(argv=None) -> int:
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Fingerprint index for surrogate discovery")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("inventory")
+    b.add_argument("out_dir")
+    b.add_argument("--nbits", type=int, default=2048)
+    b.add_argument("--radius", type=int, default=2)
+    s = sub.add_parser("search")
+    s.add_argument("index_dir")
+    s.add_argument("smiles")
+    s.add_argument("-k", type=int, default=10)
+    s.add_argument("--threshold", type=float, default=0.0)
+    s.add_argument("--threads", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        SimilarityIndex.build(args.inventory, args.out_dir, nbits=args.nbits, radius=args.radius)
+        return 0
+    idx = SimilarityIndex(args.index_dir)
+    t0 = time.perf_counter()
+    hits = idx.search(args.smiles, k=args.k, threshold=args.threshold, n_threads=args.threads)
+    print(hits.to_string(index=False))
+    print(f"[INDEX] searched {len(idx)} compounds in {time.perf_counter() - t0:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/standardize.py
+#
+# One configurable standardization pipeline for both uses in core.py:
+#   "biotransformer"  Cleanup -> FragmentParent -> Uncharger -> canonical tautomer
+#                     (was standardize_smiles; feeds BioTransformer)
+#   "comparison"      LargestFragment -> Reionize -> Uncharger -> canonical tautomer -> Sanitize
+#                     (was _standardize; feeds metabolite comparison)
+# Results are memoized per (pipeline, input SMILES): an in-process LRU of
+# standardized Mols (copies handed out) and, optionally, a SQLite table of
+# canonical SMILES shared across processes and restarts (RA_STD_CACHE_DB).
+# Tautomer canonicalization dominates the cost and the same metabolites recur
+# across pairs, so most calls become lookups. RA_STD_CACHE_SIZE bounds the LRU.
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rdkit import Chem
+from rdkit.Chem.MolStandardize import rdMolStandardize
+
+CACHE_SIZE = int(os.environ.get("RA_STD_CACHE_SIZE", "20000"))
+DISK_CACHE = os.environ.get("RA_STD_CACHE_DB", "").strip() or None
+
+# ---------- Steps ----------
+_local = threading.local()
+
+
+def _tautomer_enumerator():
+    # One enumerator per thread, default parameters (as both original standardizers used)
+    te = getattr(_local, "taut_enum", None)
+    if te is None:
+        te = _local.taut_enum = rdMolStandardize.TautomerEnumerator()
+    return te
+
+
+def _sanitize(m):
+    Chem.SanitizeMol(m)
+    return m
+
+
+STEPS = {
+    "cleanup": lambda m: rdMolStandardize.Cleanup(m),
+    "fragment_parent": lambda m: rdMolStandardize.FragmentParent(m),
+    "largest_fragment": lambda m: rdMolStandardize.LargestFragmentChooser().choose(m),
+    "reionize": lambda m: rdMolStandardize.Reionize(m),
+    "uncharge": lambda m: rdMolStandardize.Uncharger().uncharge(m),
+    "canonical_tautomer": lambda m: _tautomer_enumerator().Canonicalize(m),
+    "sanitize": _sanitize,
+}
+
+
+@dataclass(frozen=True)
+class Pipeline:
+    name: str
+    steps: Tuple[str, ...]
+    # "none": failures give None (standardize_smiles); "raise": propagate (_standardize)
+    on_error: str = "none"
+
+    def run(self, mol: Chem.Mol) -> Optional[Chem.Mol]:
+        if mol is None:
+            return None
+        try:
+            for step in self.steps:
+                mol = STEPS[step](mol)
+            return mol
+        except Exception:
+            if self.on_error == "raise":
+                raise
+            return None
+
+
+# core._standardize falls back to a pass-through on RDKit builds without
+# TautomerEnumeratorParams; the comparison pipeline keeps that behaviour so
+# metabolic scores do not shift between builds.
+_COMPARISON_STEPS = ("largest_fragment", "reionize", "uncharge", "canonical_tautomer", "sanitize")
+if not hasattr(rdMolStandardize, "TautomerEnumeratorParams"):
+    _COMPARISON_STEPS = ()
+
+PIPELINES: Dict[str, Pipeline] = {
+    "biotransformer": Pipeline("biotransformer", ("cleanup", "fragment_parent", "uncharge", "canonical_tautomer")),
+    "comparison": Pipeline("comparison", _COMPARISON_STEPS, on_error="raise"),
+}
+
+
+def register_pipeline(pipeline: Pipeline) -> None:
+    for step in pipeline.steps:
+        if step not in STEPS:
+            raise ValueError(f"Unknown standardization step: {step!r}")
+    PIPELINES[pipeline.name] = pipeline
+
+
+def _pipeline_key(p: Pipeline) -> str:
+    return p.name + ":" + ",".join(p.steps)
+
+
+# ---------- Memo ----------
+class _Memo:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, self._data[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _DiskMemo:
+    """(pipeline key, input SMILES) -> standardized canonical SMILES ('' = failed)."""
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS std (pipeline TEXT, smiles TEXT, out TEXT, PRIMARY KEY (pipeline, smiles))")
+        self._conn.commit()
+
+    def get(self, pkey, smiles) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT out FROM std WHERE pipeline = ? AND smiles = ?", (pkey, smiles)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, pkey, items: Iterable[Tuple[str, str]]) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO std VALUES (?, ?, ?)", [(pkey, s, o) for s, o in items])
+            self._conn.commit()
+
+
+_MEMO = _Memo(CACHE_SIZE)
+_DISK = None
+
+
+def _disk():
+    global _DISK
+    if _DISK is None and DISK_CACHE:
+        _DISK = _DiskMemo(DISK_CACHE)
+    return _DISK
+
+
+def _lookup(pipeline: Pipeline, smiles: str):
+    """(found, Mol-or-None) from the LRU, then from disk."""
+    pkey = _pipeline_key(pipeline)
+    found, mol = _MEMO.get((pkey, smiles))
+    if found:
+        return True, mol
+    disk = _disk()
+    if disk is not None:
+        out = disk.get(pkey, smiles)
+        if out is not None:
+            mol = Chem.MolFromSmiles(out) if out else None
+            _MEMO.put((pkey, smiles), mol)
+            _MEMO.disk_hits += 1
+            return True, mol
+    return False, None
+
+
+def _store(pipeline: Pipeline, smiles: str, mol: Optional[Chem.Mol], to_disk: bool = True) -> None:
+    pkey = _pipeline_key(pipeline)
+    _MEMO.put((pkey, smiles), mol)
+    disk = _disk()
+    if to_disk and disk is not None:
+        disk.put_many(pkey, [(smiles, Chem.MolToSmiles(mol) if mol is not None else "")])
+
+
+# ---------- Public API ----------
+def standardized_mol(smiles: str, pipeline: str = "comparison") -> Optional[Chem.Mol]:
+    """Standardized Mol for `smiles` (a private copy; safe to modify), or None."""
+    p = PIPELINES[pipeline]
+    if not isinstance(smiles, str):
+        return None
+    found, mol = _lookup(p, smiles)
+    if not found:
+        mol = p.run(Chem.MolFromSmiles(smiles))
+        _store(p, smiles, mol)
+    return Chem.Mol(mol) if mol is not None else None
+
+
+def standardize(smiles: str, pipeline: str = "biotransformer") -> Optional[str]:
+    """Canonical SMILES of the standardized molecule, or None."""
+    mol = standardized_mol(smiles, pipeline)
+    return Chem.MolToSmiles(mol) if mol is not None else None
+
+
+def canonical_key(smiles: str, pipeline: str = "comparison") -> Optional[str]:
+    """
+    Identity of the standardized molecule: its InChIKey, or canonical SMILES
+    where InChI generation fails. Memoized with the Mols. None if unparseable.
+    """
+    p = PIPELINES[pipeline]
+    if not isinstance(smiles, str):
+        return None
+    kkey = (_pipeline_key(p) + "#key", smiles)
+    found, key = _MEMO.get(kkey)
+    if found:
+        return key
+    mol = standardized_mol(smiles, pipeline)
+    key = None
+    if mol is not None:
+        try:
+            key = Chem.MolToInchiKey(mol) or None
+        except Exception:
+            key = None
+        key = key or Chem.MolToSmiles(mol)
+    _MEMO.put(kkey, key)
+    return key
+
+
+def standardize_many(smiles_list: Iterable[str], pipeline: str = "comparison") -> List[Optional[Chem.Mol]]:
+    """standardized_mol over a list; each distinct SMILES is standardized once."""
+    smiles_list = list(smiles_list)
+    done = {s: standardized_mol(s, pipeline) for s in dict.fromkeys(smiles_list)}
+    return [Chem.Mol(done[s]) if done[s] is not None else None for s in smiles_list]
+
+
+def _std_chunk(args) -> List[Tuple[str, str]]:
+    pipeline, chunk = args
+    p = PIPELINES[pipeline]
+    out = []
+    for s in chunk:
+        try:
+            m = p.run(Chem.MolFromSmiles(s))
+        except Exception:
+            m = None
+        out.append((s, Chem.MolToSmiles(m) if m is not None else ""))
+    return out
+
+
+def standardize_parallel(smiles_list: Iterable[str], pipeline: str = "comparison", *,
+                         max_workers: Optional[int] = None, chunk: int = 64, executor=None) -> List[Optional[str]]:
+    """
+    Standardize a large list on a process pool (RDKit holds the GIL here).
+    Only SMILES missing from the memo are sent out; results are written back to
+    the memo (and disk memo) so later standardized_mol() calls are lookups.
+    Returns canonical SMILES (None where standardization failed).
+    """
+    smiles_list = list(smiles_list)
+    p = PIPELINES[pipeline]
+    todo = [s for s in dict.fromkeys(smiles_list) if isinstance(s, str) and not _lookup(p, s)[0]]
+    if todo:
+        chunks = [(pipeline, todo[i:i + chunk]) for i in range(0, len(todo), chunk)]
+        own = executor is None
+        executor = executor or ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            results = [pair for part in executor.map(_std_chunk, chunks) for pair in part]
+        finally:
+            if own:
+                executor.shutdown(wait=True)
+        disk = _disk()
+        if disk is not None:
+            disk.put_many(_pipeline_key(p), results)
+        for s, out in results:
+            _store(p, s, Chem.MolFromSmiles(out) if out else None, to_disk=False)
+    outs = []
+    for s in smiles_list:
+        found, mol = _lookup(p, s) if isinstance(s, str) else (True, None)
+        outs.append(Chem.MolToSmiles(mol) if mol is not None else None)
+    return outs
+
+
+def memo_stats() -> dict:
+    return {"entries": len(_MEMO._data), "hits": _MEMO.hits, "misses": _MEMO.misses, "disk_hits": _MEMO.disk_hits}
+
+
+def clear_memo() -> None:
+    with _MEMO._lock:
+        _MEMO._data.clear()
+        _MEMO.hits = _MEMO.misses = _MEMO.disk_hits = 0
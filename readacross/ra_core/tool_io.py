@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/tool_io.py
+#
+# Column-selective readers for Toxtree / BioTransformer output CSVs. Only the
+# columns a module actually uses are parsed (Ames alert flags, CDTResult /
+# RevisedCDT, Reaction / SMILES). Files are streamed in row groups, so a batched
+# run with thousands of rows and hundreds of descriptor columns costs roughly
+# what its few needed columns cost. Toxtree output is read with read_columns
+# (core.TOXTREE_COLUMNS); BioTransformer reactions come back as compact NumPy
+# arrays keyed by a molecule-ID column (the row number where the file has none).
+#
+# pyarrow's streaming CSV reader is used when installed, else pandas with
+# usecols + chunksize.
+#
+# Scratch space for tool runs lives under RA_SCRATCH_ROOT (default /dev/shm when
+# writable, else the system temp dir). Directories are pooled per process and
+# emptied between calls instead of being created and removed for every launch.
+# RA_TOOL_FIFO=1 hands small inputs to the tool through a named pipe instead of
+# a file.
+import os
+import atexit
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except Exception:
+    pa = pa_csv = None
+
+BLOCK_SIZE = 1 << 20   # bytes per pyarrow row group
+CHUNK_ROWS = 5000      # rows per pandas chunk
+
+AMES_FLAG_COLUMN = "Structural Alert for S. typhimurium  mutagenicity"
+CRAMER_PATH_COLUMN = "toxtree.tree.cramer3.CDTResult"
+CRAMER_CLASS_COLUMN = "RevisedCDT"
+BT_REACTION_COLUMN = "Reaction"
+BT_SMILES_COLUMN = "SMILES"
+
+
+def header(path) -> List[str]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return pd.read_csv(f, nrows=0).columns.tolist()
+
+
+def iter_column_batches(path, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Stream `columns` (all when None; absent ones skipped) as {column: object array}
+    per row group. Values are strings, empty cells NaN.
+    """
+    present = header(path)
+    wanted = present if columns is None else [c for c in dict.fromkeys(columns) if c in present]
+    if not wanted:
+        return
+    if pa_csv is not None:
+        reader = pa_csv.open_csv(
+            str(path),
+            read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=wanted,
+                column_types={c: pa.string() for c in wanted},
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            df = batch.to_pandas()
+            yield {c: df[c].to_numpy(dtype=object) for c in wanted}
+    else:
+        for df in pd.read_csv(path, usecols=wanted, dtype=str, chunksize=CHUNK_ROWS):
+            yield {c: df[c].to_numpy(dtype=object) for c in wanted}
+
+
+def read_columns(path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """The selected columns as one DataFrame (drop-in for pd.read_csv on tool outputs)."""
+    parts = [pd.DataFrame(b) for b in iter_column_batches(path, columns)]
+    if not parts:
+        return pd.DataFrame(columns=[c for c in (columns or []) if c in header(path)])
+    return pd.concat(parts, ignore_index=True)
+
+
+def _ids(batch: Dict[str, np.ndarray], id_column: Optional[str], offset: int, n: int) -> np.ndarray:
+    if id_column and id_column in batch:
+        return batch[id_column]
+    return np.arange(offset, offset + n)
+
+
+class ReactionTable(NamedTuple):
+    ids: np.ndarray
+    smiles: np.ndarray          # predicted metabolite SMILES
+    reaction: np.ndarray        # reaction name
+
+
+def read_bt_reactions(path, *, id_column: Optional[str] = None) -> ReactionTable:
+    """BioTransformer CSV -> (ids, metabolite SMILES, reaction); empty cells become ''."""
+    ids, smi, rxn, n = [], [], [], 0
+    for b in iter_column_batches(path, [c for c in (id_column, BT_SMILES_COLUMN, BT_REACTION_COLUMN) if c]):
+        rows = len(next(iter(b.values())))
+        ids.append(_ids(b, id_column, n, rows))
+        for out, col in ((smi, BT_SMILES_COLUMN), (rxn, BT_REACTION_COLUMN)):
+            vals = b.get(col)
+            out.append(np.array(["" if pd.isna(v) else str(v).strip() for v in vals], dtype=object)
+                       if vals is not None else np.full(rows, "", dtype=object))
+        n += rows
+    if not ids:
+        empty = np.array([], dtype=object)
+        return ReactionTable(empty, empty, empty)
+    return ReactionTable(np.concatenate(ids), np.concatenate(smi), np.concatenate(rxn))
+
+
+# ---------- Scratch directories / tool inputs ----------
+def _default_scratch_root() -> Path:
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return Path(tempfile.gettempdir())
+
+
+SCRATCH_ROOT = Path(os.environ.get("RA_SCRATCH_ROOT") or _default_scratch_root())
+USE_FIFO = os.environ.get("RA_TOOL_FIFO", "0").strip().lower() in {"1", "true", "yes"}
+
+
+class _ScratchPool:
+    """Per-process pool of reusable scratch directories, one free-list per tool."""
+
+    def __init__(self, root: Path):
+        self.pid = os.getpid()
+        self.root = Path(tempfile.mkdtemp(prefix=f"ra-{self.pid}-", dir=root))
+        self._free: Dict[str, List[Path]] = {}
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tool: str) -> Path:
+        with self._lock:
+            free = self._free.setdefault(tool, [])
+            if free:
+                return free.pop()
+            self._n += 1
+            d = self.root / f"{tool}-{self._n}"
+        d.mkdir()
+        return d
+
+    def release(self, tool: str, d: Path) -> None:
+        for p in d.iterdir():
+            if p.is_dir() and not p.is_symlink():
+                shutil.rmtree(p, ignore_errors=True)
+            else:
+                p.unlink(missing_ok=True)
+        with self._lock:
+            self._free.setdefault(tool, []).append(d)
+
+    def close(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+_POOL: Optional[_ScratchPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> _ScratchPool:
+    global _POOL
+    with _POOL_LOCK:
+        # A forked worker must not share (and later delete) its parent's directories
+        if _POOL is None or _POOL.pid != os.getpid():
+            SCRATCH_ROOT.mkdir(parents=True, exist_ok=True)
+            _POOL = _ScratchPool(SCRATCH_ROOT)
+            atexit.register(_POOL.close)
+        return _POOL
+
+
+@contextmanager
+def scratch_dir(tool: str = "tool") -> Iterator[Path]:
+    """An empty directory under SCRATCH_ROOT, returned to the pool (emptied) afterwards."""
+    pool = _pool()
+    d = pool.acquire(tool)
+    try:
+        yield d
+    finally:
+        pool.release(tool, d)
+
+
+@contextmanager
+def tool_input(path, data: str, *, fifo: Optional[bool] = None) -> Iterator[Path]:
+    """
+    Make `data` readable at `path` for the duration of the block: a named pipe
+    fed by a writer thread when fifo (default RA_TOOL_FIFO), else a plain file.
+    Only for tools that read their input once, front to back; a pipe can be
+    read once, so open a new tool_input for every launch. Anything already at
+    `path` is replaced.
+    """
+    path = Path(path)
+    if not (USE_FIFO if fifo is None else fifo) or not hasattr(os, "mkfifo"):
+        path.write_text(data, encoding="utf-8")
+        yield path
+        return
+
+    path.unlink(missing_ok=True)
+    os.mkfifo(path)
+    payload = data.encode("utf-8")
+
+    def _feed():
+        try:
+            with open(path, "wb") as f:   # blocks until the tool opens its end
+                f.write(payload)
+        except (BrokenPipeError, OSError):
+            pass
+
+    writer = threading.Thread(target=_feed, name="ra-fifo-writer", daemon=True)
+    writer.start()
+    try:
+        yield path
+    finally:
+        if writer.is_alive():
+            # The tool never opened (or never finished reading) the pipe: open
+            # the read end ourselves so the writer can finish.
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                writer.join(timeout=1.0)
+                os.close(fd)
+            except OSError:
+                pass
+        writer.join(timeout=1.0)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/tool_runtime.py
+#
+# The one place Java tools are launched from. It owns:
+#   - JVM discovery per tool, with version preferences:
+#       JAVA_BIN_<TOOL> > bundled paths > JAVA_BIN > java on PATH
+#   - launch profiles: JAR, working dir, heap, JVM flags, timeout, retries
+#   - admission through ra_core.governor (slots and heap budget)
+#   - cheap launches through ra_core.jvm_cds (AppCDS archive plus startup flags)
+#   - timeouts and a bounded retry of launches that crashed or could not
+#     start the VM
+# Neither CLI can serve several requests from one JVM, so "worker reuse" means
+# pooled scratch dirs (ra_core.tool_io), warm CDS archives and the tool cache
+# in front of every call.
+# Under RA_TOOL_MODE=record / replay (ra_core.replay) each launch is captured
+# to, or served from, the fixture store; replay needs neither Java nor the JARs.
+#
+#   res = run_tool("toxtree", ["-n", "-i", inp, "-o", out, "-m", klass], rec=rec, expect=out, inputs=text)
+import os
+import shutil
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ra_core import jvm_cds, replay
+from ra_core.governor import governed, TOOL_TIMEOUT_S
+from ra_core.profiling import run_subprocess
+from ra_core.tool_io import tool_input
+
+RETRIES = int(os.environ.get("RA_TOOL_RETRIES", "1"))
+
+# Where each tool's JVM is looked for (after JAVA_BIN_<TOOL>), and the Java
+# feature versions it is known to run on (min, max; None = open)
+_JAVA_CANDIDATES = {
+    "toxtree": ["/opt/java/temurin-11/bin/java", "/usr/lib/jvm/java-11-openjdk-amd64/bin/java"],
+    "biotransformer": [],
+}
+JAVA_VERSIONS = {
+    "toxtree": (8, 11),
+    "biotransformer": (11, None),
+}
+_JAVA_ENV = {"toxtree": "JAVA_BIN_TOXTREE", "biotransformer": "JAVA_BIN_BIOTRANSFORMER"}
+
+# JVM vm-init failures worth one more try (transient memory pressure)
+_VM_START_ERRORS = ("Could not reserve enough space", "Error occurred during initialization of VM",
+                    "Cannot allocate memory")
+
+
+def _executable(p) -> bool:
+    return bool(p) and os.path.isfile(p) and os.access(p, os.X_OK)
+
+
+def find_java(tool: str) -> Optional[str]:
+    """
+    JVM for `tool`. The explicit per-tool override wins. Otherwise the first
+    candidate inside the tool's version range, else the first runnable one
+    (with a warning).
+    """
+    override = os.environ.get(_JAVA_ENV.get(tool, f"JAVA_BIN_{tool.upper()}"))
+    if override:
+        return override
+    candidates = [*_JAVA_CANDIDATES.get(tool, []), os.environ.get("JAVA_BIN"), shutil.which("java"), "/usr/bin/java"]
+    found = [c for c in dict.fromkeys(candidates) if _executable(c)]
+    if not found:
+        return None
+    lo, hi = JAVA_VERSIONS.get(tool, (None, None))
+    for c in found:
+        major = jvm_cds.java_major(c)
+        if major is not None and (lo is None or major >= lo) and (hi is None or major <= hi):
+            return c
+    print(f"[RUNTIME] {tool}: no Java in {lo}..{hi or ''} found; using {found[0]}")
+    return found[0]
+
+
+@dataclass(frozen=True)
+class ToolProfile:
+    name: str                         # governor / CDS key: "toxtree", "biotransformer"
+    jar: Optional[Path]
+    workdir: Optional[Path]
+    java_bin: Optional[str]
+    heap_mb: int
+    timeout_s: Optional[float] = None
+    retries: int = RETRIES
+    jvm_args: Tuple[str, ...] = field(default_factory=tuple)   # e.g. -Djava.awt.headless=true
+    log_tag: str = ""
+
+    @property
+    def available(self) -> bool:
+        return self.jar is not None and self.java_bin is not None
+
+
+_PROFILES: Dict[str, ToolProfile] = {}
+
+
+def register(profile: ToolProfile) -> ToolProfile:
+    _PROFILES[profile.name] = profile
+    return profile
+
+
+def profile(name: str) -> ToolProfile:
+    if name not in _PROFILES:
+        # core resolves the JARs and registers both tools at import
+        from ra_core import core  # noqa: F401
+    return _PROFILES[name]
+
+
+def available(name: str) -> bool:
+    """Whether `name` can be run (always, when launches are replayed)."""
+    return replay.replaying() or profile(name).available
+
+
+def jvm_options(p: ToolProfile) -> List[str]:
+    """Heap and profile JVM options; AppCDS archives are dumped with these too, so they match at runtime."""
+    return [f"-Xmx{p.heap_mb}m", *p.jvm_args]
+
+
+def command(p: ToolProfile, args: Sequence[str], cds_flags: Sequence[str] = ()) -> List[str]:
+    return [p.java_bin, *jvm_options(p), *cds_flags, "-jar", str(p.jar), *map(str, args)]
+
+
+def _retryable(res) -> bool:
+    if res.returncode >= 0:
+        return any(e in (res.stderr or "") for e in _VM_START_ERRORS)
+    return True   # killed by a signal (OOM killer, ...) rather than failing on its input
+
+
+def run_tool(tool, args: Sequence[str], *, rec: dict = None, expect: Path = None, inputs: str = None,
+             input_path: Path = None, **overrides):
+    """
+    Launch `tool` (name or ToolProfile) with CLI `args`: governed admission,
+    AppCDS, timeout, retries. `expect` is the output file whose presence marks
+    success; `inputs` is the input text the tool reads from a file (part of
+    the replay key). With `input_path`, run_tool writes `inputs` there itself
+    (tool_io.tool_input, a FIFO under RA_TOOL_FIFO), afresh for every attempt:
+    a pipe the killed attempt already drained would block the retry.
+    Raises GovernorTimeout if no slot frees up in time.
+    """
+    p = profile(tool) if isinstance(tool, str) else tool
+    rec = {} if rec is None else rec   # the governor counts timeouts from it
+    if overrides:
+        p = replace(p, **overrides)
+    if replay.replaying():
+        with governed(p.name, p.heap_mb, rec=rec):
+            return replay.replay_tool(p.name, args, inputs=inputs, expect=expect, rec=rec)
+    if not p.available:
+        raise RuntimeError(f"{p.name}: JAR or Java not available")
+    timeout = p.timeout_s if p.timeout_s is not None else TOOL_TIMEOUT_S.get(p.name)
+    retries = max(0, p.retries)
+    tag = p.log_tag or p.name.upper()
+
+    with governed(p.name, p.heap_mb, rec=rec):
+        with jvm_cds.launch(p.name, p.java_bin, p.jar, dump_args=jvm_options(p)) as cds:
+            cmd = command(p, args, cds.flags)
+            print(f"[{tag}] CMD: {' '.join(cmd)}  CWD={p.workdir}")
+            for attempt in range(retries + 1):
+                t0 = time.perf_counter()
+                with tool_input(input_path, inputs) if input_path is not None else nullcontext():
+                    res = run_subprocess(cmd, cwd=str(p.workdir) if p.workdir else None, rec=rec, timeout=timeout)
+                rec["attempts"] = attempt + 1
+                # A timeout would only time out again; a signal kill or a VM that failed to start may not
+                if res.returncode == 0 or res.timed_out or not _retryable(res) or attempt == retries:
+                    break
+                print(f"[{tag}] launch failed (returncode {res.returncode}); retrying")
+                time.sleep(0.5 * (attempt + 1))
+            cds.ok = res.returncode == 0 and (expect is None or Path(expect).exists())
+    if replay.recording() and not res.timed_out:
+        replay.record_tool(p.name, args, res, time.perf_counter() - t0, inputs=inputs, expect=expect, jar=p.jar)
+    return res
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/warmup.py
+#
+# Start-up warm-up, so the first request after a deploy costs what steady state
+# costs. Steps, each timed:
+#   import   ra_core.core (RDKit, SyGMa, DART SMARTS table, JAR resolution)
+#   tables   lazily built pieces: SyGMa scenario, tautomer enumerator,
+#            DART / conjugate SMARTS matchers
+#   canary   one compound pair through every module. This launches Toxtree
+#            and BioTransformer once, so their AppCDS archives exist and the
+#            JARs sit in the page cache.
+#   preload  "frequent compounds" (RA_WARM_COMPOUNDS) through every
+#            per-compound tool, into this process's tool cache
+#   pool     every worker of a process pool spawned and initialized
+#
+# Tool results are cached per process, so each long-lived process warms
+# itself: job-queue workers and pool workers through
+# ra_core.workers.init_worker(warm=True), the HTTP service at startup, and the
+# Streamlit server in a background thread. In the container the job-queue
+# workers start with it (python -m ra_core.jobs worker), so their warm-up is
+# done before the first analyst arrives.
+#
+# A process whose Toxtree or BioTransformer is unavailable is "failed", not
+# "ready", unless RA_ALLOW_MISSING_TOOLS is set (offline benchmarks).
+#
+#   python -m ra_core.warmup run [--compounds frequent.csv]   # warm this process, write the report
+#   python -m ra_core.warmup check [--max-age 86400]          # exit 0 once the report says ready
+#   python -m ra_core.warmup check --workers 2                # exit 0 once 2 job workers are ready
+#
+#   RA_WARM_COMPOUNDS   CSV (name, smiles columns) or .smi file to preload
+#   RA_WARM_CANARY=0    skip the canary pair (tables and preload still run)
+#   RA_READY_FILE       readiness report written by `run` (default <tmp>/ra_ready.json)
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+TOOLS = ("toxtree", "biotransformer")
+CANARY_PAIR = ("Aspirin", "CC(=O)Oc1ccccc1C(=O)O", "Salicylic acid", "OC(=O)c1ccccc1O")
+WARM_COMPOUNDS = os.environ.get("RA_WARM_COMPOUNDS") or None
+WARM_CANARY = os.environ.get("RA_WARM_CANARY", "1").strip().lower() not in {"0", "false", "no"}
+READY_FILE = Path(os.environ.get("RA_READY_FILE") or Path(tempfile.gettempdir()) / "ra_ready.json")
+PRELOAD_WORKERS = int(os.environ.get("RA_WARM_WORKERS", "4"))
+
+# This process's warm-up state: cold -> warming -> ready | failed
+STATE = {"status": "cold", "report": None}
+_LOCK = threading.Lock()
+
+
+def readiness() -> dict:
+    with _LOCK:
+        return {"status": STATE["status"], "report": STATE["report"]}
+
+
+def warm_tables() -> None:
+    """Touch every lazily built table once on a small molecule."""
+    from ra_core import core
+    probe = core.Chem.MolFromSmiles(CANARY_PAIR[1])
+    core._sygma_scenario()
+    core._standardize(core.Chem.Mol(probe))
+    core.DART_REGISTRY.screen(probe)
+    for patt in core._CONJ_PATS:
+        probe.HasSubstructMatch(patt)
+
+
+def warm_compound(name: str, smiles: str) -> None:
+    """Every per-compound tool (Toxtree modules, SyGMa, BioTransformer, PubChem) plus the standardizer memo."""
+    from ra_core import core
+    from ra_core.batch import _warm_compound
+    from ra_core.standardize import canonical_key
+    _warm_compound(name, smiles)
+    canonical_key(smiles)
+    core.reactive_pathway_counts(smiles)
+
+
+def warm_canary(pair: Tuple[str, str, str, str] = CANARY_PAIR) -> dict:
+    """One full pair assessment; returns its total score and the slowest stages."""
+    from ra_core import core
+    from ra_core.profiling import Profiler
+    with Profiler(label="warmup canary") as prof:
+        df = core.run_full_read_across_assessment(*pair)
+    return {
+        "total_score": float(df["Target Result"].get("TOTAL SCORE (Sum of Modules)")),
+        "stages": [{k: (round(v, 3) if isinstance(v, float) else v) for k, v in s.items()} for s in prof.summary()[:8]],
+    }
+
+
+def tool_status() -> Tuple[dict, List[str]]:
+    """Availability of both Java tools, and the missing ones that make the process not ready."""
+    from ra_core import core, tool_runtime
+    tools = {t: tool_runtime.available(t) for t in TOOLS}
+    # Missing tools are only acceptable when explicitly allowed (offline benchmarks)
+    missing = [] if core.ALLOW_MISSING_TOOLS else [t for t, ok in tools.items() if not ok]
+    return tools, missing
+
+
+def load_compounds(path) -> List[Tuple[str, str]]:
+    """(name, smiles) from a CSV with name/smiles columns (name optional) or a .smi file."""
+    path = Path(path)
+    if path.suffix.lower() in (".smi", ".smiles", ".txt"):
+        out = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            parts = line.strip().split(None, 1)
+            if parts and not parts[0].startswith("#"):
+                out.append((parts[1] if len(parts) > 1 else "", parts[0]))
+        return list(dict.fromkeys(out))
+    import pandas as pd
+    df = pd.read_csv(path, dtype=str).fillna("")
+    df.columns = [c.strip().lower() for c in df.columns]
+    if "smiles" not in df.columns:
+        raise ValueError(f"{path}: no 'smiles' column")
+    names = df["name"] if "name" in df.columns else [""] * len(df)
+    return list(dict.fromkeys((n, s) for n, s in zip(names, df["smiles"]) if s.strip()))
+
+
+def preload(compounds: Iterable[Tuple[str, str]], max_workers: int = PRELOAD_WORKERS) -> int:
+    """Warm the tool cache for many compounds; JVM launches stay bounded by the governor."""
+    compounds = list(compounds)
+    if not compounds:
+        return 0
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for f in [ex.submit(warm_compound, n, s) for n, s in compounds]:
+            f.result()
+    return len(compounds)
+
+
+def _ping() -> Tuple[int, str]:
+    return os.getpid(), readiness()["status"]
+
+
+def prime_pool(pool, n: int) -> int:
+    """Make every worker of an `n`-worker ProcessPoolExecutor start (and run its initializer) now;
+    raises if one failed its warm-up."""
+    seen = dict(f.result() for f in [pool.submit(_ping) for _ in range(n * 2)])
+    failed = [pid for pid, status in seen.items() if status == "failed"]
+    if failed:
+        raise RuntimeError(f"pool workers failed their warm-up: {failed}")
+    return len(seen)
+
+
+def warm_up(*, canary: Optional[bool] = None, compounds=None, pool=None, pool_workers: int = 1,
+            ready_file: Optional[Path] = None) -> dict:
+    """
+    Run every step and return the readiness report; writes it to `ready_file`
+    when given. `compounds` is a list of (name, smiles) or a file path
+    (default RA_WARM_COMPOUNDS).
+    """
+    with _LOCK:
+        STATE["status"] = "warming"
+    t_start = time.perf_counter()
+    steps = {}
+    report = {"pid": os.getpid(), "steps": steps}
+
+    def _step(name, fn, *args):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        steps[name] = round(time.perf_counter() - t0, 3)
+        return out
+
+    try:
+        # Without RA_ALLOW_MISSING_TOOLS a missing JAR fails the import, as in production
+        _step("import", lambda: __import__("ra_core.core"))
+        report["tools"], missing = tool_status()
+        if missing:
+            raise RuntimeError(f"tools unavailable: {', '.join(missing)}")
+        _step("tables", warm_tables)
+        if WARM_CANARY if canary is None else canary:
+            report["canary"] = _step("canary", warm_canary)
+        compounds = compounds if compounds is not None else WARM_COMPOUNDS
+        if isinstance(compounds, (str, Path)):
+            compounds = load_compounds(compounds)
+        if compounds:
+            report["preloaded"] = _step("preload", preload, compounds)
+        if pool is not None:
+            report["pool_workers"] = _step("pool", prime_pool, pool, pool_workers)
+        report["status"] = "ready"
+    except Exception as e:
+        report["status"] = "failed"
+        report["error"] = f"{type(e).__name__}: {e}"
+    report["total_s"] = round(time.perf_counter() - t_start, 3)
+    report["finished_at"] = time.time()
+    with _LOCK:
+        STATE["status"], STATE["report"] = report["status"], report
+    print(f"[WARMUP] {report['status']} in {report['total_s']:.1f}s {steps}")
+    if ready_file is not None:
+        write_report(report, ready_file)
+    return report
+
+
+def warm_up_in_background(**kw) -> threading.Thread:
+    t = threading.Thread(target=warm_up, kwargs=kw, name="ra-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def write_report(report: dict, path=READY_FILE) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(report, indent=1, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def check_workers(n: int, db=None) -> bool:
+    """True when at least `n` live job-queue workers finished their warm-up successfully."""
+    from ra_core.jobs import JobQueue
+    q = JobQueue(db)
+    try:
+        return sum(w["status"] == "ready" for w in q.workers()) >= n
+    finally:
+        q.close()
+
+
+def check(path=READY_FILE, max_age: Optional[float] = None) -> bool:
+    """True when a `run` finished successfully (and, with max_age, recently enough)."""
+    try:
+        report = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    if report.get("status") != "ready":
+        return False
+    return max_age is None or time.time() - report.get("finished_at", 0) <= max_age
+
+
+def _main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="Warm up ra_core before serving / report readiness")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the warm-up and write the readiness report")
+    r.add_argument("--compounds", default=WARM_COMPOUNDS, help="CSV (name, smiles) or .smi file to preload")
+    r.add_argument("--no-canary", action="store_true")
+    r.add_argument("--ready-file", default=str(READY_FILE))
+    c = sub.add_parser("check", help="exit 0 if the readiness report (and/or the job workers) say ready")
+    c.add_argument("--ready-file", default=None, help=f"default {READY_FILE} unless --workers is given")
+    c.add_argument("--max-age", type=float, default=None, help="seconds")
+    c.add_argument("--workers", type=int, default=None, help="require this many ready job-queue workers")
+    c.add_argument("--db", default=None, help="job database (default RA_JOB_DB)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "check":
+        ok = True
+        if args.ready_file is not None or args.workers is None:
+            ok = check(args.ready_file or READY_FILE, args.max_age)
+        if args.workers is not None:
+            ok = ok and check_workers(args.workers, args.db)
+        return 0 if ok else 1
+    report = warm_up(canary=False if args.no_canary else None, compounds=args.compounds,
+                     ready_file=Path(args.ready_file))
+    return 0 if report["status"] == "ready" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
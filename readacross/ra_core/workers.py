@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[ ]:
+
+
+# ra_core/workers.py
+#
+# Process-pool bootstrap for batch runs. Importing ra_core.core compiles the
+# DART SMARTS table (flat_alert_lookup), the tautomer enumerator, the conjugate
+# patterns and resolves the Toxtree/BioTransformer JARs; none of that should be
+# shared through fork or redone per task. init_worker() does it once per worker
+# process, tasks return compact tuples instead of DataFrames.
+#
+#   from ra_core.workers import run_pairs_parallel, results_frame
+#   rows = run_pairs_parallel(pairs, max_workers=4)
+#   df = results_frame(rows)
+import os
+import math
+import time
+import importlib
+import functools
+import multiprocessing as mp
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# Start method for worker processes. "spawn" gives each worker its own clean
+# RDKit / JVM-handle state and is safe under Streamlit's threads.
+MP_START = os.environ.get("RA_MP_START", "spawn")
+
+PairResult = namedtuple("PairResult", [
+    "pair_key", "target_name", "target_smiles", "surrogate_name", "surrogate_smiles",
+    "pchem_score", "metabolic_score", "struct_score", "total_score",
+    "tanimoto", "reactive_match", "evidence", "error", "seconds", "pid",
+])
+
+# Per-process state filled by init_worker
+_WORKER = {"initialized": False, "profile": None, "init_s": None}
+
+
+def init_worker(profile_dict: Optional[dict] = None, hook: Optional[str] = None, env: Optional[dict] = None,
+                warm: bool = False) -> None:
+    """
+    Pool initializer. Imports ra_core.core (alert SMARTS, standardizer and JAR
+    resolution happen at import), warms the lazily built pieces and keeps the
+    scoring profile for tasks that do not bring their own.
+
+    hook: optional "module:function" called with no arguments after import,
+          e.g. "benchmarks.offline:setup" to run workers with mocked tools.
+    warm: also run the canary pair and preload RA_WARM_COMPOUNDS (ra_core.warmup)
+          before taking tasks; for long-lived workers.
+    """
+    t0 = time.perf_counter()
+    if env:
+        os.environ.update({k: str(v) for k, v in env.items()})
+    from ra_core import core  # noqa: F401
+    from ra_core.scoring import ScoringProfile, DEFAULT_PROFILE
+    from ra_core import warmup
+
+    if hook:
+        mod, _, fn = hook.partition(":")
+        getattr(importlib.import_module(mod), fn)()
+
+    # Warm-up on a small molecule touches every cached table once
+    if warm:
+        warmup.warm_up()
+    else:
+        warmup.warm_tables()
+
+    _WORKER["profile"] = ScoringProfile.from_dict(profile_dict) if profile_dict else DEFAULT_PROFILE
+    _WORKER["initialized"] = True
+    _WORKER["init_s"] = time.perf_counter() - t0
+    print(f"[WORKER] pid {os.getpid()} ready in {_WORKER['init_s']:.2f}s")
+
+
+def chunksize_for(n_tasks: int, n_workers: int, chunks_per_worker: int = 4) -> int:
+    """
+    Tasks per pickled chunk. A few chunks per worker amortizes IPC while still
+    balancing pairs whose runtime differs by 10x (SyGMa/MCS on big molecules).
+    """
+    if n_tasks <= 0 or n_workers <= 0:
+        return 1
+    return max(1, math.ceil(n_tasks / (n_workers * chunks_per_worker)))
+
+
+def pool_size(max_workers: Optional[int] = None) -> int:
+    """Worker count make_pool() uses for `max_workers` (default: one per CPU)."""
+    return max_workers or os.cpu_count() or 1
+
+
+def make_pool(max_workers: Optional[int] = None, *, profile=None, hook: Optional[str] = None,
+              env: Optional[dict] = None, start_method: str = None, warm: bool = False) -> ProcessPoolExecutor:
+    """ProcessPoolExecutor of pool_size(max_workers) workers that run init_worker() once at
+    startup (warm: full warm-up); `profile` is the default for tasks without one."""
+    ctx = mp.get_context(start_method or MP_START)
+    profile_dict = profile.to_dict() if profile is not None else None
+    return ProcessPoolExecutor(
+        max_workers=pool_size(max_workers),
+        mp_context=ctx,
+        initializer=init_worker,
+        initargs=(profile_dict, hook, env, warm),
+    )
+
+
+def assess_pair(pair: Sequence[str], with_evidence: bool = False, profile_dict: Optional[dict] = None) -> PairResult:
+    """
+    Task: one (target_name, target_smiles, surrogate_name, surrogate_smiles) ->
+    PairResult, scored with `profile_dict` (else the worker's profile).
+    """
+    if not _WORKER["initialized"]:
+        init_worker()
+    from ra_core import core
+    from ra_core.evidence import pair_key
+    from ra_core.scoring import ScoringProfile
+    tname, tsmi, sname, ssmi = pair
+    key = pair_key(tname, tsmi, sname, ssmi)
+    t0 = time.perf_counter()
+    try:
+        profile = ScoringProfile.from_dict(profile_dict) if profile_dict else _WORKER["profile"]
+        df = core.run_full_read_across_assessment(tname, tsmi, sname, ssmi, profile=profile)
+        v = df["Target Result"]
+        ev = df.attrs.get("evidence") if with_evidence else None
+        return PairResult(
+            key, tname, tsmi, sname, ssmi,
+            float(v["P-Chem Module Score"]), float(v["Metabolic Similarity Module Score"]),
+            float(v["Structural Alert Module Score"]), float(v["TOTAL SCORE (Sum of Modules)"]),
+            float(v["Generic Tanimoto Similarity"]), float(v["Reactive Metabolite Match (Binary)"]),
+            ev, None, time.perf_counter() - t0, os.getpid(),
+        )
+    except Exception as e:
+        return PairResult(key, tname, tsmi, sname, ssmi, None, None, None, None, None, None,
+                          None, f"{type(e).__name__}: {e}", time.perf_counter() - t0, os.getpid())
+
+
+def run_pairs_parallel(pairs: Iterable[Tuple[str, str, str, str]], max_workers: Optional[int] = None, *,
+                       profile=None, chunksize: Optional[int] = None, with_evidence: bool = False,
+                       hook: Optional[str] = None, env: Optional[dict] = None, pool: ProcessPoolExecutor = None) -> list:
+    """
+    Assess many pairs on a process pool; results come back in input order.
+    Pass an existing `pool` (from make_pool) to reuse warm workers across
+    batches, with its size as `max_workers` (used for chunking). `profile`
+    travels with every task, so it applies to a reused pool too.
+    """
+    pairs = [tuple(p) for p in pairs]
+    if not pairs:
+        return []
+    own = pool is None
+    pool = pool or make_pool(max_workers, hook=hook, env=env)
+    n_workers = pool_size(max_workers)
+    fn = functools.partial(assess_pair, with_evidence=with_evidence,
+                           profile_dict=profile.to_dict() if profile is not None else None)
+    cs = chunksize or chunksize_for(len(pairs), n_workers)
+    print(f"[WORKER] {len(pairs)} pairs on {n_workers} workers, chunksize {cs}")
+    try:
+        return list(pool.map(fn, pairs, chunksize=cs))
+    finally:
+        if own:
+            pool.shutdown(wait=True)
+
+
+def results_frame(results: Iterable[PairResult]) -> pd.DataFrame:
+    """Flatten PairResult tuples (evidence column dropped) into one DataFrame."""
+    df = pd.DataFrame(list(results), columns=PairResult._fields)
+    return df.drop(columns=["evidence"]).set_index("pair_key")